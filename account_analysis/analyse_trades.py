@@ -1,9 +1,12 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 
 from alpaca.trading.client import TradingClient
@@ -13,10 +16,44 @@ from alpaca.trading.enums import QueryOrderStatus
 from private.core_logic.config import ALPACA_KEY, ALPACA_SECRET
 from private.core_logic.paths import TRADE_TRACKING_CSV_PATH, TRADE_TRACKING_CSV_PATH_PRIVATE
 
+from public.account_analysis.lot_matching import fills_from_orders, match_lots
+from public.account_analysis.order_cache import OrderCache, status_rates
+from public.account_analysis.trade_store import TradeStore, PUBLIC_COLUMNS, PRIVATE_COLUMNS
+from public.streamlit_app.metrics import compute_metrics, normalise_round_trips
+
+
+def _is_filled(order) -> bool:
+    """any fill at all: a canceled / expired order can have been partially filled first"""
+    try:
+        return float(getattr(order, "filled_qty", None) or 0) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+class RateLimiter:
+    """
+    Minimal thread-safe limiter: spaces calls evenly so that no more than
+    `max_per_minute` requests go out, however many threads share it.
+    """
+
+    def __init__(self, max_per_minute: int):
+        self.interval = 60.0 / max(1, max_per_minute)
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
 
 class TradeFetcher:
 
-    def __init__(self, *, alpaca_key, alpaca_secret, public=False):
+    def __init__(self, *, alpaca_key, alpaca_secret, public=False, store_path=None, order_cache_dir=None):
         self.trading_client = TradingClient(
             alpaca_key,
             alpaca_secret,
@@ -28,6 +65,16 @@ class TradeFetcher:
         else:
             self.trades_csv = TRADE_TRACKING_CSV_PATH_PRIVATE
 
+        # one store holds every column, public / private is only a projection on export
+        if store_path is None:
+            store_path = Path(TRADE_TRACKING_CSV_PATH_PRIVATE).with_suffix(".db")
+        self.trade_store = TradeStore(store_path)
+
+        # raw closed orders of every status, so analysis can be re-run offline
+        if order_cache_dir is None:
+            order_cache_dir = Path(TRADE_TRACKING_CSV_PATH_PRIVATE).parent / "order_cache"
+        self.order_cache = OrderCache(order_cache_dir)
+
     def _get_closed_orders(self, after: datetime, until: datetime, limit: int):
         """
         Fetch raw CLOSED orders (filled + canceled + expired), newest → oldest.
@@ -43,168 +90,170 @@ class TradeFetcher:
         return self.trading_client.get_orders(filter=req)
 
 
-    def get_trades_bypass_limit(
+    def _paginate_closed_orders(
         self,
         after: datetime,
         until: datetime,
-        limit_per_request: int = 500,):
+        limit_per_request: int = 500,
+        rate_limiter: Optional["RateLimiter"] = None,
+        label: str = "",):
         """
-        Paginate backwards in time over CLOSED orders,
-        but only store FILLED ones.
+        Walk backwards in time over ALL closed orders in [after, until], newest → oldest.
         Critical fix: pagination is based on the oldest CLOSED order,
         NOT the oldest FILLED order (avoids skipping trades).
         """
 
-        trades = []
-        after_ = after
+        orders_all = []
         until_ = until
         eps = timedelta(microseconds=1)
 
         while True:
-            print(f"Fetching trades from {after_} to {until_}")
-            orders = self._get_closed_orders(after=after_, until=until_, limit=limit_per_request)
-            print(f"Fetched {len(orders)} closed orders")
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+
+            print(f"{label}Fetching trades from {after} to {until_}")
+            orders = self._get_closed_orders(after=after, until=until_, limit=limit_per_request)
+            print(f"{label}Fetched {len(orders)} closed orders")
 
             if not orders:
-                print("No more orders, stopping")
+                print(f"{label}No more orders, stopping")
                 break
 
-            fills = [o for o in orders if str(o.status).lower().endswith("filled")]
-            print(f"  → {len(fills)} filled")
-            trades.extend(fills)
+            orders_all.extend(orders)
 
             # use the OLDEST CLOSED order for pagination
             oldest_closed = orders[-1].submitted_at
             until_ = oldest_closed - eps
 
             if len(orders) < limit_per_request:
-                print("Last page reached")
+                print(f"{label}Last page reached")
                 break
 
+        return orders_all
+
+
+    def get_trades_bypass_limit(
+        self,
+        after: datetime,
+        until: datetime,
+        limit_per_request: int = 500,):
+        """
+        Paginate backwards in time over CLOSED orders,
+        but only store the ones with fills (including partially filled then canceled / expired).
+        """
+
+        orders = self._paginate_closed_orders(after=after, until=until, limit_per_request=limit_per_request)
+        trades = [o for o in orders if _is_filled(o)]
+
         print(f"Total filled trades collected: {len(trades)}")
         return trades
 
 
-    def pair_round_trips_from_orders(self, filled_orders: List[Any]) -> List[Dict[str, Any]]:
+    def get_closed_orders_sharded(
+        self,
+        after: datetime,
+        until: datetime,
+        n_shards: int = 8,
+        max_workers: int = 4,
+        limit_per_request: int = 500,
+        max_requests_per_minute: int = 180,):
         """
-        Pair up buy/sell orders for the same symbol into simple round trips.
+        Split [after, until] into equal time shards and paginate them concurrently.
 
-        filled_orders: list of alpaca.trading.models.Order (status = filled)
+        Each shard runs the same oldest-CLOSED pagination as get_trades_bypass_limit,
+        all shards share one rate limiter (alpaca allows 200 requests / minute),
+        and the merged result is deduplicated by order id (shard edges can overlap).
+        Returns ALL closed orders, newest → oldest.
+        """
 
-        Assumptions:
-        - You basically do: BUY x -> SELL x -> flat per symbol.
-        - No scaling in/out, no partial exits, no overlapping trades.
-        """
-        # normalise orders into a simple structure
-        norm_rows = []
-
-        for o in filled_orders:
-            symbol = getattr(o, "symbol", None)
-            side_enum = getattr(o, "side", None)
-            filled_qty = getattr(o, "filled_qty", None) or getattr(o, "qty", None)
-            filled_price = getattr(o, "filled_avg_price", None) or getattr(o, "limit_price", None)
-            filled_at = getattr(o, "filled_at", None) or getattr(o, "updated_at", None)
-            order_id = getattr(o, "id", None)
-
-            if not (symbol and side_enum and filled_qty and filled_price and filled_at):
-                continue
-
-            side = getattr(side_enum, "value", str(side_enum)).lower()
-
-            try:
-                qty = float(filled_qty)
-                price = float(filled_price)
-            except (TypeError, ValueError):
-                continue
-
-            if qty <= 0:
-                continue
-
-            if not isinstance(filled_at, datetime):
-                # just in case, but alpaca already gives datetime
-                filled_at = datetime.fromisoformat(str(filled_at))
-
-            norm_rows.append(
-                {
-                    "symbol": symbol,
-                    "side": side,
-                    "qty": qty,
-                    "price": price,
-                    "time": filled_at,
-                    "order_id": order_id,
-                    "raw": o,
-                }
-            )
-
-        # group by symbol
-        by_symbol: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        for row in norm_rows:
-            by_symbol[row["symbol"]].append(row)
-
-        round_trips: List[Dict[str, Any]] = []
-
-        for symbol, rows in by_symbol.items():
-            rows.sort(key=lambda r: r["time"])  # oldest first
-            i = 0
-            n = len(rows)
-
-            while i + 1 < n:
-                buy = rows[i]
-                sell = rows[i + 1]
-
-                # require buy -> sell sequence
-                if buy["side"] != "buy" or sell["side"] != "sell":
-                    i += 1
-                    continue
-
-                # require exact qty match
-                if buy["qty"] != sell["qty"]:
-                    i += 1
-                    continue
-
-                qty = buy["qty"]
-                buy_price = buy["price"]
-                sell_price = sell["price"]
-
-                pnl_amount = (sell_price - buy_price) * qty
-                pnl_percentage = (sell_price - buy_price) / buy_price
-
-                return_on_basis = pnl_amount / (buy_price * qty)
-
-                round_trips.append(
-                    {
-                        "symbol": symbol,
-                        "qty": qty,
-                        "buy_price": buy_price,
-                        "sell_price": sell_price,
-                        "buy_time": buy["time"],
-                        "sell_time": sell["time"],
-                        "pnl_amount": pnl_amount,
-                        "pnl_percentage": pnl_percentage,
-                        "buy_order_id": buy["order_id"],
-                        "sell_order_id": sell["order_id"],
-                        "basis": buy_price * qty,
-                        "return_on_basis": return_on_basis,
-                        #"buy_raw": buy["raw"],
-                        #"sell_raw": sell["raw"],
-                    }
+        if until <= after:
+            return []
+
+        n_shards = max(1, int(n_shards))
+        step = (until - after) / n_shards
+        edges = [after + step * i for i in range(n_shards)] + [until]
+        shards = list(zip(edges[:-1], edges[1:]))
+
+        rate_limiter = RateLimiter(max_requests_per_minute)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, n_shards))) as pool:
+            futures = [
+                pool.submit(
+                    self._paginate_closed_orders,
+                    after=shard_after,
+                    until=shard_until,
+                    limit_per_request=limit_per_request,
+                    rate_limiter=rate_limiter,
+                    label=f"[shard {i}] ",
                 )
+                for i, (shard_after, shard_until) in enumerate(shards)
+            ]
+            shard_orders = [f.result() for f in futures]
+
+        merged = {}
+        for orders in shard_orders:
+            for o in orders:
+                merged.setdefault(str(o.id), o)
 
-                i += 2  # move past this pair
+        orders = sorted(merged.values(), key=lambda o: o.submitted_at, reverse=True)
+        print(f"Total closed orders collected across {n_shards} shards: {len(orders)}")
+        return orders
 
-        return round_trips
+
+    def get_trades_sharded(self, after: datetime, until: datetime, **kwargs):
+        """Parallel version of get_trades_bypass_limit, only orders with fills are kept."""
+
+        orders = self.get_closed_orders_sharded(after=after, until=until, **kwargs)
+        trades = [o for o in orders if _is_filled(o)]
+
+        print(f"Total filled trades collected: {len(trades)}")
+        return trades
+
+
+    def match_round_trips(self, filled_orders: List[Any], method: str = "fifo"):
+        """
+        Lot-match filled orders into round trips, see lot_matching.py.
+
+        filled_orders: list of alpaca.trading.models.Order (status = filled)
+        Returns (round_trips, open_lots) DataFrames.
+        """
+        fills = fills_from_orders(filled_orders)
+        return match_lots(fills, method=method)
+
+
+    def pair_round_trips_from_orders(self, filled_orders: List[Any], method: str = "fifo") -> List[Dict[str, Any]]:
+        """
+        Pair up buy/sell orders for the same symbol into round trips.
+
+        filled_orders: list of alpaca.trading.models.Order (status = filled)
+
+        Partial fills, scale-ins and scale-outs are matched lot by lot (FIFO by default),
+        so one order can appear in several round trips. Lots still open are not returned.
+        """
+        round_trips, open_lots = self.match_round_trips(filled_orders, method=method)
+        print(f"{len(round_trips)} round trips, {len(open_lots)} open lots")
+        return round_trips.to_dict("records")
+
+
+    def insert_trades_to_store(self, trades):
+        """
+        Upsert new round trips into the trade store, then export the csv for the dashboard.
+        On first use the existing csv is imported so no history is lost.
+        """
+
+        if self.trade_store.count() == 0 and os.path.exists(self.trades_csv):
+            self.trade_store.import_csv(self.trades_csv)
+
+        n = self.trade_store.upsert_round_trips(trades)
+        print(f"Upserted {n} trades into {self.trade_store.db_path}")
+
+        return self.trade_store.export_csv(self.trades_csv, public=self.public)
 
 
     def insert_trades_to_csv(self, trades):
+        """legacy path, rewrites the whole csv, prefer insert_trades_to_store"""
 
-        if self.public:
-            columns = ['sell_time', 'buy_time',
-                        'pnl_amount', 'pnl_percentage',
-                        'basis', 'buy_order_id']
-        else:
-            columns = ['qty', 'buy_price', 'sell_price', 'buy_time', 'sell_time',
-                        'pnl_amount', 'pnl_percentage', 'buy_order_id', 'sell_order_id',
-                        'return_on_basis', 'basis']
+        columns = PUBLIC_COLUMNS if self.public else PRIVATE_COLUMNS
 
 
         trades_df = pd.DataFrame(trades)[columns]
@@ -230,14 +279,56 @@ class TradeFetcher:
         return df_updated
 
     
-    def update_csv(self, lookback_days):
+    # ======================= #
+    #   OFFLINE (ORDER CACHE) #
+    # ======================= #
 
-        start_date = datetime.now() - timedelta(days=lookback_days)
-        end_date = datetime.now()
+    def refresh_order_cache(self, after: datetime = None, until: datetime = None, parallel_shards=None, overlap_days=3):
+        """
+        Fetch closed orders (all statuses) into the local order cache.
+        With no `after`, only the gap since the newest cached order is fetched, minus a few
+        days of overlap for orders submitted before the last refresh that closed after it.
+        """
+
+        until = until or datetime.now()
+        if after is None:
+            latest = self.order_cache.latest_submitted_at()
+            if latest is None:
+                raise ValueError("Order cache is empty, pass `after` for the first refresh")
+            after = latest.to_pydatetime().replace(tzinfo=None) - timedelta(days=overlap_days)
+
+        if parallel_shards:
+            orders = self.get_closed_orders_sharded(after=after, until=until, n_shards=parallel_shards)
+        else:
+            orders = self._paginate_closed_orders(after=after, until=until)
 
-        trades = self.get_trades_bypass_limit(after=start_date, until=end_date, limit_per_request=500)
-        trades = self.pair_round_trips_from_orders(trades)
-        self.insert_trades_to_csv(trades)
+        n = self.order_cache.upsert(orders)
+        print(f"Cached {n} closed orders in {self.order_cache.cache_dir}")
+        return n
 
 
+    def round_trips_from_cache(self, after: datetime = None, until: datetime = None, method: str = "fifo"):
+        """(round_trips, open_lots) rebuilt from the order cache, no API calls"""
+        return match_lots(self.order_cache.fills(after=after, until=until), method=method)
+
+
+    def order_status_rates(self, after: datetime = None, until: datetime = None, by="symbol"):
+        """fill / cancel / expire rates from the order cache, no API calls"""
+        return status_rates(self.order_cache.load(after=after, until=until), by=by)
+
+
+    def performance_metrics(self, capital, sp500_close=None):
+        """the dashboard's metrics (Sharpe, drawdown, win rate, ...) computed straight from the trade store"""
+        df = normalise_round_trips(self.trade_store.read(public=False))
+        return compute_metrics(df, capital, sp500_close)
+
+
+    def update_csv(self, lookback_days, parallel_shards=None):
+
+        start_date = datetime.now() - timedelta(days=lookback_days)
+        end_date = datetime.now()
 
+        self.refresh_order_cache(after=start_date, until=end_date, parallel_shards=parallel_shards)
+        trades, open_lots = self.round_trips_from_cache(after=start_date, until=end_date)
+        print(f"{len(trades)} round trips, {len(open_lots)} open lots")
+        self.insert_trades_to_store(trades)
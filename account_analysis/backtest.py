@@ -0,0 +1,211 @@
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from public.account_analysis.lot_matching import FILL_COLUMNS, match_lots
+from public.account_analysis.trade_store import PRIVATE_COLUMNS, PUBLIC_COLUMNS, TIME_COLUMNS
+from public.decision_rules import ACTIONS, compile_signals_frame, decide_array
+
+
+"""
+Backtest: replay a historical signal series through the bot's own decision rules.
+
+Each bar, for every ticker at once (numpy arrays over tickers, one python step per bar):
+1. pending market orders that are `fill_delay` bars old fill at this bar's price
+2. position_state is derived from holdings + pending order, the same table as
+   TradingBot.get_new_asset_position_state
+3. the action comes from decision_rules.decide_array (the table the live bot uses)
+4. cancels / buys / sells update the pending orders (buys sized from buy_quantity,
+   sells for the whole holding, as place_market_order does)
+
+Bars where nothing can change (no pending orders, same signals as the last step, and
+the last step did nothing) are skipped, so sparse signals on minute bars stay cheap.
+
+Fills go through lot_matching.match_lots, so the round trips come out in the same
+columns as the trade store / round trip csvs and the dashboard can read them as is.
+
+SIGNALS: long frame with time, ticker, signal ('BUY' / 'HOLD' / 'SELL'); several rows for
+the same (time, ticker) are compiled like duplicate holdings rows (compile_signals).
+A signal holds until the next one for that ticker; before the first it's HOLD.
+
+PRICES: wide frame, index = bar time, columns = tickers (e.g. daily or minute closes),
+see price_panel() for building one from long bars.
+"""
+
+
+# ======================= #
+#         INPUTS          #
+# ======================= #
+
+def price_panel(bars: pd.DataFrame, price_col: str = 'close', time_col: str = 'timestamp',
+                symbol_col: str = 'symbol') -> pd.DataFrame:
+    """long bars (symbol, timestamp, close ...) -> wide price frame (time x ticker)"""
+
+    panel = bars.pivot_table(index=time_col, columns=symbol_col, values=price_col, aggfunc='last')
+    panel.index = pd.to_datetime(panel.index)
+    return panel.sort_index()
+
+
+def load_bars(path: Union[str, Path], **kwargs) -> pd.DataFrame:
+    """locally stored bars (parquet or csv, long format) as a wide price frame"""
+
+    path = Path(path)
+    bars = pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_csv(path)
+    return price_panel(bars, **kwargs)
+
+
+def signal_panel(signals: pd.DataFrame, prices: pd.DataFrame, time_col: str = 'time',
+                 ticker_col: str = 'ticker', signal_col: str = 'signal') -> pd.DataFrame:
+    """
+    Compile duplicate rows and align the signals to the price bars: each bar sees the
+    latest signal at or before it, HOLD before a ticker's first signal.
+    """
+
+    signals = signals.copy()
+    signals[time_col] = pd.to_datetime(signals[time_col])
+    compiled = compile_signals_frame(signals, by=[time_col, ticker_col], signal_col=signal_col)
+    wide = compiled.unstack(ticker_col).reindex(columns=prices.columns)
+
+    wide = wide.reindex(wide.index.union(prices.index)).sort_index().ffill()
+    return wide.reindex(prices.index).fillna('HOLD')
+
+
+# ======================= #
+#       SIMULATION        #
+# ======================= #
+
+def _position_states(holdings: np.ndarray, pending_side: np.ndarray) -> np.ndarray:
+    """TradingBot.get_new_asset_position_state for every ticker at once"""
+
+    long, flat, short = holdings > 0, holdings == 0, holdings < 0
+    buy, none, sell = pending_side == 1, pending_side == 0, pending_side == -1
+
+    return np.select(
+        [long & buy, long & none, long & sell,
+         flat & buy, flat & none, flat & sell,
+         short & buy, short & none, short & sell],
+        ['PARTIAL FILL', 'OPEN', 'CLOSING',
+         'OPENING', 'CLOSED', 'SHORTING',
+         'FIXING_SHORT', 'SHORT_OPEN', 'MORE_SHORTING'],
+        default='ERROR',
+    )
+
+
+def run_backtest(signals: pd.DataFrame, prices: pd.DataFrame, buy_quantity: float = 100,
+                 fractional: bool = False, fill_delay: int = 1, slippage_bps: float = 0.0,
+                 method: str = 'fifo') -> Dict[str, pd.DataFrame]:
+    """
+    Run the decision rules over the history.
+
+    buy_quantity: $ per buy, as TradingBot(buy_quantity=...)
+    fractional: fractional share sizes, otherwise rounded up (non-fractionable assets)
+    fill_delay: bars between placing a market order and its fill (>= 1)
+    slippage_bps: buys fill this much above the bar price, sells below
+
+    Returns a dict with 'round_trips' (ROUND_TRIP_COLUMNS), 'open_lots', 'fills'
+    (FILL_COLUMNS) and 'actions' (count of each non-noop action, per ticker).
+    """
+
+    if fill_delay < 1:
+        raise ValueError("fill_delay must be at least 1 bar")
+
+    tickers = prices.columns
+    times = prices.index
+    price = prices.to_numpy(dtype=float)
+    signal = signal_panel(signals, prices).to_numpy(dtype=object)
+    n_steps, n_tickers = price.shape
+
+    holdings = np.zeros(n_tickers)
+    pending_side = np.zeros(n_tickers, dtype=int)  # 1 buy, -1 sell, 0 none
+    pending_qty = np.zeros(n_tickers)
+    pending_age = np.zeros(n_tickers, dtype=int)
+    pending_id = np.full(n_tickers, '', dtype=object)
+    next_order = 0
+
+    action_counts = np.zeros((len(ACTIONS), n_tickers), dtype=int)
+    fills = []
+    last_signal = None
+    last_changed = True
+    blocked = np.zeros(n_tickers, dtype=bool)  # buys decided but not placed for lack of a price
+    slip = slippage_bps / 1e4
+
+    for t in range(n_steps):
+        has_pending = pending_side != 0
+        if not has_pending.any() and not blocked.any() and not last_changed and np.array_equal(signal[t], last_signal):
+            continue
+        last_signal = signal[t]
+        p = price[t]
+        has_price = np.isfinite(p)
+
+        # 1. fills
+        pending_age[has_pending] += 1
+        fill = has_pending & (pending_age >= fill_delay) & has_price
+        if fill.any():
+            fill_price = p[fill] * (1 + slip * pending_side[fill])
+            fills.append(pd.DataFrame({
+                'symbol': tickers[fill],
+                'side': np.where(pending_side[fill] == 1, 'buy', 'sell'),
+                'qty': pending_qty[fill],
+                'price': fill_price,
+                'time': times[t],
+                'order_id': pending_id[fill],
+            }))
+            holdings[fill] += pending_side[fill] * pending_qty[fill]
+            pending_side[fill] = 0
+            pending_qty[fill] = 0.0
+
+        # 2. position state, 3. action
+        states = _position_states(holdings, pending_side)
+        actions = decide_array(signal[t], states)
+        codes = pd.Index(ACTIONS).get_indexer(actions)
+        np.add.at(action_counts, (codes, np.arange(n_tickers)), 1)
+
+        # 4. act (orders need a price to be sized / placed, otherwise retried next bar)
+        cancel = np.isin(actions, ('cancel', 'cancel_buy', 'cancel_sell'))
+        pending_side[cancel] = 0
+        pending_qty[cancel] = 0.0
+
+        wants_buy = np.isin(actions, ('buy', 'cancel_buy'))
+        buy = wants_buy & has_price
+        blocked = wants_buy & ~has_price
+        sell = np.isin(actions, ('sell', 'cancel_sell')) & (holdings > 0)
+        if buy.any():
+            shares = buy_quantity / p[buy]
+            pending_qty[buy] = shares if fractional else np.ceil(shares)
+        pending_qty[sell] = holdings[sell]
+        pending_side[buy] = 1
+        pending_side[sell] = -1
+
+        placed = buy | sell
+        pending_age[placed] = 0
+        n_placed = int(placed.sum())
+        pending_id[placed] = [f"bt-{i}" for i in range(next_order, next_order + n_placed)]
+        next_order += n_placed
+
+        last_changed = bool(cancel.any() or placed.any() or fill.any())
+
+    fills = pd.concat(fills, ignore_index=True) if fills else pd.DataFrame(columns=FILL_COLUMNS)
+    round_trips, open_lots = match_lots(fills, method=method)
+
+    return {
+        'round_trips': round_trips,
+        'open_lots': open_lots,
+        'fills': fills,
+        'actions': pd.DataFrame(action_counts, index=list(ACTIONS), columns=tickers).drop(index='noop'),
+    }
+
+
+def export_round_trips(round_trips: pd.DataFrame, csv_path: Union[str, Path], public: bool = False) -> pd.DataFrame:
+    """write backtest round trips in the dashboard csv format (same projection as TradeStore.export_csv)"""
+
+    df = round_trips[PUBLIC_COLUMNS if public else PRIVATE_COLUMNS].copy()
+    for col in TIME_COLUMNS:
+        df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d")
+
+    csv_path = Path(csv_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(csv_path, index=False)
+    print(f"Exported {len(df)} backtest trades to {csv_path}")
+    return df
@@ -0,0 +1,216 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# relative, so the dashboard can import this as account_analysis.ingestion (no `public` package there)
+from .lot_matching import FILL_COLUMNS, ROUND_TRIP_COLUMNS, match_lots
+
+
+"""
+One ingestion path for trade history from either broker.
+
+FILE -> chunks (iter_chunks, a generator, so big exports are never read in one go)
+     -> broker adapter (picked from the file's columns) -> common schema
+     -> round trips (ROUND_TRIP_COLUMNS)
+
+Adapters produce one of three kinds of rows:
+
+- executions: lot_matching's fills schema (symbol, side, qty, price, time, order_id);
+  all chunks are collected (6 narrow columns) and matched once with match_lots,
+  the same engine TradeFetcher uses, since FIFO needs the whole history per symbol
+    alpaca_orders     order cache / order exports (id, symbol, side, filled_qty, filled_avg_price, filled_at, status)
+    ibkr_executions   IBKR trade reports (Symbol, Quantity, TradePrice, DateTime, IBOrderID)
+- closed_lots: closing executions that already carry the broker's realised P&L and cost basis
+  but no symbol / buy side (ibkr_trades_2.csv: IBOrderID, qty, pnl, basis, netcash, date);
+  each row is one round trip with an unknown buy time, nothing to match
+- round_trips: files that are already paired (trades.csv, trade store exports,
+  ibkr_trades_round_trips.csv), mapped onto the same columns, extra columns kept
+"""
+
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+# ======================= #
+#         CHUNKS          #
+# ======================= #
+
+def iter_chunks(path: Union[str, Path], chunksize: int = DEFAULT_CHUNKSIZE, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """csv / parquet file as a stream of DataFrames of at most `chunksize` rows"""
+
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+def read_columns(path: Union[str, Path]) -> List[str]:
+    """header only"""
+
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+# ======================= #
+#        ADAPTERS         #
+# ======================= #
+
+class Adapter(ABC):
+    name = ""
+    kind = ""         # 'executions', 'closed_lots' or 'round_trips'
+    required = set()  # columns that identify the format
+
+    def matches(self, columns) -> bool:
+        return self.required <= set(columns)
+
+    @abstractmethod
+    def normalise(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """one chunk of the broker's file -> the common schema for this adapter's kind"""
+
+
+class AlpacaOrdersAdapter(Adapter):
+    name = "alpaca_orders"
+    kind = "executions"
+    required = {"id", "symbol", "side", "filled_qty", "filled_avg_price", "filled_at"}
+
+    def normalise(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        # any order with fills, whatever its status (partially filled then canceled / expired)
+        filled_qty = pd.to_numeric(chunk["filled_qty"], errors="coerce")
+        chunk, filled_qty = chunk[filled_qty > 0], filled_qty[filled_qty > 0]
+        return pd.DataFrame({
+            "symbol": chunk["symbol"],
+            "side": chunk["side"].astype(str).str.lower().str.replace("orderside.", "", regex=False),
+            "qty": filled_qty,
+            "price": pd.to_numeric(chunk["filled_avg_price"], errors="coerce"),
+            "time": pd.to_datetime(chunk["filled_at"], utc=True, format="ISO8601"),
+            "order_id": chunk["id"].astype(str),
+        }, columns=FILL_COLUMNS)
+
+
+class IbkrExecutionsAdapter(Adapter):
+    name = "ibkr_executions"
+    kind = "executions"
+    required = {"Symbol", "Quantity", "TradePrice"}
+
+    def normalise(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        qty = pd.to_numeric(chunk["Quantity"], errors="coerce")
+        time_col = next(c for c in ("DateTime", "TradeDate", "Date/Time") if c in chunk)
+        order_col = next((c for c in ("IBOrderID", "TradeID", "OrderID") if c in chunk), None)
+        return pd.DataFrame({
+            "symbol": chunk["Symbol"],
+            "side": np.where(qty > 0, "buy", "sell"),
+            "qty": qty.abs(),
+            "price": pd.to_numeric(chunk["TradePrice"], errors="coerce"),
+            # IBKR flex DateTime is 'YYYYMMDD;HHMMSS'
+            "time": pd.to_datetime(chunk[time_col].astype(str).str.replace(";", " ", regex=False), format="mixed"),
+            "order_id": chunk[order_col].astype(str) if order_col else chunk.index.astype(str),
+        }, columns=FILL_COLUMNS)
+
+
+class IbkrClosedLotsAdapter(Adapter):
+    name = "ibkr_closed_lots"
+    kind = "closed_lots"
+    required = {"IBOrderID", "qty", "pnl", "basis", "netcash", "date"}
+
+    def normalise(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        qty = pd.to_numeric(chunk["qty"], errors="coerce").abs()
+        basis = pd.to_numeric(chunk["basis"], errors="coerce").abs()
+        proceeds = pd.to_numeric(chunk["netcash"], errors="coerce").abs()
+        pnl = pd.to_numeric(chunk["pnl"], errors="coerce")
+        return pd.DataFrame({
+            "symbol": chunk["Symbol"] if "Symbol" in chunk else pd.NA,
+            "qty": qty,
+            "buy_price": basis / qty,
+            "sell_price": proceeds / qty,
+            "buy_time": pd.NaT,
+            "sell_time": pd.to_datetime(chunk["date"]),
+            "pnl_amount": pnl,
+            "pnl_percentage": pnl / basis,
+            "buy_order_id": pd.NA,
+            "sell_order_id": chunk["IBOrderID"].astype(str),
+            "basis": basis,
+            "return_on_basis": pnl / basis,
+        }, columns=ROUND_TRIP_COLUMNS)
+
+
+class RoundTripsAdapter(Adapter):
+    name = "round_trips"
+    kind = "round_trips"
+
+    def matches(self, columns) -> bool:
+        columns = set(columns)
+        return "basis" in columns and (
+            {"buy_time", "sell_time", "pnl_amount"} <= columns or {"buy_date_dt", "sell_date_dt", "pnl"} <= columns
+        )
+
+    def normalise(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        df = chunk.copy()
+        if "buy_time" not in df:
+            df["buy_time"] = df["buy_date_dt"]
+            df["sell_time"] = df["sell_date_dt"]
+        if "pnl_amount" not in df:
+            df["pnl_amount"] = df["pnl"]
+        if "pnl_percentage" not in df and "return_pct" in df:
+            df["pnl_percentage"] = df["return_pct"] / 100  # ibkr return_pct is in percent
+        if "return_on_basis" not in df:
+            df["return_on_basis"] = df["pnl_amount"] / df["basis"]
+        extra = [c for c in df.columns if c not in ROUND_TRIP_COLUMNS]
+        return df.reindex(columns=ROUND_TRIP_COLUMNS + extra)
+
+
+ADAPTERS = [AlpacaOrdersAdapter(), IbkrExecutionsAdapter(), IbkrClosedLotsAdapter(), RoundTripsAdapter()]
+
+
+def detect_adapter(columns):
+    """first adapter whose required columns are all present"""
+
+    for adapter in ADAPTERS:
+        if adapter.matches(columns):
+            return adapter
+    raise ValueError(f"No ingestion adapter for columns {sorted(columns)}")
+
+
+# ======================= #
+#        PIPELINE         #
+# ======================= #
+
+def iter_normalised(path: Union[str, Path], adapter=None, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """the file's chunks, each mapped onto the adapter's common schema"""
+
+    adapter = adapter or detect_adapter(read_columns(path))
+    for chunk in iter_chunks(path, chunksize=chunksize):
+        yield adapter.normalise(chunk)
+
+
+def round_trips_from_executions(executions: pd.DataFrame, method: str = "fifo") -> pd.DataFrame:
+    round_trips, _ = match_lots(executions, method=method)
+    return round_trips
+
+
+def load_round_trips(path: Union[str, Path], method: str = "fifo", chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Round trips (ROUND_TRIP_COLUMNS, plus any extra columns of an already-paired file)
+    from any supported broker file.
+    """
+
+    adapter = detect_adapter(read_columns(path))
+    chunks = [c for c in iter_normalised(path, adapter, chunksize) if len(c)]
+
+    if adapter.kind == "executions":
+        executions = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=FILL_COLUMNS)
+        return round_trips_from_executions(executions, method)
+
+    if not chunks:
+        return pd.DataFrame(columns=ROUND_TRIP_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
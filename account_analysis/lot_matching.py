@@ -0,0 +1,296 @@
+from datetime import datetime
+from typing import Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Lot matching: turn a stream of fills into closed round trips + remaining open lots.
+
+FILLS FRAME (one row per fill):
+    symbol, side ('buy' / 'sell'), qty (> 0), price, time, order_id
+
+FIFO is done without any per-row python:
+
+- every symbol gets its own quantity axis, buys occupy [cum_buy_prev, cum_buy)
+  and sells occupy [cum_sell_prev, cum_sell) on that axis
+- the k-th unit sold is the k-th unit bought, so a round trip is just the overlap
+  of a buy interval with a sell interval
+- all interval end points are sorted once (lexsort on symbol, position), and each
+  gap between neighbouring end points is one (buy lot, sell lot) piece
+
+Sells larger than the open position (e.g. the buy happened before the lookback
+window) are clipped to the position, so a sell is never matched to a later buy.
+This is a long only bot, so the excess is dropped rather than opened as a short.
+
+LIFO can't be written as an interval overlap (which lot is closed depends on the
+timing of every earlier sell), so it falls back to a per-symbol stack.
+"""
+
+
+ROUND_TRIP_COLUMNS = [
+    "symbol", "qty", "buy_price", "sell_price", "buy_time", "sell_time",
+    "pnl_amount", "pnl_percentage", "buy_order_id", "sell_order_id",
+    "basis", "return_on_basis",
+]
+
+OPEN_LOT_COLUMNS = ["symbol", "qty", "buy_price", "buy_time", "buy_order_id"]
+
+FILL_COLUMNS = ["symbol", "side", "qty", "price", "time", "order_id"]
+
+# alpaca quantities go to 9 decimal places, anything smaller is float noise
+QTY_DECIMALS = 9
+QTY_TOL = 10 ** -QTY_DECIMALS
+
+
+# ======================= #
+#      NORMALISATION      #
+# ======================= #
+
+def fills_from_orders(filled_orders: List[Any]) -> pd.DataFrame:
+    """
+    Normalise alpaca.trading.models.Order objects (status = filled) into a fills frame.
+    Rows missing any of symbol / side / qty / price / time are skipped.
+    """
+
+    rows = []
+
+    for o in filled_orders:
+        symbol = getattr(o, "symbol", None)
+        side_enum = getattr(o, "side", None)
+        filled_qty = getattr(o, "filled_qty", None) or getattr(o, "qty", None)
+        filled_price = getattr(o, "filled_avg_price", None) or getattr(o, "limit_price", None)
+        filled_at = getattr(o, "filled_at", None) or getattr(o, "updated_at", None)
+        order_id = getattr(o, "id", None)
+
+        if not (symbol and side_enum and filled_qty and filled_price and filled_at):
+            continue
+
+        side = getattr(side_enum, "value", str(side_enum)).lower()
+
+        try:
+            qty = float(filled_qty)
+            price = float(filled_price)
+        except (TypeError, ValueError):
+            continue
+
+        if qty <= 0:
+            continue
+
+        if not isinstance(filled_at, datetime):
+            # just in case, but alpaca already gives datetime
+            filled_at = datetime.fromisoformat(str(filled_at))
+
+        rows.append((symbol, side, qty, price, filled_at, order_id))
+
+    return pd.DataFrame(rows, columns=FILL_COLUMNS)
+
+
+def _prepare_fills(fills: pd.DataFrame) -> pd.DataFrame:
+    """clean + sort fills by symbol, then time, buys before sells on identical timestamps"""
+
+    df = fills[FILL_COLUMNS].copy()
+    df["side"] = df["side"].astype(str).str.lower()
+    df["qty"] = pd.to_numeric(df["qty"], errors="coerce")
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    df["time"] = pd.to_datetime(df["time"])
+
+    df = df[df["side"].isin(["buy", "sell"]) & (df["qty"] > 0) & df["price"].notna() & df["time"].notna()]
+
+    side_rank = (df["side"] == "sell").to_numpy()
+    order = np.lexsort((side_rank, df["time"].to_numpy(), df["symbol"].to_numpy()))
+    return df.iloc[order].reset_index(drop=True)
+
+
+def _clip_sells_to_position(sym_codes: np.ndarray, delta: np.ndarray) -> np.ndarray:
+    """
+    Running position floored at zero, per symbol, without a python loop.
+
+    pos_t = max(0, pos_{t-1} + delta_t) is the reflected walk S_t - min(0, min_{s<=t} S_s),
+    where S is the plain per-symbol cumulative sum.
+    """
+
+    s = pd.Series(delta).groupby(sym_codes).cumsum().to_numpy()
+    running_min = pd.Series(s).groupby(sym_codes).cummin().to_numpy()
+    return s - np.minimum(running_min, 0.0)
+
+
+# ======================= #
+#          FIFO           #
+# ======================= #
+
+def _match_fifo(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+
+    sym_codes = pd.factorize(df["symbol"], sort=True)[0]
+    is_buy = (df["side"] == "buy").to_numpy()
+    qty = df["qty"].to_numpy(dtype=float)
+
+    pos = _clip_sells_to_position(sym_codes, np.where(is_buy, qty, -qty))
+    pos_prev = np.where(
+        np.r_[True, sym_codes[1:] != sym_codes[:-1]],  # first fill of each symbol
+        0.0,
+        np.r_[0.0, pos[:-1]],
+    )
+    matched_qty = np.where(is_buy, qty, pos_prev - pos)  # sells: only what was actually held
+
+    buys = df[is_buy].reset_index(drop=True)
+    buy_sym = sym_codes[is_buy]
+    buy_end = np.round(pd.Series(qty[is_buy]).groupby(buy_sym).cumsum().to_numpy(), QTY_DECIMALS)
+
+    keep_sell = ~is_buy & (matched_qty > QTY_TOL)
+    sells = df[keep_sell].reset_index(drop=True)
+    sell_sym = sym_codes[keep_sell]
+    sell_end = np.round(pd.Series(matched_qty[keep_sell]).groupby(sell_sym).cumsum().to_numpy(), QTY_DECIMALS)
+
+    dropped = (qty[~is_buy] - matched_qty[~is_buy]).sum()
+    if dropped > QTY_TOL:
+        print(f"Dropped {dropped:g} sold shares with no matching buy in the window")
+
+    # every end point on every symbol's quantity axis, plus a zero start per symbol
+    all_syms = np.unique(sym_codes)
+    bp_sym = np.concatenate([all_syms, buy_sym, sell_sym])
+    bp_pos = np.concatenate([np.zeros(len(all_syms)), buy_end, sell_end])
+    bp_is_buy = np.concatenate([np.zeros(len(all_syms), bool), np.ones(len(buy_sym), bool), np.zeros(len(sell_sym), bool)])
+    bp_is_sell = np.concatenate([np.zeros(len(all_syms) + len(buy_sym), bool), np.ones(len(sell_sym), bool)])
+
+    order = np.lexsort((bp_pos, bp_sym))
+    bp_sym, bp_pos = bp_sym[order], bp_pos[order]
+
+    # lot covering the gap that starts at each end point = number of lot ends at or before it
+    buy_idx = np.cumsum(bp_is_buy[order])
+    sell_idx = np.cumsum(bp_is_sell[order])
+
+    seg_qty = np.round(np.diff(bp_pos), QTY_DECIMALS)
+    b, s = buy_idx[:-1], sell_idx[:-1]
+    valid = (bp_sym[:-1] == bp_sym[1:]) & (seg_qty > QTY_TOL) & (b < len(buys)) & (s < len(sells))
+    valid[valid] &= (buy_sym[b[valid]] == bp_sym[:-1][valid]) & (sell_sym[s[valid]] == bp_sym[:-1][valid])
+
+    seg_qty, b, s = seg_qty[valid], b[valid], s[valid]
+
+    round_trips = _build_round_trips(buys, sells, b, s, seg_qty)
+
+    remaining = np.round(buys["qty"].to_numpy() - np.bincount(b, weights=seg_qty, minlength=len(buys)), QTY_DECIMALS)
+    open_lots = _build_open_lots(buys, remaining)
+
+    return round_trips, open_lots
+
+
+# ======================= #
+#          LIFO           #
+# ======================= #
+
+def _match_lifo(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+
+    is_buy = (df["side"] == "buy").to_numpy()
+    qty = df["qty"].to_numpy(dtype=float)
+    symbols = df["symbol"].to_numpy()
+
+    buy_rows = np.flatnonzero(is_buy)
+    buy_pos = np.full(len(df), -1)
+    buy_pos[buy_rows] = np.arange(len(buy_rows))
+    remaining = qty[buy_rows].copy()
+
+    sell_rows = np.flatnonzero(~is_buy)
+    sell_pos = np.full(len(df), -1)
+    sell_pos[sell_rows] = np.arange(len(sell_rows))
+
+    b_out, s_out, q_out = [], [], []
+    stack: List[int] = []
+    dropped = 0.0
+
+    for i in range(len(df)):
+        if i > 0 and symbols[i] != symbols[i - 1]:
+            stack = []
+
+        if is_buy[i]:
+            stack.append(buy_pos[i])
+            continue
+
+        to_close = qty[i]
+        while to_close > QTY_TOL and stack:
+            j = stack[-1]
+            take = min(to_close, remaining[j])
+            b_out.append(j)
+            s_out.append(sell_pos[i])
+            q_out.append(take)
+            remaining[j] -= take
+            to_close -= take
+            if remaining[j] <= QTY_TOL:
+                stack.pop()
+        dropped += to_close
+
+    if dropped > QTY_TOL:
+        print(f"Dropped {dropped:g} sold shares with no matching buy in the window")
+
+    buys = df.iloc[buy_rows].reset_index(drop=True)
+    sells = df.iloc[sell_rows].reset_index(drop=True)
+
+    round_trips = _build_round_trips(
+        buys, sells,
+        np.asarray(b_out, dtype=int), np.asarray(s_out, dtype=int), np.asarray(q_out, dtype=float),
+    )
+    return round_trips, _build_open_lots(buys, remaining)
+
+
+# ======================= #
+#         OUTPUT          #
+# ======================= #
+
+def _build_round_trips(buys, sells, b, s, seg_qty) -> pd.DataFrame:
+
+    buy_price = buys["price"].to_numpy()[b]
+    sell_price = sells["price"].to_numpy()[s]
+    basis = buy_price * seg_qty
+    pnl_amount = (sell_price - buy_price) * seg_qty
+
+    round_trips = pd.DataFrame({
+        "symbol": buys["symbol"].iloc[b].to_numpy(),
+        "qty": seg_qty,
+        "buy_price": buy_price,
+        "sell_price": sell_price,
+        "buy_time": buys["time"].iloc[b].reset_index(drop=True),  # keeps timezone
+        "sell_time": sells["time"].iloc[s].reset_index(drop=True),
+        "pnl_amount": pnl_amount,
+        "pnl_percentage": (sell_price - buy_price) / buy_price,
+        "buy_order_id": buys["order_id"].iloc[b].to_numpy(),
+        "sell_order_id": sells["order_id"].iloc[s].to_numpy(),
+        "basis": basis,
+        "return_on_basis": pnl_amount / basis,
+    }, columns=ROUND_TRIP_COLUMNS)
+
+    return round_trips.sort_values(["sell_time", "symbol"], kind="mergesort").reset_index(drop=True)
+
+
+def _build_open_lots(buys, remaining) -> pd.DataFrame:
+
+    is_open = remaining > QTY_TOL
+    open_lots = buys.loc[is_open, ["symbol", "price", "time", "order_id"]].copy()
+    open_lots.insert(1, "qty", remaining[is_open])
+    open_lots.columns = OPEN_LOT_COLUMNS
+    return open_lots.reset_index(drop=True)
+
+
+def match_lots(fills: pd.DataFrame, method: str = "fifo") -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Match fills into round trips.
+
+    fills: frame with columns symbol, side, qty, price, time, order_id (see fills_from_orders)
+    method: 'fifo' (vectorised) or 'lifo' (per-symbol stack)
+
+    Returns (round_trips, open_lots). A fill split across several lots produces one
+    round trip row per (buy, sell) piece, so partial fills, scale-ins and scale-outs
+    are all kept.
+    """
+
+    if method not in ("fifo", "lifo"):
+        raise ValueError(f"Invalid method: {method}")
+
+    df = _prepare_fills(fills)
+
+    if df.empty:
+        return pd.DataFrame(columns=ROUND_TRIP_COLUMNS), pd.DataFrame(columns=OPEN_LOT_COLUMNS)
+
+    if method == "fifo":
+        return _match_fifo(df)
+    return _match_lifo(df)
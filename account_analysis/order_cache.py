@@ -0,0 +1,225 @@
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Local columnar cache of raw CLOSED orders (filled, canceled, expired, ...).
+
+- orders are normalised to plain columns (enums -> strings, decimals -> floats, times -> UTC)
+- one parquet file per month of submitted_at, upserts only rewrite the months they touch
+- deduplicated on order id, the latest fetch of an order wins
+
+Analysis runs read from here instead of alpaca, so they are offline and repeatable,
+and nothing is thrown away: cancel / expiry rates come from the same cache as fills.
+"""
+
+
+ORDER_COLUMNS = [
+    "id", "client_order_id", "symbol", "side", "order_type", "time_in_force", "status",
+    "qty", "notional", "filled_qty", "filled_avg_price", "limit_price", "stop_price",
+    "submitted_at", "filled_at", "canceled_at", "expired_at", "failed_at", "updated_at",
+]
+
+_STR_COLUMNS = ["id", "client_order_id", "symbol", "side", "order_type", "time_in_force", "status"]
+_LOWER_COLUMNS = ["side", "order_type", "time_in_force", "status"]
+_FLOAT_COLUMNS = ["qty", "notional", "filled_qty", "filled_avg_price", "limit_price", "stop_price"]
+_TIME_COLUMNS = ["submitted_at", "filled_at", "canceled_at", "expired_at", "failed_at", "updated_at"]
+
+
+def _enum_value(v):
+    return getattr(v, "value", v)
+
+
+def _to_utc(ts) -> Optional[pd.Timestamp]:
+    """naive datetimes are taken as UTC, the same way alpaca reads them"""
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def orders_to_frame(orders: Iterable[Any]) -> pd.DataFrame:
+    """alpaca.trading.models.Order objects -> normalised orders frame (any status)"""
+
+    rows = []
+    for o in orders:
+        rows.append({
+            "id": o.id,
+            "client_order_id": getattr(o, "client_order_id", None),
+            "symbol": getattr(o, "symbol", None),
+            "side": _enum_value(getattr(o, "side", None)),
+            "order_type": _enum_value(getattr(o, "order_type", None) or getattr(o, "type", None)),
+            "time_in_force": _enum_value(getattr(o, "time_in_force", None)),
+            "status": _enum_value(getattr(o, "status", None)),
+            **{c: getattr(o, c, None) for c in _FLOAT_COLUMNS + _TIME_COLUMNS},
+        })
+
+    return normalise_orders_frame(pd.DataFrame(rows, columns=ORDER_COLUMNS))
+
+
+def normalise_orders_frame(df: pd.DataFrame) -> pd.DataFrame:
+
+    df = df.reindex(columns=ORDER_COLUMNS)
+    for c in _STR_COLUMNS:
+        df[c] = df[c].astype("string")
+    for c in _LOWER_COLUMNS:
+        df[c] = df[c].str.lower()
+    for c in _FLOAT_COLUMNS:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(float)
+    for c in _TIME_COLUMNS:
+        df[c] = pd.to_datetime(df[c], utc=True)
+    return df
+
+
+class OrderCache:
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _partition_path(self, month: str) -> Path:
+        return self.cache_dir / f"orders_{month}.parquet"
+
+    def _partitions(self, after=None, until=None) -> List[Path]:
+        """month files overlapping [after, until]"""
+
+        lo = _to_utc(after).strftime("%Y-%m") if after is not None else None
+        hi = _to_utc(until).strftime("%Y-%m") if until is not None else None
+
+        paths = []
+        for p in sorted(self.cache_dir.glob("orders_*.parquet")):
+            month = p.stem.split("_", 1)[1]
+            if (lo is None or month >= lo) and (hi is None or month <= hi):
+                paths.append(p)
+        return paths
+
+    # ======================= #
+    #         WRITES          #
+    # ======================= #
+
+    def upsert(self, orders: Union[pd.DataFrame, Iterable[Any]]) -> int:
+        """add / replace orders (alpaca Order objects or a normalised frame), returns rows written"""
+
+        df = orders if isinstance(orders, pd.DataFrame) else orders_to_frame(orders)
+        df = normalise_orders_frame(df)
+        df = df[df["id"].notna() & df["submitted_at"].notna()]
+        if df.empty:
+            return 0
+
+        months = df["submitted_at"].dt.strftime("%Y-%m")
+        for month, new in df.groupby(months):
+            path = self._partition_path(month)
+            if path.exists():
+                new = pd.concat([pd.read_parquet(path), new], ignore_index=True)
+            new = (new.drop_duplicates("id", keep="last")
+                      .sort_values("submitted_at", ascending=False, kind="mergesort")
+                      .reset_index(drop=True))
+
+            # write next to the target and swap in, a crash never leaves a half-written month
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                new.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        return len(df)
+
+    # ======================= #
+    #          READS          #
+    # ======================= #
+
+    def latest_submitted_at(self) -> Optional[pd.Timestamp]:
+        paths = self._partitions()
+        if not paths:
+            return None
+        return pd.read_parquet(paths[-1], columns=["submitted_at"])["submitted_at"].max()
+
+    def load(
+        self,
+        after: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        statuses: Optional[List[str]] = None,
+        symbols: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,) -> pd.DataFrame:
+        """
+        Query cached orders submitted in [after, until], optionally filtered by status / symbol.
+        Filters are pushed down into the parquet reader, only the needed months are opened.
+        """
+
+        filters = []
+        if after is not None:
+            filters.append(("submitted_at", ">=", _to_utc(after)))
+        if until is not None:
+            filters.append(("submitted_at", "<=", _to_utc(until)))
+        if statuses:
+            filters.append(("status", "in", [s.lower() for s in statuses]))
+        if symbols:
+            filters.append(("symbol", "in", list(symbols)))
+
+        paths = self._partitions(after, until)
+        if not paths:
+            return normalise_orders_frame(pd.DataFrame(columns=ORDER_COLUMNS))[columns or ORDER_COLUMNS]
+
+        frames = [pd.read_parquet(p, columns=columns, filters=filters or None) for p in paths]
+        df = pd.concat(frames, ignore_index=True)
+        for c in _TIME_COLUMNS:
+            if c in df.columns:
+                df[c] = pd.to_datetime(df[c], utc=True)  # all-null columns come back untyped
+        if "submitted_at" in df.columns:
+            df = df.sort_values("submitted_at", ascending=False, kind="mergesort").reset_index(drop=True)
+        return df
+
+    def fills(self, after: Optional[datetime] = None, until: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        every order with filled_qty > 0 in lot_matching's fills format (symbol, side, qty, price,
+        time, order_id), whatever its status: a canceled / expired order can be partially filled
+        """
+
+        df = self.load(after=after, until=until)
+        df = df[df["filled_qty"] > 0]
+
+        fills = pd.DataFrame({
+            "symbol": df["symbol"],
+            "side": df["side"],
+            "qty": df["filled_qty"],
+            "price": df["filled_avg_price"].fillna(df["limit_price"]),
+            "time": df["filled_at"].fillna(df["updated_at"]),
+            "order_id": df["id"],
+        })
+        return fills.dropna(subset=["symbol", "side", "qty", "price", "time"]).reset_index(drop=True)
+
+
+# ======================= #
+#        ANALYSIS         #
+# ======================= #
+
+def status_rates(orders: pd.DataFrame, by: Optional[str] = "symbol") -> pd.DataFrame:
+    """
+    Order outcome counts and rates (fill / cancel / expire) per `by` column, or overall if by=None.
+    Any closed-order frame from OrderCache.load works.
+    """
+
+    if by:
+        counts = orders.groupby(by)["status"].value_counts().unstack(fill_value=0)
+    else:
+        counts = orders["status"].value_counts().to_frame("all").T
+
+    for status in ("filled", "canceled", "expired"):
+        if status not in counts.columns:
+            counts[status] = 0
+
+    counts["total"] = counts.drop(columns=["total"], errors="ignore").sum(axis=1)
+    counts["fill_rate"] = counts["filled"] / counts["total"]
+    counts["cancel_rate"] = counts["canceled"] / counts["total"]
+    counts["expire_rate"] = counts["expired"] / counts["total"]
+
+    return counts.sort_values("total", ascending=False)
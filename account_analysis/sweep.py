@@ -0,0 +1,204 @@
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from public.account_analysis.backtest import run_backtest
+from public.streamlit_app.metrics import compute_metrics, normalise_round_trips
+
+
+"""
+Parameter sweeps over the bot's settings (thresholds + buy_quantity), run in parallel.
+
+Each parameter point is one offline replay: model scores -> signals (scores_to_signals,
+using the point's thresholds) -> backtest.run_backtest (the bot's own decision rules)
+-> the dashboard's compute_metrics. One row per point goes into a results table.
+
+- points run in a process pool (all cores by default); the scores / prices are handed
+  to each worker once, in the pool initializer, not with every task
+- every point has a key (hash of its parameters + backtest settings + a fingerprint of the
+  scores / prices it ran on); rows already in
+  the results file are skipped, and results are saved as they come in, so an interrupted
+  sweep picks up where it stopped
+
+The signal engine is private, so historical scores come in as a long frame
+(time, ticker, score in [0, 1]) and scores_to_signals stands in for its threshold step.
+Pass signal_fn to use a different (module-level, picklable) mapping.
+"""
+
+
+RESULT_METRICS = ['num_trades', 'total_pnl', 'sharpe_capital', 'sharpe_dollar', 'max_drawdown_pct',
+                  'win_rate', 'profit_factor', 'mean_return_per_trade']
+
+
+def scores_to_signals(scores: pd.DataFrame, thresholds: Dict[str, float]) -> pd.DataFrame:
+    """
+    BUY at score >= decision_threshold, SELL at score <= sell_threshold
+    (default 1 - decision_threshold), HOLD in between.
+    """
+
+    buy_at = thresholds.get('decision_threshold', 0.7)
+    sell_at = thresholds.get('sell_threshold', 1 - buy_at)
+
+    signals = scores[['time', 'ticker']].copy()
+    signals['signal'] = np.select(
+        [scores['score'] >= buy_at, scores['score'] <= sell_at], ['BUY', 'SELL'], default='HOLD'
+    )
+    return signals
+
+
+# ======================= #
+#     PARAMETER POINTS    #
+# ======================= #
+
+def grid_points(thresholds: Dict[str, List[float]], buy_quantity: List[float]) -> List[Dict[str, Any]]:
+    """every combination, e.g. grid_points({'decision_threshold': [0.6, 0.7]}, [100, 200])"""
+
+    names = sorted(thresholds)
+    return [
+        {'thresholds': dict(zip(names, values)), 'buy_quantity': quantity}
+        for *values, quantity in itertools.product(*(thresholds[n] for n in names), buy_quantity)
+    ]
+
+
+def random_points(thresholds: Dict[str, Any], buy_quantity: Any, n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    n random points. Each range is either a list (pick one) or a (low, high) tuple (uniform,
+    thresholds rounded to 3dp, buy_quantity to whole dollars so points can repeat / cache).
+    """
+
+    rng = np.random.default_rng(seed)
+
+    def draw(space, decimals):
+        if isinstance(space, tuple):
+            return round(float(rng.uniform(*space)), decimals)
+        return space[rng.integers(len(space))]
+
+    return [
+        {'thresholds': {name: draw(thresholds[name], 3) for name in sorted(thresholds)},
+         'buy_quantity': draw(buy_quantity, 0)}
+        for _ in range(n)
+    ]
+
+
+def data_fingerprint(*frames: pd.DataFrame) -> str:
+    """hash of the frames' values, index and columns, so results from other inputs aren't reused"""
+
+    digest = hashlib.sha1()
+    for df in frames:
+        digest.update(json.dumps([str(c) for c in df.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def point_key(point: Dict[str, Any], settings: Dict[str, Any]) -> str:
+    payload = json.dumps({'point': point, 'settings': settings}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+# ======================= #
+#         WORKER          #
+# ======================= #
+
+_WORKER_DATA = {}
+
+
+def _init_worker(scores, prices, settings):
+    _WORKER_DATA['scores'] = scores
+    _WORKER_DATA['prices'] = prices
+    _WORKER_DATA['settings'] = settings
+
+
+def _run_point(key: str, point: Dict[str, Any]) -> Dict[str, Any]:
+
+    settings = _WORKER_DATA['settings']
+    signal_fn = settings['signal_fn'] or scores_to_signals
+    signals = signal_fn(_WORKER_DATA['scores'], point['thresholds'])
+
+    result = run_backtest(signals, _WORKER_DATA['prices'], buy_quantity=point['buy_quantity'],
+                          **settings['backtest_kwargs'])
+    round_trips = result['round_trips']
+
+    row = {'key': key, **point['thresholds'], 'buy_quantity': point['buy_quantity']}
+    if round_trips.empty:
+        return {**row, **{m: np.nan for m in RESULT_METRICS}, 'num_trades': 0}
+
+    metrics = compute_metrics(normalise_round_trips(round_trips), settings['capital'])
+    metrics['total_pnl'] = metrics['gross_profit'] - metrics['gross_loss']
+    return {**row, **{m: float(metrics[m]) for m in RESULT_METRICS}}
+
+
+# ======================= #
+#          SWEEP          #
+# ======================= #
+
+def load_results(results_path: Union[str, Path]) -> pd.DataFrame:
+    path = Path(results_path)
+    return pd.read_parquet(path) if path.exists() else pd.DataFrame(columns=['key'])
+
+
+def _save_results(df: pd.DataFrame, results_path: Path):
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=results_path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, results_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def run_sweep(scores: pd.DataFrame, prices: pd.DataFrame, points: List[Dict[str, Any]],
+              results_path: Union[str, Path], capital: float = 5000, max_workers: Optional[int] = None,
+              signal_fn: Optional[Callable] = None, save_every: int = 10, **backtest_kwargs) -> pd.DataFrame:
+    """
+    Run every point not already in results_path, in parallel, and return the full results
+    table (one row per point: key, thresholds, buy_quantity, RESULT_METRICS), best
+    sharpe_capital first.
+
+    backtest_kwargs go to run_backtest (fill_delay, fractional, slippage_bps ...);
+    they are part of the cache key, as are capital and the scores / prices (data_fingerprint).
+    """
+
+    results_path = Path(results_path)
+    settings = {'capital': capital, 'signal_fn': signal_fn, 'backtest_kwargs': backtest_kwargs}
+    key_settings = {'capital': capital, 'signal_fn': getattr(signal_fn, '__name__', None),
+                    'data': data_fingerprint(scores, prices), **backtest_kwargs}
+
+    results = load_results(results_path)
+    done = set(results['key'])
+    todo = {}
+    for point in points:
+        key = point_key(point, key_settings)
+        if key not in done:
+            todo[key] = point
+
+    print(f"Sweep: {len(points)} points, {len(points) - len(todo)} cached, {len(todo)} to run")
+
+    rows = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(scores, prices, settings)) as pool:
+            futures = {pool.submit(_run_point, key, point): key for key, point in todo.items()}
+            for i, future in enumerate(as_completed(futures), 1):
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    print(f"Sweep point {futures[future]} failed: {e}")
+                if i % save_every == 0 or i == len(futures):
+                    results = pd.concat([results, pd.DataFrame(rows)], ignore_index=True) if rows else results
+                    rows = []
+                    _save_results(results, results_path)
+                    print(f"Sweep: {i}/{len(futures)} done")
+
+    if 'sharpe_capital' not in results:
+        return results
+    return results.sort_values('sharpe_capital', ascending=False, na_position='last').reset_index(drop=True)
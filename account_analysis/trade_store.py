@@ -0,0 +1,217 @@
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+import pandas as pd
+
+
+"""
+SQLite store for round trips, replaces read-whole-csv / isin / rewrite-whole-csv.
+
+- one row per (buy_order_id, sell_order_id): with lot matching a buy can be closed by
+  several sells, so the buy id alone is not unique
+- upserts only touch the new rows, inside a single transaction, so a crash mid-write
+  leaves the previous state intact
+- WAL journal, so the dashboard can read while the fetcher writes
+- rows imported from the old csv have no sell id (''), they are replaced as soon as
+  the same buy comes back from alpaca with its real sell id
+- every write stamps the rows it touches with a new change_seq (one per transaction), and
+  the keys of rows it deletes go into round_trip_deletions with that seq, so a reader can
+  follow inserts, updates and deletes with `change_seq > last seen` (streamlit_app/live_feed.py)
+
+The csv files are now just exports (public / private projections) for the dashboard.
+"""
+
+
+PRIVATE_COLUMNS = ['qty', 'buy_price', 'sell_price', 'buy_time', 'sell_time',
+                   'pnl_amount', 'pnl_percentage', 'buy_order_id', 'sell_order_id',
+                   'return_on_basis', 'basis']
+
+PUBLIC_COLUMNS = ['sell_time', 'buy_time',
+                  'pnl_amount', 'pnl_percentage',
+                  'basis', 'buy_order_id']
+
+STORE_COLUMNS = ['buy_order_id', 'sell_order_id', 'symbol', 'qty', 'buy_price', 'sell_price',
+                 'buy_time', 'sell_time', 'pnl_amount', 'pnl_percentage', 'basis', 'return_on_basis']
+
+TIME_COLUMNS = ['buy_time', 'sell_time']
+
+
+class TradeStore:
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._create_table()
+
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        return con
+
+    def _create_table(self):
+        con = self._connect()
+        with con:
+            con.execute("""
+                        CREATE TABLE IF NOT EXISTS round_trips (
+                            buy_order_id TEXT NOT NULL,
+                            sell_order_id TEXT NOT NULL DEFAULT '',
+                            symbol TEXT,
+                            qty REAL,
+                            buy_price REAL,
+                            sell_price REAL,
+                            buy_time TEXT,
+                            sell_time TEXT,
+                            pnl_amount REAL,
+                            pnl_percentage REAL,
+                            basis REAL,
+                            return_on_basis REAL,
+                            change_seq INTEGER NOT NULL DEFAULT 0,
+                            PRIMARY KEY (buy_order_id, sell_order_id)
+                        )
+                        """)
+            # stores created before change_seq existed
+            columns = {row[1] for row in con.execute("PRAGMA table_info(round_trips)")}
+            if 'change_seq' not in columns:
+                con.execute("ALTER TABLE round_trips ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+            con.execute("""
+                        CREATE TABLE IF NOT EXISTS round_trip_deletions (
+                            buy_order_id TEXT NOT NULL,
+                            sell_order_id TEXT NOT NULL,
+                            change_seq INTEGER NOT NULL
+                        )
+                        """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_round_trips_sell_time ON round_trips (sell_time)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_round_trips_change_seq ON round_trips (change_seq)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_round_trip_deletions_change_seq ON round_trip_deletions (change_seq)")
+        con.close()
+
+    def count(self) -> int:
+        con = self._connect()
+        n = con.execute("SELECT COUNT(*) FROM round_trips").fetchone()[0]
+        con.close()
+        return n
+
+    # ======================= #
+    #         WRITES          #
+    # ======================= #
+
+    @staticmethod
+    def _to_rows(trades: Union[pd.DataFrame, List[Dict[str, Any]]]) -> List[tuple]:
+
+        df = pd.DataFrame(trades).reindex(columns=STORE_COLUMNS)
+        if df.empty:
+            return []
+
+        df['buy_order_id'] = df['buy_order_id'].astype(str)
+        df['sell_order_id'] = df['sell_order_id'].fillna('').astype(str)
+        for col in TIME_COLUMNS:
+            df[col] = pd.to_datetime(df[col], utc=True).map(lambda t: t.isoformat() if pd.notna(t) else None)
+
+        df = df.astype(object).where(df.notna(), None)
+        return list(df.itertuples(index=False, name=None))
+
+    def upsert_round_trips(self, trades: Union[pd.DataFrame, List[Dict[str, Any]]]) -> int:
+        """insert or update round trips keyed on (buy_order_id, sell_order_id), returns rows written"""
+
+        rows = self._to_rows(trades)
+        if not rows:
+            return 0
+
+        columns = STORE_COLUMNS + ['change_seq']
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns[2:])
+
+        con = self._connect()
+        with con:
+            seq = con.execute("""
+                              SELECT MAX(COALESCE((SELECT MAX(change_seq) FROM round_trips), 0),
+                                         COALESCE((SELECT MAX(change_seq) FROM round_trip_deletions), 0)) + 1
+                              """).fetchone()[0]
+
+            # legacy csv rows (no sell id) are superseded by the full row
+            superseded = [(r[0], r[1]) for r in rows]
+            con.executemany(
+                """
+                INSERT INTO round_trip_deletions (buy_order_id, sell_order_id, change_seq)
+                SELECT buy_order_id, sell_order_id, ? FROM round_trips
+                WHERE buy_order_id = ? AND sell_order_id = '' AND ? != ''
+                """,
+                [(seq, b, s) for b, s in superseded],
+            )
+            con.executemany(
+                "DELETE FROM round_trips WHERE buy_order_id = ? AND sell_order_id = '' AND ? != ''",
+                superseded,
+            )
+            con.executemany(f"""
+                            INSERT INTO round_trips ({", ".join(columns)})
+                            VALUES ({placeholders})
+                            ON CONFLICT (buy_order_id, sell_order_id) DO UPDATE SET {updates}
+                            """, [r + (seq,) for r in rows])
+        con.close()
+
+        return len(rows)
+
+    def import_csv(self, csv_path: Union[str, Path]) -> int:
+        """one-off migration of an existing trades csv (public or private columns)"""
+
+        try:
+            existing = pd.read_csv(csv_path)
+        except FileNotFoundError:
+            print(f"{csv_path} not found, nothing to import")
+            return 0
+
+        n = self.upsert_round_trips(existing)
+        print(f"Imported {n} trades from {csv_path}")
+        return n
+
+    # ======================= #
+    #          READS          #
+    # ======================= #
+
+    def read(self, public: bool = False, since: str = None) -> pd.DataFrame:
+        """all round trips (optionally sold on/after `since`), projected to the public or private columns"""
+
+        columns = PUBLIC_COLUMNS if public else PRIVATE_COLUMNS
+
+        query = f"SELECT {', '.join(columns)} FROM round_trips"
+        params: tuple = ()
+        if since is not None:
+            query += " WHERE sell_time >= ?"
+            params = (since,)
+        query += " ORDER BY sell_time"
+
+        con = self._connect()
+        df = pd.read_sql_query(query, con, params=params)
+        con.close()
+
+        if 'sell_order_id' in df.columns:
+            df['sell_order_id'] = df['sell_order_id'].replace('', None)
+        return df
+
+    def export_csv(self, csv_path: Union[str, Path], public: bool = False) -> pd.DataFrame:
+        """
+        Write the projection to csv in the dashboard format (dates as YYYY-MM-DD).
+        Written to a temp file and swapped in, so readers never see a half-written file.
+        """
+
+        df = self.read(public=public)
+        for col in TIME_COLUMNS:
+            df[col] = pd.to_datetime(df[col], format="ISO8601", utc=True).dt.strftime("%Y-%m-%d")
+
+        csv_path = Path(csv_path)
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=csv_path.parent, prefix=f".{csv_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                df.to_csv(f, index=False)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+            os.replace(tmp_path, csv_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        print(f"Exported {len(df)} trades to {csv_path}")
+        return df
@@ -0,0 +1,190 @@
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Local store of historical bars, so price lookups and research read from disk instead of
+sending a StockBarsRequest every time.
+
+LAYOUT: <root>/<timeframe>/<SYMBOL>/<column>.bin, one raw little-endian array per column
+    timestamp   int64, ns since epoch (UTC), strictly increasing
+    open, high, low, close, volume, vwap, trade_count   float64
+
+- columns are opened with np.memmap, so nothing is loaded until it's touched
+- the sorted timestamp column is the index: a date range is two searchsorted calls
+  on the memmap, and the slice of every column is a view of the file (zero copy)
+- appends only add bars newer than the last stored one, written to the end of each
+  column file; the timestamp column is written last, so its length is the number of
+  committed bars and a half-finished append (crash) is trimmed off on the next one
+- appends to the same symbol are serialised by a per-symbol lock (the bot's hedged price
+  lookups can top up one symbol from two threads); this only covers one process
+"""
+
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'vwap', 'trade_count']
+TIME_COLUMN = 'timestamp'
+
+_DTYPES = {TIME_COLUMN: np.dtype('<i8'), **{c: np.dtype('<f8') for c in BAR_COLUMNS}}
+
+
+def _to_ns(t) -> int:
+    ts = pd.Timestamp(t)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.value)
+
+
+def bars_to_frame(bars) -> pd.DataFrame:
+    """alpaca Bar objects (a BarSet's list for one symbol) -> frame with timestamp + BAR_COLUMNS"""
+
+    return pd.DataFrame(
+        [{TIME_COLUMN: b.timestamp, **{c: getattr(b, c, None) for c in BAR_COLUMNS}} for b in bars],
+        columns=[TIME_COLUMN] + BAR_COLUMNS,
+    )
+
+
+class BarStore:
+
+    def __init__(self, root: Union[str, Path], timeframe: str = "1Min"):
+        self.root = Path(root) / timeframe
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _dir(self, symbol: str) -> Path:
+        return self.root / symbol.upper().replace("/", "_")
+
+    def _path(self, symbol: str, column: str) -> Path:
+        return self._dir(symbol) / f"{column}.bin"
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        key = self._dir(symbol).name
+        with self._locks_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def symbols(self):
+        return sorted(p.name for p in self.root.iterdir() if (p / f"{TIME_COLUMN}.bin").exists())
+
+    # ======================= #
+    #          READ           #
+    # ======================= #
+
+    def count(self, symbol: str) -> int:
+        path = self._path(symbol, TIME_COLUMN)
+        return path.stat().st_size // _DTYPES[TIME_COLUMN].itemsize if path.exists() else 0
+
+    def _column(self, symbol: str, column: str, n: int) -> np.ndarray:
+        """first n values of a column as a read-only memmap (an empty array if there are none)"""
+        if n == 0:
+            return np.empty(0, dtype=_DTYPES[column])
+        return np.memmap(self._path(symbol, column), dtype=_DTYPES[column], mode='r', shape=(n,))
+
+    def last_timestamp(self, symbol: str) -> Optional[pd.Timestamp]:
+        n = self.count(symbol)
+        if n == 0:
+            return None
+        return pd.Timestamp(int(self._column(symbol, TIME_COLUMN, n)[-1]), tz='UTC')
+
+    def _bounds(self, timestamps: np.ndarray, start, end):
+        lo = 0 if start is None else int(np.searchsorted(timestamps, _to_ns(start), side='left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, _to_ns(end), side='right'))
+        return lo, hi
+
+    def slice(self, symbol: str, start=None, end=None, columns: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Bars in [start, end] as memmap views, {column: array} including 'timestamp' (ns UTC).
+        Nothing is copied or read until the arrays are used.
+        """
+
+        n = self.count(symbol)
+        timestamps = self._column(symbol, TIME_COLUMN, n)
+        lo, hi = self._bounds(timestamps, start, end)
+
+        out = {TIME_COLUMN: timestamps[lo:hi]}
+        for column in (columns or BAR_COLUMNS):
+            out[column] = self._column(symbol, column, n)[lo:hi]
+        return out
+
+    def read(self, symbol: str, start=None, end=None, columns: Iterable[str] = None) -> pd.DataFrame:
+        """bars in [start, end] as a DataFrame indexed by timestamp (this copies the slice)"""
+
+        sliced = self.slice(symbol, start, end, columns)
+        index = pd.to_datetime(np.asarray(sliced.pop(TIME_COLUMN)), utc=True)
+        return pd.DataFrame({c: np.asarray(v) for c, v in sliced.items()}, index=index).rename_axis(TIME_COLUMN)
+
+    def last_bar(self, symbol: str, start=None, end=None) -> Optional[Dict[str, float]]:
+        """the latest bar in [start, end], or None"""
+
+        sliced = self.slice(symbol, start, end)
+        if len(sliced[TIME_COLUMN]) == 0:
+            return None
+        bar = {c: float(v[-1]) for c, v in sliced.items() if c != TIME_COLUMN}
+        bar[TIME_COLUMN] = pd.Timestamp(int(sliced[TIME_COLUMN][-1]), tz='UTC')
+        return bar
+
+    def price_panel(self, symbols: Iterable[str] = None, start=None, end=None, column: str = 'close') -> pd.DataFrame:
+        """wide frame (time x symbol) of one column, e.g. for account_analysis.backtest"""
+
+        series = {
+            symbol: self.read(symbol, start, end, columns=[column])[column]
+            for symbol in (symbols or self.symbols())
+        }
+        panel = pd.DataFrame(series).sort_index()
+        panel.index.name = None
+        return panel
+
+    # ======================= #
+    #         APPEND          #
+    # ======================= #
+
+    def append(self, symbol: str, bars: pd.DataFrame) -> int:
+        """
+        Append bars (frame with 'timestamp' + any of BAR_COLUMNS, missing ones stored as nan).
+        Only bars newer than the last stored one are written; returns how many.
+        """
+
+        if bars is None or len(bars) == 0:
+            return 0
+
+        with self._symbol_lock(symbol):
+            directory = self._dir(symbol)
+            directory.mkdir(parents=True, exist_ok=True)
+            n = self.count(symbol)
+
+            timestamps = pd.to_datetime(bars[TIME_COLUMN], utc=True).to_numpy(dtype='datetime64[ns]').astype('int64')
+            order = np.argsort(timestamps, kind='stable')
+            timestamps = timestamps[order]
+
+            # keep the last of any duplicates, and only what's newer than the store
+            keep = np.append(timestamps[1:] != timestamps[:-1], True)
+            if n:
+                keep &= timestamps > int(self._column(symbol, TIME_COLUMN, n)[-1])
+            if not keep.any():
+                return 0
+            rows = order[keep]
+
+            for column in BAR_COLUMNS:
+                values = (pd.to_numeric(bars[column], errors='coerce').to_numpy(dtype='<f8')[rows]
+                          if column in bars else np.full(len(rows), np.nan))
+                self._append_column(symbol, column, values, n)
+
+            # timestamps last: their length is what readers take as committed
+            self._append_column(symbol, TIME_COLUMN, timestamps[keep].astype('<i8'), n)
+            return int(keep.sum())
+
+    def _append_column(self, symbol: str, column: str, values: np.ndarray, committed: int):
+        path = self._path(symbol, column)
+        with open(path, 'ab') as f:
+            # drop anything past the committed length (left by an interrupted append)
+            size = committed * _DTYPES[column].itemsize
+            if f.tell() != size:
+                f.truncate(size)
+                f.seek(size)
+            f.write(values.astype(_DTYPES[column], copy=False).tobytes())
@@ -0,0 +1,170 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+"""
+Logging for the bot: JSON lines, written off the hot path.
+
+- the calling thread only does a non-blocking put onto an unbounded queue (QueueHandler);
+  a background QueueListener thread formats and writes to stdout / file
+- every record carries the current cycle_id (a contextvar set once per main_loop cycle),
+  so all the lines from one cycle can be pulled out together
+- per-ticker debug lines are logged with extra={"sampled": True}; only `debug_sample_rate`
+  of those are kept, and the rest are dropped before they reach the queue
+- levels can be set per module: setup_logging(module_levels={"public.trading_bot": "DEBUG"})
+  or BOT_LOG_LEVELS="public.trading_bot=DEBUG,alpaca=WARNING"
+
+Anything passed in `extra` ends up as a field of the JSON line.
+"""
+
+
+cycle_id_var = contextvars.ContextVar("cycle_id", default=None)
+
+# LogRecord attributes that aren't user fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "cycle_id", "sampled"}
+
+_listener = None
+
+
+def new_cycle_id() -> str:
+    """start a new correlation id for everything logged from here on (in this context)"""
+    cycle_id = uuid.uuid4().hex[:12]
+    cycle_id_var.set(cycle_id)
+    return cycle_id
+
+
+# ======================= #
+#   FILTERS / FORMATTER   #
+# ======================= #
+
+class CycleContextFilter(logging.Filter):
+    """stamps the cycle id on the record in the calling thread (the listener thread has no context)"""
+
+    def filter(self, record):
+        record.cycle_id = cycle_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """keeps `rate` of the records logged with extra={"sampled": True}, everything else passes"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        line = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "cycle_id": getattr(record, "cycle_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                line[key] = value
+        if record.exc_text:
+            line["exc"] = record.exc_text
+        elif record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    The stock prepare() bakes the formatted text (and traceback) into msg; this keeps
+    the fields separate so the JSON formatter on the listener side still sees them.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# ======================= #
+#          SETUP          #
+# ======================= #
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = "INFO", module_levels: Optional[Dict[str, str]] = None,
+                  log_path: Optional[str] = None, debug_sample_rate: float = 0.01):
+    """
+    Route all logging through a background queue. Safe to call again (replaces the old setup).
+
+    level: root level
+    module_levels: {logger name: level}, merged over BOT_LOG_LEVELS from the environment
+    log_path: also write JSON lines to this file (rotated at 50MB, 5 kept)
+    debug_sample_rate: fraction of the sampled per-ticker lines to keep
+    """
+
+    global _listener
+    stop_logging()
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_path:
+        handlers.append(logging.handlers.RotatingFileHandler(log_path, maxBytes=50 * 1024 * 1024, backupCount=5))
+    for handler in handlers:
+        handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(CycleContextFilter())
+    queue_handler.addFilter(SamplingFilter(debug_sample_rate))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    levels = _parse_levels(os.environ.get("BOT_LOG_LEVELS", ""))
+    levels.update({name: lvl.upper() for name, lvl in (module_levels or {}).items()})
+    for name, lvl in levels.items():
+        logging.getLogger(name).setLevel(lvl)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """flush whatever is queued and stop the writer thread"""
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
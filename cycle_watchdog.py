@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from public.bot_logging import cycle_id_var
+
+
+"""
+Watchdog around one bot cycle (TradingBot.main_loop).
+
+- each cycle has a deadline (seconds from the start); phases are timed as they run, and a
+  cycle that finishes past its deadline is logged as an overrun, blaming the slowest phase
+- phases can have their own timeout: the phase then runs in a daemon thread and the cycle
+  stops waiting for it after `timeout` (or whatever is left of the deadline, if less).
+  Python can't kill a thread, so a timed-out phase is abandoned. It may still be placing
+  orders or writing the holdings table / order book, so no phase at all (timed or not)
+  starts until that thread has actually finished: later cycles are skipped meanwhile
+- load shedding: execute_action_plan asks should_shed() before placing buys; once the cycle
+  is past its deadline (less `shed_margin_s`), the remaining buys are dropped for this cycle.
+  Cancels and sells always run. Nothing is queued: if the signal is still BUY next cycle,
+  the plan simply has the buy again
+
+    watchdog.start()
+    watchdog.run_phase("signals", fn)
+    ...
+    report = watchdog.finish()
+"""
+
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimeout(Exception):
+    """a phase ran past its timeout (or the cycle deadline) and was abandoned"""
+
+
+class PhaseStillRunning(Exception):
+    """a phase abandoned in an earlier cycle hasn't finished yet, so no phase was started"""
+
+
+class CycleWatchdog:
+
+    def __init__(self, deadline_s: float = 240, phase_timeouts: Optional[Dict[str, float]] = None,
+                 shed_margin_s: float = 0, history: int = 100):
+        """
+        deadline_s: cycle budget in seconds
+        phase_timeouts: {phase name: seconds}; phases not listed run inline with no timeout
+        shed_margin_s: start shedding buys this long before the deadline
+        history: how many cycle reports to keep (self.history)
+        """
+
+        self.deadline_s = deadline_s
+        self.phase_timeouts = dict(phase_timeouts or {})
+        self.shed_margin_s = shed_margin_s
+        self.history = deque(maxlen=history)
+
+        self._abandoned = {}  # phase name -> thread still running from an earlier cycle
+        self._reset()
+
+    def _reset(self):
+        self.cycle_start = None
+        self.phases = {}
+        self.timed_out = []
+        self.shed = {}
+
+    # ======================= #
+    #          CYCLE          #
+    # ======================= #
+
+    def start(self):
+        self._reset()
+        self.cycle_start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return 0.0 if self.cycle_start is None else time.monotonic() - self.cycle_start
+
+    def remaining(self) -> float:
+        return self.deadline_s - self.elapsed()
+
+    def over_budget(self) -> bool:
+        return self.cycle_start is not None and self.remaining() <= 0
+
+    def should_shed(self) -> bool:
+        """true once the cycle is within shed_margin_s of its deadline (or past it)"""
+        return self.cycle_start is not None and self.remaining() <= self.shed_margin_s
+
+    def record_shed(self, kind: str, count: int, **fields):
+        self.shed[kind] = self.shed.get(kind, 0) + count
+        logger.warning("Shedding load", extra={"kind": kind, "count": count,
+                                               "elapsed_s": round(self.elapsed(), 3), **fields})
+
+    def finish(self) -> Dict[str, Any]:
+        """close the cycle: log it (as a warning if it overran) and return its report"""
+
+        duration = self.elapsed()
+        blame = max(self.phases, key=self.phases.get) if self.phases else None
+        report = {
+            "cycle_id": cycle_id_var.get(),
+            "duration_s": round(duration, 3),
+            "deadline_s": self.deadline_s,
+            "overrun": duration > self.deadline_s,
+            "phases": {name: round(s, 3) for name, s in self.phases.items()},
+            "timed_out": list(self.timed_out),
+            "shed": dict(self.shed),
+            "blame": blame,
+        }
+        self.history.append(report)
+
+        if report["overrun"] or report["timed_out"]:
+            logger.warning("Cycle overrun", extra={k: v for k, v in report.items() if k != "cycle_id"})
+        else:
+            logger.info("Cycle timings", extra={"duration_s": report["duration_s"], "phases": report["phases"]})
+
+        self._reset()
+        return report
+
+    def still_running(self) -> List[str]:
+        """phases abandoned in earlier cycles whose threads haven't finished yet"""
+        self._abandoned = {name: t for name, t in self._abandoned.items() if t.is_alive()}
+        return sorted(self._abandoned)
+
+    @property
+    def overruns(self):
+        return [r for r in self.history if r["overrun"] or r["timed_out"]]
+
+    # ======================= #
+    #         PHASES          #
+    # ======================= #
+
+    @contextmanager
+    def phase(self, name: str):
+        """time a block as a phase (no timeout)"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.monotonic() - start
+
+    def run_phase(self, name: str, fn: Callable, *args, **kwargs):
+        """
+        Run fn as a timed phase and return its result. With a timeout for this phase, fn runs
+        in a daemon thread and PhaseTimeout is raised if it isn't done in time. While any
+        abandoned phase is still running, PhaseStillRunning is raised instead and fn isn't run.
+        """
+
+        running = self.still_running()
+        if running:
+            self.timed_out.append(name)
+            raise PhaseStillRunning(f"Phase {', '.join(running)} from an earlier cycle is still running, {name} not started")
+
+        timeout = self.phase_timeouts.get(name)
+        if timeout is None:
+            with self.phase(name):
+                return fn(*args, **kwargs)
+
+        if self.cycle_start is not None:
+            timeout = max(0.0, min(timeout, self.remaining()))
+
+        outcome = {}
+        cycle_id = cycle_id_var.get()
+
+        def target():
+            cycle_id_var.set(cycle_id)  # keep the thread's log lines on this cycle
+            try:
+                outcome["result"] = fn(*args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, name=f"phase-{name}", daemon=True)
+        with self.phase(name):
+            thread.start()
+            thread.join(timeout)
+
+        if thread.is_alive():
+            self._abandoned[name] = thread
+            self.timed_out.append(name)
+            raise PhaseTimeout(f"Phase {name} timed out after {timeout:.1f}s")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+
+"""
+The signal x position_state decision table, shared by the live bot (trading_bot.py)
+and the backtest (account_analysis/backtest.py), so both act on exactly the same rules.
+
+ACTIONS:
+    noop          nothing to do
+    buy           place a buy market order (sized from buy_quantity)
+    sell          sell the current holding
+    cancel        cancel the open order
+    cancel_buy    cancel the open order, then buy
+    cancel_sell   cancel the open order, then sell the current holding
+    alert         can't reconcile this state, report it
+
+Any (signal, state) pair not in the table is a noop (e.g. the short states under SELL),
+and any unknown signal is an alert, as in the original if / elif chain.
+
+action_plan() applies the table to a whole holdings snapshot at once, giving one row per
+ticker; TradingBot.execute_action_plan runs (or, in dry run, just reports) that plan.
+"""
+
+
+SIGNALS = ('BUY', 'HOLD', 'SELL')
+
+POSITION_STATES = (
+    'CLOSED', 'OPEN', 'OPENING', 'PARTIAL FILL', 'CLOSING',
+    'SHORTING', 'SHORT_OPEN', 'MORE_SHORTING', 'FIXING_SHORT', 'ERROR',
+)
+
+ACTIONS = ('noop', 'buy', 'sell', 'cancel', 'cancel_buy', 'cancel_sell', 'alert')
+
+DECISION_RULES = {
+    # BUY: get to a long position
+    ('BUY', 'OPEN'): 'noop',
+    ('BUY', 'OPENING'): 'noop',
+    ('BUY', 'PARTIAL FILL'): 'noop',
+    ('BUY', 'FIXING_SHORT'): 'noop',
+    ('BUY', 'CLOSED'): 'buy',
+    ('BUY', 'CLOSING'): 'cancel_buy',
+    ('BUY', 'ERROR'): 'alert',
+
+    # HOLD: keep what we have, drop anything pending
+    ('HOLD', 'OPEN'): 'noop',
+    ('HOLD', 'CLOSED'): 'noop',
+    ('HOLD', 'FIXING_SHORT'): 'noop',
+    ('HOLD', 'OPENING'): 'cancel',
+    ('HOLD', 'PARTIAL FILL'): 'cancel',
+    ('HOLD', 'CLOSING'): 'cancel',
+    ('HOLD', 'ERROR'): 'alert',
+
+    # SELL: get flat
+    ('SELL', 'CLOSED'): 'noop',
+    ('SELL', 'CLOSING'): 'noop',
+    ('SELL', 'FIXING_SHORT'): 'noop',
+    ('SELL', 'OPEN'): 'sell',
+    ('SELL', 'OPENING'): 'cancel',
+    ('SELL', 'PARTIAL FILL'): 'cancel_sell',
+    ('SELL', 'ERROR'): 'alert',
+}
+
+# signal priority when one asset has several holdings rows: SELL beats BUY beats HOLD
+SIGNAL_PRIORITY = {'HOLD': 0, 'BUY': 1, 'SELL': 2}
+
+
+def compile_signals(signals) -> str:
+    """occasionally, assets might have multiple rows in holdings, with differing signals, this compiles them into a single signal"""
+
+    if "SELL" in signals:
+        return "SELL"
+    elif "BUY" in signals:
+        return "BUY"
+    else:
+        return "HOLD"
+
+
+def compile_signals_frame(df: pd.DataFrame, by, signal_col: str = 'signal') -> pd.Series:
+    """
+    compile_signals for every group at once (e.g. by=['time', 'ticker'] for a signal history).
+    Anything that isn't BUY / SELL counts as HOLD, as in compile_signals.
+    """
+
+    priority = df[signal_col].map(SIGNAL_PRIORITY).fillna(0).astype(int)
+    compiled = priority.groupby([df[c] for c in ([by] if isinstance(by, str) else by)]).max()
+    return compiled.map({v: k for k, v in SIGNAL_PRIORITY.items()}).rename(signal_col)
+
+
+def decide(signal: str, position_state: str) -> str:
+    """the action for one asset"""
+
+    if signal not in SIGNALS:
+        return 'alert'
+    return DECISION_RULES.get((signal, position_state), 'noop')
+
+
+# (signal, state) -> action code lookup, for deciding a whole array of assets at once
+_ACTION_TABLE = np.array([
+    [ACTIONS.index(decide(signal, state)) for state in POSITION_STATES] for signal in SIGNALS
+])
+
+
+def decide_array(signals, position_states) -> np.ndarray:
+    """
+    Vectorised decide(): arrays of signals and position states in, array of actions out.
+    Unknown states are noop and unknown signals alert, as in decide().
+    """
+
+    signals = np.asarray(signals, dtype=object)
+    position_states = np.asarray(position_states, dtype=object)
+
+    sig_idx = pd.Index(SIGNALS).get_indexer(signals)
+    state_idx = pd.Index(POSITION_STATES).get_indexer(position_states)
+
+    codes = np.full(len(signals), ACTIONS.index('noop'))
+    known = (sig_idx >= 0) & (state_idx >= 0)
+    codes[known] = _ACTION_TABLE[sig_idx[known], state_idx[known]]
+    codes[sig_idx < 0] = ACTIONS.index('alert')
+
+    return np.asarray(ACTIONS, dtype=object)[codes]
+
+
+PLAN_COLUMNS = ['ticker', 'signal', 'position_state', 'quantity_bought', 'action']
+
+
+def action_plan(holdings: pd.DataFrame, ticker_col: str = 'cik_ticker') -> pd.DataFrame:
+    """
+    The whole cycle's decisions in one step: one row per ticker (in holdings order) with
+    the compiled signal, position_state and quantity_bought (from the ticker's first row,
+    as reconcile_asset_orders_and_holdings reads them) and the action to take.
+    """
+
+    if holdings.empty:
+        return pd.DataFrame(columns=PLAN_COLUMNS)
+
+    first = holdings.drop_duplicates(ticker_col).set_index(ticker_col)
+    signals = compile_signals_frame(holdings, by=ticker_col).reindex(first.index)
+
+    plan = pd.DataFrame({
+        'ticker': first.index,
+        'signal': signals.to_numpy(),
+        'position_state': first['position_state'].to_numpy(),
+        'quantity_bought': first['quantity_bought'].to_numpy(),
+    })
+    plan['action'] = decide_array(plan['signal'], plan['position_state'])
+    return plan
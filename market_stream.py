@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from alpaca.data.enums import DataFeed
+
+
+"""
+Live trades / quotes from alpaca's market-data websocket, kept locally so price lookups for
+the symbols we watch don't need a REST call.
+
+- RingBuffer: fixed-size numpy arrays per field plus an int64 ns timestamp; appends overwrite
+  the oldest entry, nothing is allocated after construction
+- QuoteTradeCache: one trade buffer (price, size) and one quote buffer (bid, ask, bid_size,
+  ask_size) per symbol. price() is the latest trade price, else the latest quote mid, as long
+  as it's newer than max_age_s; otherwise None, and the caller falls back to REST
+- MarketDataFeed: runs a StockDataStream in a daemon thread, writing into the cache;
+  set_symbols() subscribes / unsubscribes the difference as the holdings universe changes.
+  The stream is started by the first set_symbols() with any symbols: alpaca's run loop
+  spins on asyncio.sleep(0) until something is subscribed, so it's never run empty
+- FakeStream: same interface as StockDataStream, fed by push_trade / push_quote, for tests
+
+    feed = MarketDataFeed(QuoteTradeCache(), api_key=ALPACA_KEY, secret_key=ALPACA_SECRET)
+    feed.set_symbols(["AAPL", "MSFT"])   # subscribes, then starts the stream thread
+    feed.cache.price("AAPL")
+"""
+
+
+logger = logging.getLogger(__name__)
+
+
+def _ns(ts) -> int:
+    """datetime (or None: now) -> ns since epoch"""
+    return time.time_ns() if ts is None else int(ts.timestamp() * 1_000_000_000)
+
+
+# ======================= #
+#       RING BUFFER       #
+# ======================= #
+
+class RingBuffer:
+
+    def __init__(self, capacity: int, fields: Sequence[str]):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.timestamp = np.zeros(capacity, dtype=np.int64)
+        self.values = {f: np.full(capacity, np.nan) for f in self.fields}
+        self.count = 0  # total appended; the next write goes to count % capacity
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp_ns: int, **values):
+        i = self.count % self.capacity
+        self.timestamp[i] = timestamp_ns
+        for f in self.fields:
+            self.values[f][i] = values.get(f, np.nan)
+        self.count += 1
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if self.count == 0:
+            return None
+        i = (self.count - 1) % self.capacity
+        return {"timestamp": int(self.timestamp[i]), **{f: float(v[i]) for f, v in self.values.items()}}
+
+    def last(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """the last n entries (all held, by default), oldest first, as copies"""
+        n = len(self) if n is None else min(n, len(self))
+        idx = (np.arange(self.count - n, self.count)) % self.capacity
+        return {"timestamp": self.timestamp[idx], **{f: v[idx] for f, v in self.values.items()}}
+
+
+TRADE_FIELDS = ("price", "size")
+QUOTE_FIELDS = ("bid", "ask", "bid_size", "ask_size")
+
+
+class QuoteTradeCache:
+
+    def __init__(self, capacity: int = 256, max_age_s: float = 60):
+        self.capacity = capacity
+        self.max_age_s = max_age_s
+        self.trades: Dict[str, RingBuffer] = {}
+        self.quotes: Dict[str, RingBuffer] = {}
+        self._lock = threading.Lock()  # the stream thread writes, the bot reads
+
+    def _buffer(self, buffers, symbol, fields):
+        buffer = buffers.get(symbol)
+        if buffer is None:
+            buffer = buffers[symbol] = RingBuffer(self.capacity, fields)
+        return buffer
+
+    def on_trade(self, trade):
+        with self._lock:
+            self._buffer(self.trades, trade.symbol, TRADE_FIELDS).append(
+                _ns(trade.timestamp), price=trade.price, size=trade.size)
+
+    def on_quote(self, quote):
+        with self._lock:
+            self._buffer(self.quotes, quote.symbol, QUOTE_FIELDS).append(
+                _ns(quote.timestamp), bid=quote.bid_price, ask=quote.ask_price,
+                bid_size=quote.bid_size, ask_size=quote.ask_size)
+
+    def drop(self, symbols: Iterable[str]):
+        with self._lock:
+            for symbol in symbols:
+                self.trades.pop(symbol, None)
+                self.quotes.pop(symbol, None)
+
+    def price(self, symbol: str, max_age_s: Optional[float] = None) -> Optional[float]:
+        """latest trade price, else latest quote mid, if fresher than max_age_s; else None"""
+
+        oldest = time.time_ns() - int((self.max_age_s if max_age_s is None else max_age_s) * 1_000_000_000)
+        with self._lock:
+            trades, quotes = self.trades.get(symbol), self.quotes.get(symbol)
+            trade = trades.latest() if trades is not None else None
+            quote = quotes.latest() if quotes is not None else None
+
+        if trade is not None and trade["timestamp"] >= oldest and trade["price"] > 0:
+            return trade["price"]
+        if quote is not None and quote["timestamp"] >= oldest and quote["bid"] > 0 and quote["ask"] > 0:
+            return (quote["bid"] + quote["ask"]) / 2
+        return None
+
+
+# ======================= #
+#          FEED           #
+# ======================= #
+
+class MarketDataFeed:
+
+    def __init__(self, cache: QuoteTradeCache, api_key: str = None, secret_key: str = None,
+                 feed: DataFeed = DataFeed.IEX, stream_factory: Optional[Callable] = None):
+        """stream_factory: () -> stream object (e.g. FakeStream); defaults to alpaca's StockDataStream"""
+
+        self.cache = cache
+        if stream_factory is None:
+            from alpaca.data.live.stock import StockDataStream
+
+            def stream_factory():
+                return StockDataStream(api_key, secret_key, feed=feed)
+
+        self.stream = stream_factory()
+        self.symbols = set()
+        self._thread = None
+
+    async def _on_trade(self, trade):
+        self.cache.on_trade(trade)
+
+    async def _on_quote(self, quote):
+        self.cache.on_quote(quote)
+
+    def start(self):
+        """run the stream in its thread; set_symbols() calls this once there is something subscribed"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="market-data", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.stream.run()
+        except Exception as e:
+            logger.error("Market data stream stopped", extra={"error": str(e)})
+
+    def stop(self):
+        if self._thread is not None:  # never started: nothing to stop
+            self.stream.stop()
+
+    def set_symbols(self, symbols: Iterable[str]):
+        """subscribe to trades + quotes for exactly these symbols (only the difference is sent)"""
+
+        wanted = {s.upper() for s in symbols if s}
+        added, removed = sorted(wanted - self.symbols), sorted(self.symbols - wanted)
+        try:
+            if added:
+                self.stream.subscribe_trades(self._on_trade, *added)
+                self.stream.subscribe_quotes(self._on_quote, *added)
+            if removed:
+                self.stream.unsubscribe_trades(*removed)
+                self.stream.unsubscribe_quotes(*removed)
+        except Exception as e:
+            logger.error("Market data subscription failed", extra={"error": str(e)})
+            return
+        self.symbols = wanted
+        self.cache.drop(removed)
+        if wanted:
+            self.start()
+        if added or removed:
+            logger.info("Market data subscriptions", extra={"n_symbols": len(wanted), "added": len(added), "removed": len(removed)})
+
+
+class FakeStream:
+    """stand-in for StockDataStream: run() blocks until stop(), push_* call the handlers"""
+
+    def __init__(self):
+        self.handlers = {"trades": {}, "quotes": {}}
+        self._stopped = threading.Event()
+
+    def subscribe_trades(self, handler, *symbols):
+        self.handlers["trades"].update({s: handler for s in symbols})
+
+    def subscribe_quotes(self, handler, *symbols):
+        self.handlers["quotes"].update({s: handler for s in symbols})
+
+    def unsubscribe_trades(self, *symbols):
+        for s in symbols:
+            self.handlers["trades"].pop(s, None)
+
+    def unsubscribe_quotes(self, *symbols):
+        for s in symbols:
+            self.handlers["quotes"].pop(s, None)
+
+    def run(self):
+        self._stopped.wait()
+
+    def stop(self):
+        self._stopped.set()
+
+    def push_trade(self, symbol, price, size=100, timestamp=None):
+        handler = self.handlers["trades"].get(symbol)
+        if handler is not None:
+            asyncio.run(handler(SimpleNamespace(symbol=symbol, price=price, size=size, timestamp=timestamp)))
+
+    def push_quote(self, symbol, bid, ask, bid_size=100, ask_size=100, timestamp=None):
+        handler = self.handlers["quotes"].get(symbol)
+        if handler is not None:
+            asyncio.run(handler(SimpleNamespace(symbol=symbol, bid_price=bid, ask_price=ask,
+                                                bid_size=bid_size, ask_size=ask_size, timestamp=timestamp)))
@@ -0,0 +1,159 @@
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+"""
+Opt-in memory tracking for the long-running bot (scripts/run.py: BOT_MEMORY_MONITOR=1).
+
+- check() is called between cycles. Every call records the process RSS; every
+  `snapshot_every` calls a tracemalloc snapshot is taken and diffed against the previous
+  one, and the top allocation sites by growth are logged
+- RSS is read from /proc/self/statm (linux), else psutil if it's installed, else the
+  peak RSS from getrusage
+- a warning is logged each time RSS has grown another `warn_growth_mb` over the first
+  reading, so slow creep in the loop or the bot's caches shows up well before an OOM
+
+tracemalloc slows allocation down (roughly 1.5-2x with 1 frame), hence opt-in.
+"""
+
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# allocations made by the monitoring itself
+_IGNORE = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def rss_bytes() -> Optional[int]:
+    """current resident set size of this process, or None if it can't be read"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    # peak, not current; kilobytes on linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryMonitor:
+
+    def __init__(self, snapshot_every: int = 12, top_n: int = 10, warn_growth_mb: float = 200,
+                 frames: int = 1, history: int = 2000):
+        """
+        snapshot_every: take / diff a tracemalloc snapshot every this many check() calls
+        top_n: allocation sites to log per diff
+        warn_growth_mb: warn at every further this-many MB of RSS growth over the first reading
+        frames: traceback depth tracemalloc keeps per allocation
+        history: RSS samples kept (self.samples)
+        """
+
+        self.snapshot_every = snapshot_every
+        self.top_n = top_n
+        self.warn_growth_mb = warn_growth_mb
+        self.frames = frames
+        self.samples = deque(maxlen=history)  # (unix time, rss bytes)
+
+        self.checks = 0
+        self.baseline_rss = None
+        self._warned_steps = 0
+        self._last_snapshot = None
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._last_snapshot = self._snapshot()
+        self.baseline_rss = rss_bytes()
+        logger.info("Memory monitor started", extra={"rss_mb": _mb(self.baseline_rss)})
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._last_snapshot = None
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, f) for f in _IGNORE])
+
+    # ======================= #
+    #          CHECK          #
+    # ======================= #
+
+    def check(self) -> Dict[str, Any]:
+        """record RSS, warn on growth, and every snapshot_every calls log the top allocation diffs"""
+
+        self.checks += 1
+        rss = rss_bytes()
+        self.samples.append((time.time(), rss))
+        if self.baseline_rss is None:
+            self.baseline_rss = rss
+
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        status = {
+            "rss_mb": _mb(rss),
+            "rss_growth_mb": _mb(rss - self.baseline_rss) if rss is not None and self.baseline_rss is not None else None,
+            "traced_mb": _mb(current),
+            "traced_peak_mb": _mb(peak),
+        }
+        logger.info("Memory", extra=status)
+
+        growth = status["rss_growth_mb"]
+        if growth is not None and self.warn_growth_mb > 0:
+            steps = int(growth // self.warn_growth_mb)
+            if steps > self._warned_steps:
+                self._warned_steps = steps
+                logger.warning("Memory growth", extra={**status, "samples": len(self.samples)})
+
+        if tracemalloc.is_tracing() and self.checks % self.snapshot_every == 0:
+            status["top_growth"] = self.diff()
+
+        return status
+
+    def diff(self) -> List[Dict[str, Any]]:
+        """top_n allocation sites by growth since the previous snapshot (logged, and returned)"""
+
+        snapshot = self._snapshot()
+        if self._last_snapshot is None:
+            self._last_snapshot = snapshot
+            return []
+
+        stats = snapshot.compare_to(self._last_snapshot, "lineno")
+        self._last_snapshot = snapshot
+
+        top = [
+            {
+                "site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                "size_diff_kb": round(s.size_diff / 1024, 1),
+                "size_kb": round(s.size / 1024, 1),
+                "count_diff": s.count_diff,
+            }
+            for s in sorted(stats, key=lambda s: s.size_diff, reverse=True)[:self.top_n]
+            if s.size_diff > 0
+        ]
+        logger.info("Memory allocation growth", extra={"top": top, "check": self.checks})
+        return top
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return None if n is None else round(n / (1024 * 1024), 1)
@@ -0,0 +1,167 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from alpaca.common.enums import Sort
+from alpaca.trading.enums import QueryOrderStatus
+from alpaca.trading.requests import GetOrdersRequest
+
+
+"""
+The bot's book of open orders, complete past alpaca's page size and cheap to keep current.
+
+FULL SYNC: every open order, paged (oldest first, `after` = last submitted_at of the page,
+    duplicates at the page boundary dropped by id). Replaces the book.
+DELTA SYNC: only what changed since the last sync (minus a few seconds of overlap):
+    - orders submitted since then (any status): open ones are added / updated, finished
+      ones (filled, canceled, expired ...) removed
+    - FILL activities since then: orders that are now fully filled are removed
+    - book orders submitted before that (cancels / expiries of older orders, e.g. every DAY
+      order at the close, show up in neither of the above): the closed orders submitted from
+      the oldest of them on, any that are in the book are removed. A book order with no
+      submit time (restored from a snapshot) makes it a full sync instead
+    a full sync still runs every full_sync_interval_s (and whenever the book has never been synced)
+
+The bot also tells the book about its own orders as it places / cancels them (add / remove),
+so within a cycle the book doesn't wait for the next sync.
+"""
+
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = {'filled', 'canceled', 'expired', 'replaced', 'rejected', 'done_for_day'}
+
+
+def _value(x):
+    return getattr(x, 'value', x)
+
+
+def _submitted_at(order) -> Optional[datetime]:
+    return getattr(order, 'submitted_at', None) or getattr(order, 'created_at', None)
+
+
+class OrderBook:
+
+    def __init__(self, page_size: int = 500, full_sync_interval_s: float = 30 * 60, overlap_s: float = 5):
+        self.page_size = page_size                 # alpaca allows up to 500
+        self.full_sync_interval_s = full_sync_interval_s
+        self.overlap = timedelta(seconds=overlap_s)
+
+        self.orders: Dict[str, object] = {}        # order id -> order
+        self.last_sync: Optional[datetime] = None  # local (utc) time the last sync started, overlap covers clock skew
+        self.last_full_sync: Optional[float] = None
+
+    def open_orders(self) -> List[object]:
+        return list(self.orders.values())
+
+    def add(self, order):
+        if order is not None:
+            self.orders[str(order.id)] = order
+
+    def remove(self, order_id):
+        self.orders.pop(str(order_id), None)
+
+    def seed(self, orders, synced_at: datetime):
+        """
+        start from a known book (a warm-start snapshot) last synced at synced_at: the next sync is a
+        delta from then, and the next full one is due full_sync_interval_s after synced_at, not now
+        """
+        self.orders = {str(o.id): o for o in orders}
+        self.last_sync = synced_at
+        self.last_full_sync = synced_at.timestamp()
+
+    # ======================= #
+    #          SYNC           #
+    # ======================= #
+
+    def sync(self, trading_client, full: bool = False) -> List[object]:
+        """bring the book up to date (full or delta, see module docstring) and return the open orders"""
+
+        due = self.last_sync is None or self.last_full_sync is None \
+            or time.time() - self.last_full_sync >= self.full_sync_interval_s
+        if full or due:
+            self.full_sync(trading_client)
+        else:
+            self.delta_sync(trading_client)
+        return self.open_orders()
+
+    def full_sync(self, trading_client):
+        started = datetime.now(timezone.utc)
+        orders = self._paged_orders(trading_client, QueryOrderStatus.OPEN, after=None)
+
+        self.orders = {str(o.id): o for o in orders}
+        self.last_sync = started
+        self.last_full_sync = time.time()
+        logger.info("Order book full sync", extra={"n_open": len(self.orders)})
+
+    def delta_sync(self, trading_client):
+        started = datetime.now(timezone.utc)
+        since = self.last_sync - self.overlap
+
+        older = [_submitted_at(o) for o in self.orders.values()
+                 if _submitted_at(o) is None or _submitted_at(o) < since]
+        if None in older:
+            self.full_sync(trading_client)
+            return
+        closed = []
+        if older:
+            closed = [o for o in self._paged_orders(trading_client, QueryOrderStatus.CLOSED, after=min(older) - self.overlap)
+                      if str(o.id) in self.orders]
+            for order in closed:
+                self.remove(order.id)
+
+        changed = self._paged_orders(trading_client, QueryOrderStatus.ALL, after=since)
+        for order in changed:
+            if str(_value(order.status)) in FINISHED_STATUSES:
+                self.remove(order.id)
+            else:
+                self.add(order)
+
+        filled = [a['order_id'] for a in self._fill_activities(trading_client, since)
+                  if a.get('order_status') == 'filled']
+        for order_id in filled:
+            self.remove(order_id)
+
+        self.last_sync = started
+        logger.info("Order book delta sync", extra={
+            "n_changed": len(changed), "n_filled": len(filled), "n_closed": len(closed), "n_open": len(self.orders),
+        })
+
+    # ======================= #
+    #         PAGING          #
+    # ======================= #
+
+    def _paged_orders(self, trading_client, status, after: Optional[datetime]) -> List[object]:
+        """every order matching status (submitted after `after`), oldest first, across pages"""
+
+        seen = {}
+        while True:
+            page = trading_client.get_orders(filter=GetOrdersRequest(
+                status=status, limit=self.page_size, after=after, direction=Sort.ASC, nested=True,
+            ))
+            new = [o for o in page if str(o.id) not in seen]
+            for order in new:
+                seen[str(order.id)] = order
+
+            if len(page) < self.page_size or not new:
+                break
+            # step back a microsecond so orders sharing the last timestamp aren't skipped;
+            # the ones already seen are dropped by id
+            after = _submitted_at(page[-1]) - timedelta(microseconds=1)
+
+        return list(seen.values())
+
+    def _fill_activities(self, trading_client, since: datetime) -> List[dict]:
+        """FILL account activities since `since`, across pages"""
+
+        activities, page_token = [], None
+        while True:
+            params = {"after": since.isoformat(), "direction": "asc", "page_size": 100}
+            if page_token:
+                params["page_token"] = page_token
+            page = trading_client.get("/account/activities/FILL", params) or []
+            activities.extend(page)
+            if len(page) < 100:
+                return activities
+            page_token = page[-1]["id"]
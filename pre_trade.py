@@ -0,0 +1,61 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Pre-trade check over all of a cycle's planned buys at once, so orders the account can't
+afford are dropped here instead of being rejected by the broker one at a time.
+
+Each buy has an estimated notional (quantity x price). In priority order:
+- a buy without a price or quantity (not tradable) is dropped
+- per ticker: current exposure + notional must stay within max_ticker_notional
+- in total: the running sum of the buys that passed must stay within the budget,
+  min(buying_power - cash_buffer, max_total_exposure - current total exposure)
+  the first buy that doesn't fit and every one after it are dropped (in priority order,
+  so the highest-priority buys are the ones kept)
+
+REASONS: ok, no_price, ticker_cap, budget
+"""
+
+
+def check_buys(buys: pd.DataFrame, buying_power: float, exposure: Dict[str, float],
+               max_ticker_notional: Optional[float] = None, max_total_exposure: Optional[float] = None,
+               cash_buffer: float = 0.0, priority: Optional[str] = None) -> pd.DataFrame:
+    """
+    buys: frame with ticker, notional (nan if unknown), and the priority column if given
+          (higher first; otherwise the frame's order is the priority)
+    exposure: {ticker: current market value}
+
+    Returns buys (in priority order) with current_exposure, approved, reason added.
+    """
+
+    if priority is not None:
+        buys = buys.sort_values(priority, ascending=False, kind='stable')
+    buys = buys.reset_index(drop=True)
+
+    notional = buys['notional'].to_numpy(dtype=float)
+    current = buys['ticker'].map(exposure).fillna(0.0).to_numpy(dtype=float)
+
+    priced = np.isfinite(notional) & (notional > 0)
+    within_ticker = np.ones(len(buys), dtype=bool)
+    if max_ticker_notional is not None:
+        within_ticker = current + notional <= max_ticker_notional
+
+    budget = buying_power - cash_buffer
+    if max_total_exposure is not None:
+        budget = min(budget, max_total_exposure - sum(exposure.values()))
+
+    candidate = priced & within_ticker
+    spend = np.cumsum(np.where(candidate, notional, 0.0))
+    within_budget = spend <= budget
+    # once one doesn't fit, drop the rest too: no smaller, lower-priority buy jumps the queue
+    within_budget &= np.cumprod(within_budget | ~candidate).astype(bool)
+
+    buys['current_exposure'] = current
+    buys['approved'] = candidate & within_budget
+    buys['reason'] = np.select(
+        [~priced, ~within_ticker, ~within_budget], ['no_price', 'ticker_cap', 'budget'], default='ok'
+    )
+    return buys
@@ -1,31 +1,98 @@
+import logging
+import os
+import time
+
+from private.core_logic.config import ALPACA_KEY, ALPACA_SECRET
+
+from public.bot_logging import setup_logging
+from public.market_stream import MarketDataFeed, QuoteTradeCache
+from public.memory_monitor import MemoryMonitor
 from public.trading_bot import TradingBot
 
+logger = logging.getLogger(__name__)
+
+# a crashing cycle is logged and retried after FAILURE_BACKOFF_SECONDS; the bot only
+# exits after this many failed cycles in a row
+MAX_CONSECUTIVE_FAILURES = int(os.environ.get("BOT_MAX_CONSECUTIVE_FAILURES", "5"))
+FAILURE_BACKOFF_SECONDS = float(os.environ.get("BOT_FAILURE_BACKOFF_SECONDS", "60"))
+
 def main():
     """Initialize and run the trading bot"""
     
-    print("🚀 Initializing Trading Bot...")
+    # JSON log lines via a background queue, BOT_LOG_LEVELS sets per-module levels
+    setup_logging(
+        level=os.environ.get("BOT_LOG_LEVEL", "INFO"),
+        log_path=os.environ.get("BOT_LOG_PATH"),
+        debug_sample_rate=float(os.environ.get("BOT_LOG_SAMPLE_RATE", "0.01")),
+    )
+
+    logger.info("Initializing trading bot")
     
+    # opt-in: live trades / quotes over the websocket, so prices for the universe are read locally
+    market_feed = None
+    if os.environ.get("BOT_MARKET_STREAM", "0") == "1":
+        # started by the bot's first set_symbols, once there is something to subscribe to
+        market_feed = MarketDataFeed(QuoteTradeCache(), api_key=ALPACA_KEY, secret_key=ALPACA_SECRET)
+
     # Create bot instance
     bot = TradingBot(
         thresholds={
             "decision_threshold": 0.7,
         },      # Use default thresholds
         buy_quantity=200,     # $100 per trade
-        paper=True            # Paper trading mode
+        paper=True,           # Paper trading mode
+        dry_run=os.environ.get("BOT_DRY_RUN", "0") == "1",  # report the action plan, place nothing
+        plan_path=os.environ.get("BOT_PLAN_PATH"),          # write each cycle's plan here (json)
+        cycle_deadline_s=float(os.environ.get("BOT_CYCLE_DEADLINE_SECONDS", "240")),
+        state_path=os.environ.get("BOT_STATE_PATH"),        # warm-restart snapshot (state_snapshot.py)
+        # hedged price lookups, e.g. BOT_PRICE_HEDGE_DELAY_SECONDS=0.3 (unset = sequential fallbacks)
+        price_hedge_delay_s=float(os.environ["BOT_PRICE_HEDGE_DELAY_SECONDS"]) if os.environ.get("BOT_PRICE_HEDGE_DELAY_SECONDS") else None,
+        market_feed=market_feed,
     )
     
-    print("✅ Bot initialized")
-    print("🔄 Starting main loop...\n")
+    # opt-in: RSS every cycle, tracemalloc diffs every BOT_MEMORY_SNAPSHOT_EVERY cycles
+    monitor = None
+    if os.environ.get("BOT_MEMORY_MONITOR", "0") == "1":
+        monitor = MemoryMonitor(
+            snapshot_every=int(os.environ.get("BOT_MEMORY_SNAPSHOT_EVERY", "12")),
+            warn_growth_mb=float(os.environ.get("BOT_MEMORY_WARN_MB", "200")),
+        )
+        monitor.start()
+
+    logger.info("Bot initialized, starting main loop", extra={
+        "paper": bot.paper, "dry_run": bot.dry_run,
+        "market_stream": market_feed is not None, "memory_monitor": monitor is not None,
+    })
     
     # Run main loop (this will run continuously with sleep)
+    failures = 0
     try:
         while True:
-            bot.main_loop()
+            try:
+                bot.main_loop()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.exception("Cycle failed", extra={"consecutive_failures": failures})
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    logger.error("Bot crashed", extra={"consecutive_failures": failures, "error": str(e)})
+                    raise
+                time.sleep(FAILURE_BACKOFF_SECONDS)
+
+            # monitoring only, a failure here is logged and never counts as a failed cycle
+            if monitor is not None:
+                try:
+                    monitor.check()
+                except Exception:
+                    logger.exception("Memory monitor check failed")
     except KeyboardInterrupt:
-        print("\n⏹️ Bot stopped by user")
-    except Exception as e:
-        print(f"\n❌ Bot crashed: {e}")
-        raise
+        logger.info("Bot stopped by user")
+    finally:
+        bot.close()
+        if market_feed is not None:
+            market_feed.stop()
+        if monitor is not None:
+            monitor.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+import argparse
+
+import pandas as pd
+
+from public.account_analysis.backtest import load_bars
+from public.account_analysis.sweep import grid_points, random_points, run_sweep
+
+
+def main():
+    """Sweep decision_threshold x buy_quantity over a stored score history + bars"""
+
+    parser = argparse.ArgumentParser(description="Parameter sweep over thresholds and buy_quantity")
+    parser.add_argument("--scores", required=True, help="parquet / csv of time, ticker, score")
+    parser.add_argument("--bars", required=True, help="parquet / csv of symbol, timestamp, close")
+    parser.add_argument("--out", default="sweep_results.parquet", help="results table (resumes from it)")
+    parser.add_argument("--random", type=int, default=0, help="random points instead of the grid")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    scores = pd.read_parquet(args.scores) if args.scores.endswith(".parquet") else pd.read_csv(args.scores)
+    prices = load_bars(args.bars)
+
+    if args.random:
+        points = random_points({"decision_threshold": (0.5, 0.95)}, (50, 500), n=args.random)
+    else:
+        points = grid_points(
+            {"decision_threshold": [0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9]},
+            [100, 200, 300, 500],
+        )
+
+    results = run_sweep(scores, prices, points, args.out, max_workers=args.workers)
+    print(results.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Union
+
+from alpaca.trading.enums import OrderSide
+
+
+"""
+Checkpoint of the bot's in-memory state, so a restarted bot starts warm.
+
+SNAPSHOT (json, written atomically at the end of every cycle):
+    saved_at        unix time
+    open_orders     [{id, symbol, side, qty, submitted_at}]   the order book as last seen
+    orders_synced_at iso time of the order book's last sync with the broker
+    positions       {symbol: {side, qty, market_value}} from the last bulk get_all_positions
+    assets          {symbol: {tradable, fractionable, cached_at}}
+    prices          {symbol: [price, cached_at]}
+    last_signals    {ticker: signal}            the previous cycle's compiled signals
+
+WARM START: the snapshot is checked against one bulk broker call (get_all_positions).
+- asset metadata, prices (still subject to their ttl) and the last signals are always kept
+- positions always come from that broker call
+- the snapshot's order book is only reused if the positions match and the snapshot is
+  younger than max_age_s: it seeds the OrderBook, whose first sync is then a delta from
+  orders_synced_at (which also drops restored orders closed during the downtime), with the
+  next full sync due as if the bot had never stopped; otherwise the first cycle does a full sync
+  as usual. Snapshots without submitted_at make that first delta a full sync
+"""
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+# ======================= #
+#         RECORDS         #
+# ======================= #
+
+def _enum_value(x):
+    return getattr(x, "value", x)
+
+
+def _iso(t) -> Optional[str]:
+    return t.isoformat() if isinstance(t, datetime) else t
+
+
+def order_record(order) -> Dict[str, Any]:
+    """alpaca Order (or a restored record) -> json-safe dict"""
+    return {
+        "id": str(order.id),
+        "symbol": order.symbol,
+        "side": _enum_value(order.side),
+        "qty": None if order.qty is None else str(order.qty),
+        "submitted_at": _iso(getattr(order, "submitted_at", None)),
+    }
+
+
+def restore_order(record: Dict[str, Any]) -> SimpleNamespace:
+    """dict -> object with the Order attributes the bot reads (id, symbol, side, qty, submitted_at)"""
+    submitted_at = record.get("submitted_at")
+    return SimpleNamespace(id=record["id"], symbol=record["symbol"], side=OrderSide(record["side"]), qty=record["qty"],
+                           submitted_at=datetime.fromisoformat(submitted_at) if submitted_at else None)
+
+
+def positions_from_broker(positions) -> Dict[str, Dict[str, str]]:
+    """get_all_positions() -> {symbol: {side, qty, market_value}}"""
+    return {
+        p.symbol: {"side": _enum_value(p.side), "qty": str(p.qty), "market_value": getattr(p, "market_value", None)}
+        for p in positions
+    }
+
+
+def positions_match(a: Dict[str, Dict[str, str]], b: Dict[str, Dict[str, str]], tol: float = 1e-9) -> bool:
+    if set(a) != set(b):
+        return False
+    return all(
+        a[s]["side"] == b[s]["side"] and abs(float(a[s]["qty"]) - float(b[s]["qty"])) <= tol
+        for s in a
+    )
+
+
+# ======================= #
+#       SAVE / LOAD       #
+# ======================= #
+
+def save_snapshot(path: Union[str, Path], state: Dict[str, Any]):
+    """atomic write (temp file + rename), so a crash mid-write leaves the previous snapshot"""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"version": SNAPSHOT_VERSION, "saved_at": time.time(), **state}
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """the snapshot, or None if there isn't a usable one (missing, unreadable, other version)"""
+
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        snapshot = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable state snapshot", extra={"path": str(path), "error": str(e)})
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        logger.warning("State snapshot version mismatch", extra={"path": str(path), "version": snapshot.get("version")})
+        return None
+    return snapshot
+
+
+def warm_start(snapshot: Dict[str, Any], broker_positions: Dict[str, Dict[str, str]], max_age_s: float = 600) -> Dict[str, Any]:
+    """
+    What to take from a snapshot given the broker's current positions:
+    {positions, open_orders (None = fetch as usual), orders_synced_at, assets, prices, last_signals,
+     validated, age_s}
+    """
+
+    age_s = time.time() - snapshot.get("saved_at", 0)
+    validated = positions_match(snapshot.get("positions", {}), broker_positions)
+    use_orders = validated and age_s <= max_age_s
+    synced_at = snapshot.get("orders_synced_at")
+
+    return {
+        "positions": broker_positions,
+        "open_orders": [restore_order(r) for r in snapshot.get("open_orders", [])] if use_orders else None,
+        "orders_synced_at": datetime.fromisoformat(synced_at) if synced_at
+                            else datetime.fromtimestamp(snapshot.get("saved_at", 0), tz=timezone.utc),
+        "assets": snapshot.get("assets", {}),
+        "prices": {s: tuple(v) for s, v in snapshot.get("prices", {}).items()},
+        "last_signals": snapshot.get("last_signals", {}),
+        "validated": validated,
+        "age_s": age_s,
+    }
@@ -3,12 +3,31 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-import yfinance as yf
+import os
+import sys
 from pathlib import Path
 
+# repo root, for the shared ingestion pipeline in account_analysis/
+sys.path.insert(0, str(Path(__file__).parent.resolve().parent))
+
+from account_analysis.ingestion import load_round_trips
+from benchmark_store import BenchmarkStore
+from bootstrap import bootstrap_metric_cis
+from metrics import compute_metrics, file_fingerprint, normalise_round_trips
+from live_feed import LiveTradeFeed
+from rolling import rolling_frame
+from rendering import histogram_trace, is_large, line_xy, scatter_trace, thin_index
+
 # Get the directory where this script is located
 SCRIPT_DIR = Path(__file__).parent.resolve()
 DATA_DIR = SCRIPT_DIR / "data"
+BENCHMARK_DIR = DATA_DIR / "benchmarks"  # local store of daily closes, topped up from yfinance
+BENCHMARK_TICKER = "^GSPC"
+
+# Live mode: read the bot's trade store (sqlite) directly, polling for new rows
+LIVE_STORE_PATH = os.environ.get("TRADE_STORE_PATH")
+LIVE_POLL_SECONDS = int(os.environ.get("LIVE_POLL_SECONDS", "30"))
+LIVE_CAPITAL = 5000 # same assumption as the Alpaca csv
 
 # Page config
 st.set_page_config(page_title="Trading Dashboard", layout="wide")
@@ -68,173 +87,153 @@ st.markdown("You can select which results to view: the few months of trading wit
 
 
 
-def get_sp500_return_for_trade(row, sp500_df):
-    """Calculate SP500 return over a trade's holding period."""
-    buy_date = row['buy_date_dt'].date() if hasattr(row['buy_date_dt'], 'date') else row['buy_date_dt']
-    sell_date = row['sell_date_dt'].date() if hasattr(row['sell_date_dt'], 'date') else row['sell_date_dt']
-    
-    available_dates = list(sp500_df.index)
-    
-    # Get buy date price (use nearest available date on or before)
-    buy_dates_before = [d for d in available_dates if d <= buy_date]
-    if not buy_dates_before:
-        return np.nan
-    buy_price_date = max(buy_dates_before)
-    
-    # Get sell date price (use nearest available date on or before)
-    sell_dates_before = [d for d in available_dates if d <= sell_date]
-    if not sell_dates_before:
-        return np.nan
-    sell_price_date = max(sell_dates_before)
-    
-    buy_price = sp500_df.loc[buy_price_date, 'sp500_close']
-    sell_price = sp500_df.loc[sell_price_date, 'sp500_close']
-    
-    if buy_price == 0 or pd.isna(buy_price):
-        return np.nan
-    
-    return ((sell_price - buy_price) / buy_price) * 100
+@st.cache_data(ttl=6 * 60 * 60, show_spinner=False)
+def load_benchmark_closes(ticker, start, end):
+    """Daily closes from the local benchmark store, reruns are served from memory."""
+    return BenchmarkStore(BENCHMARK_DIR).get_closes(ticker, start, end)
 
 
 
-# Broker selection
-broker = st.selectbox("", ["Alpaca", "IBKR"])
+# Trade files and the average deployed capital assumed for each (certain assumptions made here)
+TRADE_SOURCES = {
+    "Alpaca": (DATA_DIR / "trades.csv", 5000),
+    "IBKR": (DATA_DIR / "ibkr_trades_round_trips.csv", 200000),
+}
 
-# Load and normalize data
-if broker == "Alpaca":
-    df = pd.read_csv(DATA_DIR / "trades.csv")
-    df['buy_date_dt'] = pd.to_datetime(df['buy_time'])
-    df['sell_date_dt'] = pd.to_datetime(df['sell_time'])
-    df['date'] = df['sell_date_dt']  # Use sell date as the reference date
-    df['pnl'] = df['pnl_amount']
-    df['basis'] = df['basis']
-    df['return_pct'] = df['pnl'] / df['basis']  # Compute return_pct for per-trade comparison
-    capital = 5000 # average deployed capital, certain assumptions made here
-elif broker == "IBKR":
-    df = pd.read_csv(DATA_DIR / "ibkr_trades_round_trips.csv")
-    df['buy_date_dt'] = pd.to_datetime(df['buy_date_dt'])
-    df['sell_date_dt'] = pd.to_datetime(df['sell_date_dt'])
-    df['date'] = df['sell_date_dt']  # Use sell date as the reference date
-    df['pnl'] = df['pnl']
-    df['basis'] = df['basis']
-    # return_pct should already exist in IBKR csv
-    capital = 200000 # average deployed capital, certain assumptions made here
+# account_analysis/backtest.py export_round_trips output, shown as a source when present
+BACKTEST_TRADES_PATH = DATA_DIR / "backtest_trades.csv"
+if BACKTEST_TRADES_PATH.exists():
+    TRADE_SOURCES["Backtest"] = (BACKTEST_TRADES_PATH, 5000)
 
 
+@st.cache_data(show_spinner=False)
+def trades_fingerprint(path, mtime_ns, size):
+    """Content hash of a trade file, only recomputed when the file changes on disk."""
+    return file_fingerprint(path)
 
 
-### ============================================= ###
-#                      METRICS                      #
-### ============================================= ###
+def benchmark_closes_for(df):
+    """S&P 500 closes for a window around the trades (end exclusive, the store takes an inclusive range)."""
+    start_date = df['buy_date_dt'].min() - pd.Timedelta(days=5)
+    end_date = df['sell_date_dt'].max() + pd.Timedelta(days=5)
+    return load_benchmark_closes(BENCHMARK_TICKER, start_date.date(), (end_date - pd.Timedelta(days=1)).date())
 
 
-df = df.sort_values('date')
-df['basis'] = df['basis'].abs()
-df['return_pct_individual'] = df['pnl'] / df['basis']
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_dashboard_metrics(path, fingerprint, capital, _trades=None):
+    """
+    Whole metrics block, cached on (trade file hash, capital) so widget reruns skip it.
+    For the live store, _trades is the feed's frame (not hashed) and fingerprint its change_seq.
+    """
+    df = normalise_round_trips(load_round_trips(path) if _trades is None else _trades)
+    return compute_metrics(df, capital, benchmark_closes_for(df))
 
-daily = df.groupby('date').agg(
-    pnl_daily=('pnl','sum'),
-    basis_daily=('basis','sum'))
-daily['daily_return_pct'] = daily['pnl_daily'] / daily['basis_daily']
 
-# Download S&P 500 data for comparison (per-trade holding period method)
-trade_by_sell_date = None
-start_date = df['buy_date_dt'].min() - pd.Timedelta(days=5)
-end_date = df['sell_date_dt'].max() + pd.Timedelta(days=5)
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_metric_cis(path, fingerprint, capital, _trades=None):
+    """Bootstrap intervals for the headline metrics, cached like the metrics themselves."""
+    metrics = load_dashboard_metrics(path, fingerprint, capital, _trades)
+    return bootstrap_metric_cis(metrics['daily'], metrics['df'])
 
-sp500 = yf.download('^GSPC', start=start_date, end=end_date, progress=False)
 
-# Handle yfinance multi-level columns (newer versions return ('Close', 'GSPC'))
-sp500_close = sp500['Close'] if 'Close' in sp500.columns else sp500[('Close', '^GSPC')] if ('Close', '^GSPC') in sp500.columns else None
+def get_live_feed():
+    """One feed per browser session, kept across reruns so each poll only reads new rows."""
+    if 'live_feed' not in st.session_state:
+        st.session_state['live_feed'] = LiveTradeFeed(LIVE_STORE_PATH)
+    return st.session_state['live_feed']
 
-if not sp500.empty and sp500_close is not None:
-    sp500_daily = pd.DataFrame(index=pd.to_datetime(sp500.index).date)
-    sp500_daily['sp500_close'] = sp500_close.values
-    sp500_daily['sp500_return_pct'] = sp500_close.pct_change().values * 100
-    
-    df['sp500_return_trade'] = df.apply(lambda row: get_sp500_return_for_trade(row, sp500_daily), axis=1)
-    
-    valid_mask_trade = df['return_pct'].notna() & df['sp500_return_trade'].notna()
-    if valid_mask_trade.sum() > 1:
-        correlation_with_sp500 = df.loc[valid_mask_trade, 'return_pct'].corr(
-            df.loc[valid_mask_trade, 'sp500_return_trade']
-        )
-    else:
-        correlation_with_sp500 = np.nan
-    
-    # Aggregate by sell_date for rolling correlation
-    trade_by_sell_date = df.groupby(df['sell_date_dt'].dt.date).agg(
-        return_pct_mean=('return_pct', 'mean'),
-        sp500_return_mean=('sp500_return_trade', 'mean')
-    ).sort_index()
-    
-    # Rolling correlation on aggregated data
-    window = 40
-    trade_by_sell_date['roll_corr_spx'] = (
-        trade_by_sell_date['return_pct_mean']
-        .rolling(window=window)
-        .corr(trade_by_sell_date['sp500_return_mean'])
-    )
-    
-    # Also add daily SP500 data for other charts
-    if not isinstance(daily.index[0], type(pd.Timestamp.now().date())):
-        daily.index = pd.to_datetime(daily.index).date
-    daily = daily.merge(sp500_daily[['sp500_close', 'sp500_return_pct']], 
-                        left_index=True, right_index=True, how='left')
-else:
-    # SP500 data not available
-    df['sp500_return_trade'] = np.nan
-    daily['sp500_close'] = np.nan
-    daily['sp500_return_pct'] = np.nan
-    correlation_with_sp500 = np.nan
 
-# 1. NUMBER OF TRADES, win rate
-num_trades = len(df)
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_section(feed):
+    """Polls the trade store on a timer; only this block reruns, from the incremental aggregates."""
+    new_rows = feed.poll()
 
+    st.markdown("### Live")
+    live_col1, live_col2, live_col3, live_col4 = st.columns(4)
+    with live_col1:
+        st.metric("Trades", f"{feed.num_trades}", f"+{new_rows}" if new_rows else None)
+    with live_col2:
+        st.metric("Total P&L", f"${feed.total_pnl:,.2f}")
+    with live_col3:
+        st.metric("Win Rate", f"{feed.win_rate:.1f}%", f"{feed.wins}W / {feed.losses}L")
+    with live_col4:
+        st.metric("Profit Factor", f"{feed.profit_factor:.2f}")
+
+    if len(feed.daily):
+        recent = feed.daily.tail(30)
+        fig_live = go.Figure(go.Bar(
+            x=recent.index,
+            y=recent['pnl_daily'],
+            marker_color=['green' if x > 0 else 'red' for x in recent['pnl_daily']],
+            opacity=0.7,
+        ))
+        fig_live.update_layout(
+            yaxis=dict(title=dict(text="Daily P&L ($)", font=dict(size=14)), tickfont=dict(size=12)),
+            height=220,
+            margin=dict(l=20, r=20, t=10, b=10),
+            font=dict(family="Times New Roman, Times, serif"),
+            showlegend=False
+        )
+        st.plotly_chart(fig_live, use_container_width=True)
+    st.caption(f"Polling {LIVE_STORE_PATH} every {LIVE_POLL_SECONDS}s. The sections below refresh when the page is reloaded.")
 
-# 2 sharpe by dollar amount
-sharpe_dollar = (daily['pnl_daily'].mean() / daily['pnl_daily'].std()) * np.sqrt(252)
 
 
-# 3 sharpe using capital
-daily['equity'] = capital + daily['pnl_daily'].cumsum()
-daily['equity_prev'] = daily['equity'].shift(1)
-daily['ret_equity'] = daily['equity'] / daily['equity_prev'] - 1
-daily.loc[daily.index[0], 'ret_equity'] = (
-    daily.iloc[0]['equity'] / capital - 1)
+# Broker selection
+broker = st.selectbox("", list(TRADE_SOURCES) + (["Live"] if LIVE_STORE_PATH else []))
 
-mean_ret = daily['ret_equity'].mean()
-std_ret  = daily['ret_equity'].std(ddof=1)
-sharpe_capital = np.sqrt(252) * mean_ret / std_ret
+# Load and normalize data
+if broker == "Live":
+    feed = get_live_feed()
+    live_section(feed)
+    if feed.trades.empty:
+        st.info("No trades in the trade store yet.")
+        st.stop()
+    capital = LIVE_CAPITAL
+    trades_path, fingerprint = LIVE_STORE_PATH, feed.last_seq
+else:
+    trades_path, capital = TRADE_SOURCES[broker]
+    trades_stat = trades_path.stat()
+    fingerprint = trades_fingerprint(str(trades_path), trades_stat.st_mtime_ns, trades_stat.st_size)
 
 
 
-# 4 max drawdown
-daily['cum_return_pct'] = (1 + daily['daily_return_pct']).cumprod()
-daily['peak_cum_return_pct'] = daily['cum_return_pct'].cummax()
-daily['drawdown'] = daily['cum_return_pct'] / daily['peak_cum_return_pct'] - 1
-max_drawdown_pct = daily['drawdown'].min() * 100
 
-# 5 win rate
-wins = (df['pnl'] > 0).sum()
-losses = (df['pnl'] < 0).sum()
-win_rate = (wins / num_trades * 100) if num_trades > 0 else 0
+### ============================================= ###
+#                      METRICS                      #
+### ============================================= ###
 
 
-# 6 average win vs average loss
-avg_win = df[df['return_pct_individual'] > 0]['return_pct_individual'].mean() * 100
-avg_loss = df[df['return_pct_individual'] < 0]['return_pct_individual'].mean() * 100
+# live: everything polled so far, recomputed only when a full rerun finds the store has changed
+live_trades = feed.trades if broker == "Live" else None
+metrics = load_dashboard_metrics(str(trades_path), fingerprint, capital, live_trades)
+metric_cis = load_metric_cis(str(trades_path), fingerprint, capital, live_trades)
 
+df = metrics['df']
+daily = metrics['daily']
+trade_by_sell_date = metrics['trade_by_sell_date']
 
+num_trades = metrics['num_trades']
+sharpe_dollar = metrics['sharpe_dollar']
+sharpe_capital = metrics['sharpe_capital']
+correlation_with_sp500 = metrics['correlation_with_sp500']
+max_drawdown_pct = metrics['max_drawdown_pct']
+wins, losses, win_rate = metrics['wins'], metrics['losses'], metrics['win_rate']
+avg_win, avg_loss = metrics['avg_win'], metrics['avg_loss']
+profit_factor = metrics['profit_factor']
+mean_return_per_trade = metrics['mean_return_per_trade']
 
-# 7 profit factor
-gross_profit = df[df['pnl'] > 0]['pnl'].sum()
-gross_loss = abs(df[df['pnl'] < 0]['pnl'].sum())
-profit_factor = gross_profit / gross_loss if gross_loss > 0 else np.inf
 
+def ci_caption(*keys, fmt="{:.2f}", suffix=""):
+    """95% bootstrap interval(s) under a metric tile, ' / ' separated like the tile value"""
+    intervals = [metric_cis[key] for key in keys]
+    if any(np.isnan(lo) for lo, _ in intervals):
+        return
+    text = " / ".join(f"{fmt.format(lo)}{suffix} to {fmt.format(hi)}{suffix}" for lo, hi in intervals)
+    st.caption(f"95% CI: {text}")
 
-# 8 mean return per trade
-mean_return_per_trade = df['return_pct_individual'].mean()*100
+# above a size threshold charts switch to WebGL / binned / downsampled traces
+large_history = is_large(len(df))
 
 
 
@@ -259,6 +258,8 @@ with eq_col2:
 
 st.markdown("""
 where $P_d$ is the P&L on day $d$ (in dollars), $r_d = (E_d - E_{d-1}) / E_{d-1}$ is the daily return, and $E_d$ is the equity on day $d$ computed using an assumed initial capital. We note that the Interactive Brokers dashboard indicates a Sharpe of 1.6, although this likely includes risk free interest rate (4.5% in US), and will be based on total account value.
+
+Below each tile is a 95% bootstrap confidence interval (10,000 resamples): daily metrics use a stationary block bootstrap (mean block of 5 days) to keep day-to-day dependence, per-trade metrics resample trades.
 """)
 
 st.markdown("")
@@ -272,22 +273,26 @@ with col1:
 
 with col2:
     st.metric("Sharpe (Capital / Dollar)", f"{sharpe_capital:.2f} / {sharpe_dollar:.2f}")
+    ci_caption('sharpe_capital', 'sharpe_dollar')
 
 with col3:
     st.metric("S&P 500 Correlation", f"{correlation_with_sp500:.2f}")
 
 with col4:
     st.metric("Max Drawdown", f"{max_drawdown_pct:.2f}%")
+    ci_caption('max_drawdown_pct', suffix="%")
 
 col5, col6, col7, col8 = st.columns(4)
 with col5:
     st.metric("Win Rate", f"{win_rate:.1f}%", f"{wins}W / {losses}L")
+    ci_caption('win_rate', fmt="{:.1f}", suffix="%")
 
 with col6:
     st.metric("Avg Win / Avg Loss", f"{avg_win:.1f}% / {avg_loss:.1f}%")
 
 with col7:
     st.metric("Profit Factor", f"{profit_factor:.2f}")
+    ci_caption('profit_factor')
 
 with col8:
     st.metric("Mean Return per Trade", f"{mean_return_per_trade:.2f}%")
@@ -297,6 +302,8 @@ st.markdown("---")
 
 
 # SECTION 2: Visualizations
+# Charts with their own selector are fragments: a toggle reruns only that chart,
+# not the data loading, metrics or any other figure.
 st.markdown("### Performance Analysis")
 
 # First Row: Cumulative P&L and Daily P&L Bar Chart
@@ -308,9 +315,12 @@ with row1_col1:
     df['cumulative_pnl'] = df['pnl'].cumsum()
     df['cumulative_trades'] = range(1, len(df) + 1)  # Cumulative count of trades
     fig_cumulative = go.Figure()
-    fig_cumulative.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['cumulative_pnl'],
+    cum_pnl_x, cum_pnl_y = line_xy(df['date'], df['cumulative_pnl'], large_history)
+    cum_trades_x, cum_trades_y = line_xy(df['date'], df['cumulative_trades'], large_history)
+    fig_cumulative.add_trace(scatter_trace(
+        large_history,
+        x=cum_pnl_x,
+        y=cum_pnl_y,
         mode='lines',
         line=dict(color='#2E86AB', width=2),
         fill='tozeroy',
@@ -319,9 +329,10 @@ with row1_col1:
         yaxis='y'
     ))
     # Add second y-axis for number of trades
-    fig_cumulative.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['cumulative_trades'],
+    fig_cumulative.add_trace(scatter_trace(
+        large_history,
+        x=cum_trades_x,
+        y=cum_trades_y,
         mode='lines',
         line=dict(color='#A23B72', width=2),
         name='Number of Trades',
@@ -344,7 +355,8 @@ with row1_col1:
     )
     st.plotly_chart(fig_cumulative, use_container_width=True)
 
-with row1_col2:
+@st.fragment
+def daily_pnl_chart(daily):
     st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Daily P&L</h1>", unsafe_allow_html=True)
     daily_display_type = st.radio(
         "",
@@ -397,12 +409,16 @@ with row1_col2:
     )
     st.plotly_chart(fig_daily_bar, use_container_width=True)
 
+with row1_col2:
+    daily_pnl_chart(daily)
+
 st.markdown('<div style="height: 60px;"></div>', unsafe_allow_html=True)  # Row spacing
 
 # Second Row: Histograms with dropdown
 row2_col1, row2_col2 = st.columns(2, gap="large")
 
-with row2_col1:
+@st.fragment
+def trade_returns_histogram(df):
     st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Per Trade Returns Distribution</h1>", unsafe_allow_html=True)
     return_type_trade = st.radio(
         "",
@@ -420,9 +436,10 @@ with row2_col1:
         xaxis_title = "P&L ($)"
     
     fig_trade_hist = go.Figure()
-    fig_trade_hist.add_trace(go.Histogram(
-        x=data_trade,
-        nbinsx=120,
+    fig_trade_hist.add_trace(histogram_trace(
+        data_trade,
+        is_large(len(data_trade)),
+        nbins=120,
         marker=dict(color='#A23B72', line=dict(color='white', width=1)),
         name='Trade Returns'
     ))
@@ -436,7 +453,11 @@ with row2_col1:
     )
     st.plotly_chart(fig_trade_hist, use_container_width=True)
 
-with row2_col2:
+with row2_col1:
+    trade_returns_histogram(df)
+
+@st.fragment
+def daily_returns_histogram(daily):
     st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Per Day Returns Distribution</h1>", unsafe_allow_html=True)
     return_type_daily = st.radio(
         "",
@@ -454,9 +475,10 @@ with row2_col2:
         xaxis_title = "P&L ($)"
     
     fig_daily_hist = go.Figure()
-    fig_daily_hist.add_trace(go.Histogram(
-        x=data_daily,
-        nbinsx=120,
+    fig_daily_hist.add_trace(histogram_trace(
+        data_daily,
+        is_large(len(data_daily)),
+        nbins=120,
         marker=dict(color='#A23B72', line=dict(color='white', width=1)),
         name='Daily Returns'
     ))
@@ -470,12 +492,16 @@ with row2_col2:
     )
     st.plotly_chart(fig_daily_hist, use_container_width=True)
 
+with row2_col2:
+    daily_returns_histogram(daily)
+
 st.markdown('<div style="height: 60px;"></div>', unsafe_allow_html=True)  # Row spacing
 
 # Third Row: Basis vs Return Scatter and Drawdown Curve
 row3_col1, row3_col2 = st.columns(2, gap="large")
 
-with row3_col1:
+@st.fragment
+def basis_vs_return_scatter(df, daily):
     st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Basis vs Return</h1>", unsafe_allow_html=True)
     scatter_type = st.radio(
         "",
@@ -496,8 +522,13 @@ with row3_col1:
         xaxis_title = "Daily Basis ($)"
         yaxis_title = "Daily Return (%)"
     
+    large_scatter = is_large(len(x_data))
+    scatter_idx = thin_index(large_scatter, x_data, y_data)
+    x_data, y_data = x_data.iloc[scatter_idx], y_data.iloc[scatter_idx]
+
     fig_scatter = go.Figure()
-    fig_scatter.add_trace(go.Scatter(
+    fig_scatter.add_trace(scatter_trace(
+        large_scatter,
         x=x_data,
         y=y_data,
         mode='markers',
@@ -520,13 +551,18 @@ with row3_col1:
     )
     st.plotly_chart(fig_scatter, use_container_width=True)
 
+with row3_col1:
+    basis_vs_return_scatter(df, daily)
+
 with row3_col2:
     st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Drawdown Curve</h1>", unsafe_allow_html=True)
     st.markdown('<div style="height: 50px;"></div>', unsafe_allow_html=True)  # Spacer to align with selector
     fig_drawdown = go.Figure()
-    fig_drawdown.add_trace(go.Scatter(
-        x=daily.index,
-        y=daily['drawdown'] * 100,  # Convert to percentage
+    drawdown_x, drawdown_y = line_xy(daily.index, daily['drawdown'] * 100, is_large(len(daily)))  # Convert to percentage
+    fig_drawdown.add_trace(scatter_trace(
+        is_large(len(daily)),
+        x=drawdown_x,
+        y=drawdown_y,
         mode='lines',
         fill='tozeroy',
         fillcolor='rgba(255, 0, 0, 0.3)',
@@ -554,9 +590,11 @@ with final_row_col1:
     # Per-trade SP500 comparison
     scatter_mask = df['return_pct'].notna() & df['sp500_return_trade'].notna()
     scatter_df = df.loc[scatter_mask]
+    scatter_df = scatter_df.iloc[thin_index(large_history, scatter_df['sp500_return_trade'], scatter_df['return_pct'])]
     
     fig_scatter_sp500 = go.Figure()
-    fig_scatter_sp500.add_trace(go.Scatter(
+    fig_scatter_sp500.add_trace(scatter_trace(
+        large_history,
         x=scatter_df['sp500_return_trade'],
         y=scatter_df['return_pct'],
         mode='markers',
@@ -566,7 +604,7 @@ with final_row_col1:
             color='#2E86AB'
         ),
         name='Trade Returns',
-        text=scatter_df['symbol'] if 'symbol' in scatter_df.columns else None,
+        text=scatter_df['symbol'] if 'symbol' in scatter_df.columns and scatter_df['symbol'].notna().any() else None,
         hovertemplate='<b>%{text}</b><br>SP500: %{x:.2f}%<br>Trade: %{y:.2f}%<extra></extra>'
     ))
     
@@ -593,9 +631,12 @@ with final_row_col2:
         roll_corr_mask = trade_by_sell_date['roll_corr_spx'].notna()
         roll_corr_data = trade_by_sell_date.loc[roll_corr_mask]
         if not roll_corr_data.empty:
-            fig_roll_corr.add_trace(go.Scatter(
-                x=roll_corr_data.index,
-                y=roll_corr_data['roll_corr_spx'],
+            large_roll = is_large(len(roll_corr_data))
+            roll_x, roll_y = line_xy(roll_corr_data.index, roll_corr_data['roll_corr_spx'], large_roll)
+            fig_roll_corr.add_trace(scatter_trace(
+                large_roll,
+                x=roll_x,
+                y=roll_y,
                 mode='lines',
                 line=dict(color='#A23B72', width=2),
                 name='Rolling Correlation'
@@ -613,5 +654,95 @@ with final_row_col2:
     )
     st.plotly_chart(fig_roll_corr, use_container_width=True)
 
+st.markdown('<div style="height: 60px;"></div>', unsafe_allow_html=True)  # Row spacing
+
+
+@st.fragment
+def rolling_metrics_charts(daily, df, capital):
+    """Rolling Sharpe / win rate and beta / correlation, from the incremental RollingStats."""
+    roll_window = st.radio(
+        "",
+        [20, 40, 60],
+        index=1,
+        key="roll_window",
+        horizontal=True,
+        format_func=lambda w: f"{w}-day window",
+        label_visibility="collapsed"
+    )
+    rolling = rolling_frame(daily, df, capital, window=roll_window)
+    large_roll = is_large(len(rolling))
+
+    roll_col1, roll_col2 = st.columns(2, gap="large")
+    with roll_col1:
+        st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Rolling Sharpe & Win Rate</h1>", unsafe_allow_html=True)
+        fig_roll_sharpe = go.Figure()
+        sharpe_x, sharpe_y = line_xy(rolling.index, rolling['roll_sharpe'], large_roll)
+        win_x, win_y = line_xy(rolling.index, rolling['roll_win_rate'], large_roll)
+        fig_roll_sharpe.add_trace(scatter_trace(
+            large_roll,
+            x=sharpe_x,
+            y=sharpe_y,
+            mode='lines',
+            line=dict(color='#2E86AB', width=2),
+            name='Rolling Sharpe',
+            yaxis='y'
+        ))
+        fig_roll_sharpe.add_trace(scatter_trace(
+            large_roll,
+            x=win_x,
+            y=win_y,
+            mode='lines',
+            line=dict(color='#A23B72', width=2),
+            name='Rolling Win Rate',
+            yaxis='y2'
+        ))
+        fig_roll_sharpe.add_hline(y=0, line_dash="dash", line_color="black", opacity=0.5)
+        fig_roll_sharpe.update_layout(
+            xaxis=dict(title=dict(text="Date", font=dict(size=14)), tickfont=dict(size=12)),
+            yaxis=dict(title=dict(text="Sharpe (annualised)", font=dict(size=14)), tickfont=dict(size=12)),
+            yaxis2=dict(
+                title=dict(text="Win Rate (%)", font=dict(size=14)),
+                overlaying='y',
+                side='right',
+                tickfont=dict(size=12)
+            ),
+            height=320,
+            margin=dict(l=20, r=20, t=10, b=10),
+            font=dict(family="Times New Roman, Times, serif"),
+            showlegend=True,
+            legend=dict(x=0.02, y=0.98)
+        )
+        st.plotly_chart(fig_roll_sharpe, use_container_width=True)
+
+    with roll_col2:
+        st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Rolling Beta & Correlation to S&P 500</h1>", unsafe_allow_html=True)
+        fig_roll_beta = go.Figure()
+        for column, name, color in [('roll_beta', 'Beta', '#2E86AB'), ('roll_corr', 'Correlation', '#A23B72')]:
+            beta_x, beta_y = line_xy(rolling.index, rolling[column], large_roll)
+            fig_roll_beta.add_trace(scatter_trace(
+                large_roll,
+                x=beta_x,
+                y=beta_y,
+                mode='lines',
+                line=dict(color=color, width=2),
+                name=name
+            ))
+        fig_roll_beta.add_hline(y=0, line_dash="dash", line_color="black", opacity=0.5)
+        fig_roll_beta.update_layout(
+            xaxis=dict(title=dict(text="Date", font=dict(size=14)), tickfont=dict(size=12)),
+            yaxis=dict(title=dict(text="Beta / Correlation", font=dict(size=14)), tickfont=dict(size=12)),
+            height=320,
+            margin=dict(l=20, r=20, t=10, b=10),
+            font=dict(family="Times New Roman, Times, serif"),
+            showlegend=True,
+            legend=dict(x=0.02, y=0.98)
+        )
+        st.plotly_chart(fig_roll_beta, use_container_width=True)
+
+    st.caption("Daily return is P&L over equity (assumed capital + cumulative P&L), as in the capital Sharpe. Beta and correlation use the S&P 500 daily return, over the days in the window it traded.")
+
+st.markdown("<h1 style='font-size: 24px; font-weight: bold;'>Rolling Metrics</h1>", unsafe_allow_html=True)
+rolling_metrics_charts(daily, df, capital)
+
 st.markdown("---")
 
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import pandas as pd
+import yfinance as yf
+
+
+"""
+On-disk store of daily closes for benchmark tickers (^GSPC etc.), one parquet per ticker.
+
+Only the part of [start, end] that has never been requested is downloaded; a sidecar
+json remembers the covered range so holidays / pre-listing gaps aren't re-requested.
+Today's close isn't final, so coverage only ever runs up to yesterday.
+If yfinance is unreachable whatever is on disk is returned, so the dashboard works offline.
+An empty download is treated as a failure, so a range is only marked covered once data came back.
+"""
+
+
+def _to_date(d) -> date:
+    return pd.Timestamp(d).date()
+
+
+class BenchmarkStore:
+
+    def __init__(self, store_dir: Union[str, Path]):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.store_dir / "coverage.json"
+
+    def _path(self, ticker: str) -> Path:
+        safe = ticker.replace("^", "").replace("/", "_").upper()
+        return self.store_dir / f"{safe}.parquet"
+
+    # ======================= #
+    #        METADATA         #
+    # ======================= #
+
+    def _read_meta(self) -> dict:
+        try:
+            return json.loads(self.meta_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _coverage(self, ticker: str) -> Optional[Tuple[date, date]]:
+        entry = self._read_meta().get(ticker)
+        if not entry:
+            return None
+        return _to_date(entry["from"]), _to_date(entry["to"])
+
+    def _set_coverage(self, ticker: str, start: date, end: date):
+        meta = self._read_meta()
+        meta[ticker] = {"from": start.isoformat(), "to": end.isoformat()}
+        self._atomic_write(self.meta_path, lambda f: f.write(json.dumps(meta, indent=2)), mode="w")
+
+    def _atomic_write(self, path: Path, write, mode="wb"):
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # ======================= #
+    #      READ / TOP UP      #
+    # ======================= #
+
+    def load(self, ticker: str) -> pd.Series:
+        """everything stored for `ticker`, a close series indexed by date"""
+        path = self._path(ticker)
+        if not path.exists():
+            return pd.Series(dtype=float, name="close")
+        closes = pd.read_parquet(path)["close"]
+        closes.index = pd.to_datetime(closes.index)
+        return closes
+
+    def _download(self, ticker: str, start: date, end: date) -> Optional[pd.Series]:
+        """daily closes in [start, end] from yfinance, None if the download failed"""
+        try:
+            data = yf.download(ticker, start=start, end=end + timedelta(days=1), progress=False)
+        except Exception as e:
+            print(f"Benchmark download failed for {ticker}: {e}")
+            return None
+
+        if data is None:
+            return None
+        if data.empty:
+            return pd.Series(dtype=float, name="close")
+
+        # newer yfinance versions return multi-level columns ('Close', '^GSPC')
+        close = data["Close"]
+        if isinstance(close, pd.DataFrame):
+            close = close[ticker] if ticker in close.columns else close.iloc[:, 0]
+
+        close = close.dropna().astype(float).rename("close")
+        close.index = pd.to_datetime(close.index).tz_localize(None).normalize()
+        return close
+
+    def _missing_ranges(self, ticker: str, start: date, end: date):
+        covered = self._coverage(ticker)
+        if covered is None:
+            return [(start, end)]
+
+        ranges = []
+        if start < covered[0]:
+            ranges.append((start, covered[0] - timedelta(days=1)))
+        if end > covered[1]:
+            ranges.append((covered[1] + timedelta(days=1), end))
+        return ranges
+
+    def get_closes(self, ticker: str, start, end) -> pd.Series:
+        """
+        Daily closes for `ticker` in [start, end], topping up only the missing date ranges.
+        """
+
+        start, end = _to_date(start), _to_date(end)
+        last_final_close = date.today() - timedelta(days=1)
+
+        closes = self.load(ticker)
+        fetched = []
+        covered = self._coverage(ticker)
+        cover_from, cover_to = covered if covered else (None, None)
+
+        for lo, hi in self._missing_ranges(ticker, start, min(end, last_final_close)):
+            if lo > hi:
+                continue
+            new = self._download(ticker, lo, hi)
+            if new is None or new.empty:
+                continue  # offline (yfinance returns empty on failure), try again next time
+            fetched.append(new)
+            cover_from = lo if cover_from is None else min(cover_from, lo)
+            cover_to = hi if cover_to is None else max(cover_to, hi)
+
+        # today's (unfinished) bar is served but never stored
+        today_bar = None
+        if end > last_final_close:
+            today_bar = self._download(ticker, last_final_close + timedelta(days=1), end)
+
+        if fetched:
+            closes = pd.concat([closes, *fetched])
+            closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+            self._atomic_write(self._path(ticker), lambda f: closes.to_frame("close").to_parquet(f))
+            self._set_coverage(ticker, cover_from, cover_to)
+
+        if today_bar is not None and not today_bar.empty:
+            closes = pd.concat([closes, today_bar])
+            closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+
+        return closes.loc[pd.Timestamp(start):pd.Timestamp(end)]
@@ -0,0 +1,126 @@
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Bootstrap confidence intervals for the headline metrics, vectorised in numpy.
+
+Resample indices are drawn for all resamples at once as a (n_resamples, n) matrix and the
+metric is computed along axis 1, so there's no python loop per resample (only over chunks
+of resamples, to bound memory on long histories).
+
+- daily series (Sharpe, drawdown) use a stationary block bootstrap (Politis & Romano):
+  blocks start at random days and have geometric lengths with mean `mean_block`, wrapping
+  around the end, which keeps the short-range autocorrelation of daily P&L
+- per-trade metrics (win rate, profit factor) resample trades iid
+"""
+
+
+N_RESAMPLES = 10000
+MEAN_BLOCK = 5        # days, mean block length for the stationary bootstrap
+CHUNK_ELEMENTS = 4_000_000  # resample matrix cells per chunk (~32MB of float64)
+
+
+def iid_indices(n: int, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.integers(0, n, size=(n_resamples, n))
+
+
+def stationary_block_indices(n: int, n_resamples: int, mean_block: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    (n_resamples, n) index matrix for the stationary bootstrap: each position starts a new
+    block with probability 1 / mean_block (always at position 0), otherwise continues the
+    previous block one day on, wrapping around.
+    """
+
+    positions = np.arange(n)
+    new_block = rng.random((n_resamples, n)) < 1.0 / mean_block
+    new_block[:, 0] = True
+    starts = rng.integers(0, n, size=(n_resamples, n))
+
+    # position where the current block began, carried forward along each row
+    block_began = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+    block_start = np.take_along_axis(starts, block_began, axis=1)
+    return (block_start + positions - block_began) % n
+
+
+# ======================= #
+#  METRICS ON RESAMPLES   #
+# ======================= #
+# each takes a (n_resamples, n) matrix of resampled values and returns n_resamples values
+
+def sharpe_rows(x: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return x.mean(axis=1) / x.std(axis=1, ddof=1) * np.sqrt(252)
+
+
+def max_drawdown_rows(daily_return: np.ndarray) -> np.ndarray:
+    cum = np.cumprod(1 + daily_return, axis=1)
+    return (cum / np.maximum.accumulate(cum, axis=1) - 1).min(axis=1) * 100
+
+
+def win_rate_rows(pnl: np.ndarray) -> np.ndarray:
+    return (pnl > 0).mean(axis=1) * 100
+
+
+def profit_factor_rows(pnl: np.ndarray) -> np.ndarray:
+    gross_profit = np.where(pnl > 0, pnl, 0).sum(axis=1)
+    gross_loss = -np.where(pnl < 0, pnl, 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+
+
+# ======================= #
+#         ENGINE          #
+# ======================= #
+
+def bootstrap_distribution(values, stat: Callable[[np.ndarray], np.ndarray], n_resamples: int = N_RESAMPLES,
+                           block: bool = False, mean_block: float = MEAN_BLOCK,
+                           rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """the statistic on each of n_resamples resamples of `values` (nan values dropped first)"""
+
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n < 2:
+        return np.full(n_resamples, np.nan)
+
+    rng = rng if rng is not None else np.random.default_rng(0)
+    chunk = max(1, CHUNK_ELEMENTS // n)
+    out = np.empty(n_resamples)
+    for lo in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - lo)
+        idx = stationary_block_indices(n, size, mean_block, rng) if block else iid_indices(n, size, rng)
+        out[lo:lo + size] = stat(values[idx])
+    return out
+
+
+def percentile_ci(distribution: np.ndarray, alpha: float = 0.05) -> Tuple[float, float]:
+    finite = distribution[np.isfinite(distribution)]
+    if len(finite) == 0:
+        return np.nan, np.nan
+    lo, hi = np.percentile(finite, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return float(lo), float(hi)
+
+
+def bootstrap_metric_cis(daily: pd.DataFrame, df: pd.DataFrame, n_resamples: int = N_RESAMPLES,
+                         mean_block: float = MEAN_BLOCK, alpha: float = 0.05,
+                         seed: int = 0) -> Dict[str, Tuple[float, float]]:
+    """
+    (lo, hi) percentile intervals for the headline metrics.
+
+    daily / df: the per-day and per-trade frames from compute_metrics
+    """
+
+    rng = np.random.default_rng(seed)
+    daily_kw = dict(n_resamples=n_resamples, block=True, mean_block=mean_block, rng=rng)
+    trade_kw = dict(n_resamples=n_resamples, rng=rng)
+
+    return {
+        'sharpe_capital': percentile_ci(bootstrap_distribution(daily['ret_equity'], sharpe_rows, **daily_kw), alpha),
+        'sharpe_dollar': percentile_ci(bootstrap_distribution(daily['pnl_daily'], sharpe_rows, **daily_kw), alpha),
+        'max_drawdown_pct': percentile_ci(bootstrap_distribution(daily['daily_return_pct'], max_drawdown_rows, **daily_kw), alpha),
+        'win_rate': percentile_ci(bootstrap_distribution(df['pnl'], win_rate_rows, **trade_kw), alpha),
+        'profit_factor': percentile_ci(bootstrap_distribution(df['pnl'], profit_factor_rows, **trade_kw), alpha),
+    }
@@ -0,0 +1,138 @@
+import sqlite3
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Live view of the bot's trade store (the round_trips table in account_analysis/trade_store.py).
+
+- the store is opened read-only (sqlite URI mode=ro); it runs in WAL mode, so reading never
+  blocks or locks the fetcher writing to it
+- each poll only selects what changed since the last one: rows (and deletions, from
+  round_trip_deletions) with a change_seq above the last one seen
+- rows are kept by their key (buy_order_id, sell_order_id): a changed row replaces the old
+  one and a deleted row is dropped, so an updated pnl or a legacy row superseded by its full
+  version is never counted twice
+- aggregates (per-day P&L / basis, win / loss counts, gross profit / loss) are additive: the
+  old version of a changed row is taken out and the new one put in, nothing else is re-read
+"""
+
+
+KEY_COLUMNS = ['buy_order_id', 'sell_order_id']
+LIVE_COLUMNS = ['symbol', 'qty', 'buy_time', 'sell_time', 'pnl_amount', 'basis']
+
+
+class LiveTradeFeed:
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.last_seq = -1  # rows written before change_seq existed have 0
+        self._rows = pd.DataFrame(columns=LIVE_COLUMNS, index=pd.MultiIndex.from_arrays([[], []], names=KEY_COLUMNS))
+        self.daily = pd.DataFrame(columns=['pnl_daily', 'basis_daily'], dtype=float)
+        self._daily_count = pd.Series(dtype=float)  # trades per day, so emptied days can be dropped
+
+        self.num_trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.last_poll_new_rows = 0
+
+    def _connect(self):
+        # read-only, never takes a write lock on the bot's database
+        return sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=5)
+
+    def poll(self) -> int:
+        """fetch what changed since the last poll and fold it into the aggregates, returns how many new trades"""
+
+        if not self.db_path.exists():
+            self.last_poll_new_rows = 0
+            return 0
+
+        con = self._connect()
+        try:
+            changed = pd.read_sql_query(
+                f"SELECT change_seq, {', '.join(KEY_COLUMNS + LIVE_COLUMNS)} FROM round_trips WHERE change_seq > ?",
+                con, params=(self.last_seq,),
+            )
+            deleted = pd.read_sql_query(
+                f"SELECT change_seq, {', '.join(KEY_COLUMNS)} FROM round_trip_deletions WHERE change_seq > ?",
+                con, params=(self.last_seq,),
+            )
+        finally:
+            con.close()
+
+        if changed.empty and deleted.empty:
+            self.last_poll_new_rows = 0
+            return 0
+        self.last_seq = int(max(changed['change_seq'].max() if len(changed) else -1,
+                                deleted['change_seq'].max() if len(deleted) else -1))
+
+        # a key deleted after it was (re)written in this window stays deleted, and vice versa
+        deleted = deleted.assign(_deleted=True)
+        events = pd.concat([changed.assign(_deleted=False), deleted], ignore_index=True)
+        events = events.sort_values('change_seq', kind='stable').drop_duplicates(KEY_COLUMNS, keep='last')
+        events = events.set_index(KEY_COLUMNS)
+
+        before = self.num_trades
+        old = self._rows[self._rows.index.isin(events.index)]
+        if len(old):
+            self._update_aggregates(old, sign=-1)
+
+        upserts = events.loc[~events['_deleted'].astype(bool), LIVE_COLUMNS]
+        if len(upserts):
+            self._update_aggregates(upserts, sign=1)
+
+        kept = self._rows[~self._rows.index.isin(events.index)]
+        self._rows = pd.concat([kept, upserts]) if len(kept) else upserts
+
+        self.last_poll_new_rows = max(self.num_trades - before, 0)
+        return self.last_poll_new_rows
+
+    @property
+    def trades(self) -> pd.DataFrame:
+        """every current row of the store (store format)"""
+        return self._rows.reset_index(drop=True)
+
+    def _update_aggregates(self, rows: pd.DataFrame, sign: int = 1):
+        """add (sign=1) or take out (sign=-1) the rows' contribution"""
+
+        pnl = rows['pnl_amount'].astype(float)
+        basis = rows['basis'].astype(float).abs()
+
+        self.num_trades += sign * len(rows)
+        self.wins += sign * int((pnl > 0).sum())
+        self.losses += sign * int((pnl < 0).sum())
+        self.gross_profit += sign * float(pnl[pnl > 0].sum())
+        self.gross_loss += sign * float(-pnl[pnl < 0].sum())
+
+        sell_date = pd.to_datetime(rows['sell_time'], format="ISO8601", utc=True).dt.date
+        delta = pd.DataFrame({'pnl_daily': sign * pnl.values, 'basis_daily': sign * basis.values}, index=sell_date.values)
+        delta = delta.groupby(level=0).sum()
+        count = pd.Series(sign, index=sell_date.values).groupby(level=0).sum()
+
+        # only the days touched by these rows change
+        self.daily = delta.add(self.daily, fill_value=0.0) if len(self.daily) else delta
+        self._daily_count = count.add(self._daily_count, fill_value=0) if len(self._daily_count) else count
+        live_days = self._daily_count[self._daily_count > 0].index
+        self._daily_count = self._daily_count.loc[live_days]
+        self.daily = self.daily.loc[self.daily.index.isin(live_days)].sort_index()
+
+    # ======================= #
+    #     LIVE METRICS        #
+    # ======================= #
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.num_trades * 100 if self.num_trades else 0.0
+
+    @property
+    def profit_factor(self) -> float:
+        return self.gross_profit / self.gross_loss if self.gross_loss > 0 else np.inf
+
+    @property
+    def total_pnl(self) -> float:
+        return self.gross_profit - self.gross_loss
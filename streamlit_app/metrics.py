@@ -0,0 +1,207 @@
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Pure metric computations for the dashboard (no streamlit in here).
+
+Everything the metrics block used to do inline on every rerun: daily aggregation,
+both Sharpe variants, drawdown, win rate, profit factor and the S&P comparison.
+app.py caches compute_metrics keyed on file_fingerprint(trades file) + capital,
+and the account analysis code can import the same functions.
+"""
+
+
+def file_fingerprint(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """sha256 of the file contents, used as the cache key for anything derived from it"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalise_round_trips(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Map either round-trip csv format onto the columns the dashboard uses:
+    buy_date_dt, sell_date_dt, date (= sell date), pnl, basis, return_pct.
+
+    - Alpaca (trades.csv / trade store): buy_time, sell_time, pnl_amount, basis
+    - IBKR (ibkr_trades_round_trips.csv): buy_date_dt, sell_date_dt, pnl, basis, return_pct
+    """
+
+    df = df.copy()
+    if 'buy_time' in df.columns:
+        df['buy_date_dt'] = pd.to_datetime(df['buy_time'])
+        df['sell_date_dt'] = pd.to_datetime(df['sell_time'])
+    else:
+        df['buy_date_dt'] = pd.to_datetime(df['buy_date_dt'])
+        df['sell_date_dt'] = pd.to_datetime(df['sell_date_dt'])
+    for col in ('buy_date_dt', 'sell_date_dt'):
+        if df[col].dt.tz is not None:  # trade store times are tz-aware UTC, the csvs are naive
+            df[col] = df[col].dt.tz_convert('UTC').dt.tz_localize(None)
+    df['date'] = df['sell_date_dt']  # Use sell date as the reference date
+    if 'pnl' not in df.columns:
+        df['pnl'] = df['pnl_amount']
+    if 'return_pct' not in df.columns:
+        df['return_pct'] = df['pnl'] / df['basis']  # Compute return_pct for per-trade comparison
+    return df
+
+
+def get_sp500_returns_for_trades(df, sp500_df):
+    """Calculate SP500 return over each trade's holding period, for all trades at once.
+
+    As-of join: each buy / sell date takes the close of the nearest available date on or
+    before it (searchsorted on the sorted date index), NaN if there is none.
+    """
+    sp500_sorted = sp500_df.sort_index()
+    available_dates = pd.to_datetime(pd.Index(sp500_sorted.index)).values
+    closes = sp500_sorted['sp500_close'].to_numpy(dtype=float)
+
+    def close_on_or_before(dates):
+        dates = pd.to_datetime(dates)
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        dates = dates.dt.normalize().values
+        idx = np.searchsorted(available_dates, dates, side='right') - 1
+        valid = (idx >= 0) & ~pd.isna(dates)
+        return np.where(valid, closes[np.clip(idx, 0, None)] if len(closes) else np.nan, np.nan)
+
+    buy_price = close_on_or_before(df['buy_date_dt'])
+    sell_price = close_on_or_before(df['sell_date_dt'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = ((sell_price - buy_price) / buy_price) * 100
+    returns[(buy_price == 0) | np.isnan(buy_price)] = np.nan
+
+    return pd.Series(returns, index=df.index)
+
+
+def compute_metrics(df: pd.DataFrame, capital: float, sp500_close: Optional[pd.Series] = None,
+                    roll_corr_window: int = 40) -> Dict[str, Any]:
+    """
+    All headline metrics + the frames the charts are drawn from.
+
+    df: round trips in dashboard format (see normalise_round_trips)
+    capital: assumed average deployed capital, for the capital-based Sharpe
+    sp500_close: daily S&P closes indexed by date, None / empty if unavailable
+
+    Returns a dict with the enriched per-trade frame ('df'), the per-day frame ('daily'),
+    'trade_by_sell_date' (None without S&P data) and the scalar metrics.
+    """
+
+    df = df.sort_values('date').copy()
+    df['basis'] = df['basis'].abs()
+    df['return_pct_individual'] = df['pnl'] / df['basis']
+
+    daily = df.groupby('date').agg(
+        pnl_daily=('pnl','sum'),
+        basis_daily=('basis','sum'))
+    daily['daily_return_pct'] = daily['pnl_daily'] / daily['basis_daily']
+
+    # S&P 500 comparison (per-trade holding period method)
+    trade_by_sell_date = None
+
+    if sp500_close is not None and not sp500_close.empty:
+        sp500_daily = pd.DataFrame(index=sp500_close.index.date)
+        sp500_daily['sp500_close'] = sp500_close.values
+        sp500_daily['sp500_return_pct'] = sp500_close.pct_change().values * 100
+
+        df['sp500_return_trade'] = get_sp500_returns_for_trades(df, sp500_daily)
+
+        valid_mask_trade = df['return_pct'].notna() & df['sp500_return_trade'].notna()
+        if valid_mask_trade.sum() > 1:
+            correlation_with_sp500 = df.loc[valid_mask_trade, 'return_pct'].corr(
+                df.loc[valid_mask_trade, 'sp500_return_trade']
+            )
+        else:
+            correlation_with_sp500 = np.nan
+
+        # Aggregate by sell_date for rolling correlation
+        trade_by_sell_date = df.groupby(df['sell_date_dt'].dt.date).agg(
+            return_pct_mean=('return_pct', 'mean'),
+            sp500_return_mean=('sp500_return_trade', 'mean')
+        ).sort_index()
+
+        # Rolling correlation on aggregated data
+        trade_by_sell_date['roll_corr_spx'] = (
+            trade_by_sell_date['return_pct_mean']
+            .rolling(window=roll_corr_window)
+            .corr(trade_by_sell_date['sp500_return_mean'])
+        )
+
+        # Also add daily SP500 data for other charts
+        if not isinstance(daily.index[0], type(pd.Timestamp.now().date())):
+            daily.index = pd.to_datetime(daily.index).date
+        daily = daily.merge(sp500_daily[['sp500_close', 'sp500_return_pct']],
+                            left_index=True, right_index=True, how='left')
+    else:
+        # SP500 data not available
+        df['sp500_return_trade'] = np.nan
+        daily['sp500_close'] = np.nan
+        daily['sp500_return_pct'] = np.nan
+        correlation_with_sp500 = np.nan
+
+    # 1. NUMBER OF TRADES
+    num_trades = len(df)
+
+    # 2 sharpe by dollar amount
+    sharpe_dollar = (daily['pnl_daily'].mean() / daily['pnl_daily'].std()) * np.sqrt(252)
+
+    # 3 sharpe using capital
+    daily['equity'] = capital + daily['pnl_daily'].cumsum()
+    daily['equity_prev'] = daily['equity'].shift(1)
+    daily['ret_equity'] = daily['equity'] / daily['equity_prev'] - 1
+    daily.loc[daily.index[0], 'ret_equity'] = (
+        daily.iloc[0]['equity'] / capital - 1)
+
+    mean_ret = daily['ret_equity'].mean()
+    std_ret  = daily['ret_equity'].std(ddof=1)
+    sharpe_capital = np.sqrt(252) * mean_ret / std_ret
+
+    # 4 max drawdown
+    daily['cum_return_pct'] = (1 + daily['daily_return_pct']).cumprod()
+    daily['peak_cum_return_pct'] = daily['cum_return_pct'].cummax()
+    daily['drawdown'] = daily['cum_return_pct'] / daily['peak_cum_return_pct'] - 1
+    max_drawdown_pct = daily['drawdown'].min() * 100
+
+    # 5 win rate
+    wins = (df['pnl'] > 0).sum()
+    losses = (df['pnl'] < 0).sum()
+    win_rate = (wins / num_trades * 100) if num_trades > 0 else 0
+
+    # 6 average win vs average loss
+    avg_win = df[df['return_pct_individual'] > 0]['return_pct_individual'].mean() * 100
+    avg_loss = df[df['return_pct_individual'] < 0]['return_pct_individual'].mean() * 100
+
+    # 7 profit factor
+    gross_profit = df[df['pnl'] > 0]['pnl'].sum()
+    gross_loss = abs(df[df['pnl'] < 0]['pnl'].sum())
+    profit_factor = gross_profit / gross_loss if gross_loss > 0 else np.inf
+
+    # 8 mean return per trade
+    mean_return_per_trade = df['return_pct_individual'].mean()*100
+
+    return {
+        'df': df,
+        'daily': daily,
+        'trade_by_sell_date': trade_by_sell_date,
+        'num_trades': num_trades,
+        'sharpe_dollar': sharpe_dollar,
+        'sharpe_capital': sharpe_capital,
+        'correlation_with_sp500': correlation_with_sp500,
+        'max_drawdown_pct': max_drawdown_pct,
+        'wins': wins,
+        'losses': losses,
+        'win_rate': win_rate,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': profit_factor,
+        'mean_return_per_trade': mean_return_per_trade,
+    }
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+"""
+Rendering helpers that keep chart payloads flat as the trade history grows.
+
+Below LARGE_HISTORY_THRESHOLD points nothing changes (SVG traces, raw histograms).
+Above it:
+- scatters are drawn with WebGL (go.Scattergl) and thinned to a reproducible sample
+  that always keeps the extreme points on both axes
+- histograms are binned here and sent as a bar trace of bin counts, not the raw values
+- line series are min/max downsampled per bucket, so spikes and drawdowns survive
+"""
+
+
+LARGE_HISTORY_THRESHOLD = 5000  # points per trace
+MAX_LINE_POINTS = 4000          # downsampled line series hold at most ~this many points
+MAX_SCATTER_POINTS = 20000      # scatters are thinned to a fixed-seed sample of this size
+
+
+def is_large(n: int, threshold: int = None) -> bool:
+    return n > (LARGE_HISTORY_THRESHOLD if threshold is None else threshold)
+
+
+def scatter_trace(large: bool, **kwargs):
+    """go.Scatter, or its WebGL twin for large histories (same arguments)"""
+    return go.Scattergl(**kwargs) if large else go.Scatter(**kwargs)
+
+
+def thin_index(large: bool, x, y, max_points: int = MAX_SCATTER_POINTS, seed: int = 0) -> np.ndarray:
+    """
+    Positions of the points to draw in a scatter: all of them normally, otherwise a
+    fixed-seed sample of <= max_points plus the min / max of x and y (the outliers).
+    """
+
+    x = pd.Series(x, dtype=float).to_numpy()
+    y = pd.Series(y, dtype=float).to_numpy()
+    n = len(x)
+    if not large or n <= max_points:
+        return np.arange(n)
+
+    extremes = [
+        np.nanargmin(x), np.nanargmax(x), np.nanargmin(y), np.nanargmax(y),
+    ] if np.isfinite(x).any() and np.isfinite(y).any() else []
+    sample = np.random.default_rng(seed).choice(n, size=max_points - len(extremes), replace=False)
+    return np.unique(np.concatenate([sample, np.asarray(extremes, dtype=int)]))
+
+
+def minmax_downsample(x, y, max_points: int = MAX_LINE_POINTS):
+    """
+    Downsample an ordered series to <= max_points, keeping the first, min, max and last
+    point of each equal-size bucket (in original order). Returns (x, y) unchanged if short.
+    """
+
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return x, y
+
+    bucket = int(np.ceil(n / (max_points / 4)))
+    n_full = (n // bucket) * bucket
+
+    # nan can't be a min / max, treat it as neutral for argmin / argmax
+    filled_min = np.where(np.isnan(y), np.inf, y)
+    filled_max = np.where(np.isnan(y), -np.inf, y)
+
+    starts = np.arange(0, n_full, bucket)
+    keep = [
+        starts,
+        starts + filled_min[:n_full].reshape(-1, bucket).argmin(axis=1),
+        starts + filled_max[:n_full].reshape(-1, bucket).argmax(axis=1),
+        starts + bucket - 1,
+    ]
+    if n_full < n:  # ragged last bucket
+        tail = np.arange(n_full, n)
+        keep.append(np.array([n_full, tail[filled_min[n_full:].argmin()], tail[filled_max[n_full:].argmax()], n - 1]))
+
+    idx = np.unique(np.concatenate(keep))
+    return x[idx], y[idx]
+
+
+def line_xy(x, y, large: bool):
+    """x, y for a line trace, min/max downsampled when the history is large"""
+    if not large:
+        return x, y
+    x_ds, y_ds = minmax_downsample(np.asarray(x), np.asarray(y, dtype=float))
+    return x_ds, y_ds
+
+
+def histogram_trace(values, large: bool, nbins: int = 120, **kwargs):
+    """
+    go.Histogram of raw values, or for large histories a go.Bar of counts binned
+    server-side into `nbins` equal-width bins.
+    """
+
+    if not large:
+        return go.Histogram(x=values, nbinsx=nbins, **kwargs)
+
+    values = pd.Series(values, dtype=float).to_numpy()
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return go.Bar(x=[], y=[], **kwargs)
+
+    counts, edges = np.histogram(values, bins=nbins)
+    return go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        **kwargs,
+    )
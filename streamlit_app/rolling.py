@@ -0,0 +1,234 @@
+import json
+import math
+import os
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+
+"""
+Rolling analytics that update in O(1) per new day instead of recomputing the whole history.
+
+RollingStats keeps a fixed window of daily values in deques plus running sums of them
+(x, x^2, x*y ...), so adding a day is: add the new value to the sums, subtract the one
+falling out of the window. Tracked:
+- rolling Sharpe of the daily return on equity (capital + cumulative P&L, as sharpe_capital)
+- rolling beta and correlation of that return against the S&P daily return
+- running equity peak and drawdown from it (whole history, not windowed)
+- rolling win rate (wins / trades over the window's days)
+
+state_dict() / from_state() give a json-safe checkpoint so a long-running process can
+save it and carry on later without replaying the history.
+"""
+
+
+class RollingStats:
+
+    def __init__(self, window: int = 40, capital: float = 5000.0, periods_per_year: int = 252):
+        self.window = window
+        self.capital = capital
+        self.periods_per_year = periods_per_year
+
+        self.equity = capital
+        self.peak_equity = capital
+        self.n_updates = 0
+
+        # (return, wins, trades) per day, and (day number, return, benchmark return) for the
+        # days in the window that have a benchmark value
+        self._days = deque(maxlen=window)
+        self._pairs = deque()
+        self._reset_sums()
+
+    def _reset_sums(self):
+        self._sum_r = 0.0
+        self._sum_rr = 0.0
+        self._sum_wins = 0
+        self._sum_trades = 0
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._sum_xx = 0.0
+        self._sum_yy = 0.0
+        self._sum_xy = 0.0
+
+    # ======================= #
+    #         UPDATE          #
+    # ======================= #
+
+    def _push_day(self, day):
+        if len(self._days) == self.window:
+            r_old, wins_old, trades_old = self._days[0]
+            self._sum_r -= r_old
+            self._sum_rr -= r_old * r_old
+            self._sum_wins -= wins_old
+            self._sum_trades -= trades_old
+        self._days.append(day)
+        r, wins, trades = day
+        self._sum_r += r
+        self._sum_rr += r * r
+        self._sum_wins += wins
+        self._sum_trades += trades
+
+    def _evict_pairs(self):
+        # drop pairs for days that have left the window (at most one per update, amortised)
+        while self._pairs and self._pairs[0][0] <= self.n_updates - self.window:
+            _, x_old, y_old = self._pairs.popleft()
+            self._sum_x -= x_old
+            self._sum_y -= y_old
+            self._sum_xx -= x_old * x_old
+            self._sum_yy -= y_old * y_old
+            self._sum_xy -= x_old * y_old
+
+    def _push_pair(self, pair):
+        self._pairs.append(pair)
+        _, x, y = pair
+        self._sum_x += x
+        self._sum_y += y
+        self._sum_xx += x * x
+        self._sum_yy += y * y
+        self._sum_xy += x * y
+
+    def update(self, pnl: float, wins: int = 0, trades: int = 0, benchmark_return: float = np.nan) -> dict:
+        """
+        Add one day.
+        pnl: the day's P&L ($), wins / trades: trade counts closed that day,
+        benchmark_return: the S&P return that day as a fraction (nan if it didn't trade)
+        Returns the current stats (see current()).
+        """
+
+        ret = pnl / self.equity if self.equity else 0.0
+        self.equity += pnl
+        self.peak_equity = max(self.peak_equity, self.equity)
+        self.n_updates += 1
+
+        self._push_day((ret, int(wins), int(trades)))
+        # beta / correlation use the same window of days, minus the ones without a benchmark value
+        self._evict_pairs()
+        if benchmark_return is not None and not math.isnan(benchmark_return):
+            self._push_pair((self.n_updates, ret, float(benchmark_return)))
+
+        return self.current()
+
+    # ======================= #
+    #         READ            #
+    # ======================= #
+
+    @property
+    def rolling_sharpe(self) -> float:
+        n = len(self._days)
+        if n < 2:
+            return np.nan
+        var = max((self._sum_rr - self._sum_r ** 2 / n) / (n - 1), 0.0)
+        if var == 0:
+            return np.nan
+        return (self._sum_r / n) / math.sqrt(var) * math.sqrt(self.periods_per_year)
+
+    def _cov_var(self):
+        n = len(self._pairs)
+        if n < 2:
+            return np.nan, np.nan, np.nan
+        cov = (self._sum_xy - self._sum_x * self._sum_y / n) / (n - 1)
+        var_x = max((self._sum_xx - self._sum_x ** 2 / n) / (n - 1), 0.0)
+        var_y = max((self._sum_yy - self._sum_y ** 2 / n) / (n - 1), 0.0)
+        return cov, var_x, var_y
+
+    @property
+    def rolling_beta(self) -> float:
+        cov, _, var_y = self._cov_var()
+        return cov / var_y if var_y > 0 else np.nan
+
+    @property
+    def rolling_correlation(self) -> float:
+        cov, var_x, var_y = self._cov_var()
+        return cov / math.sqrt(var_x * var_y) if var_x > 0 and var_y > 0 else np.nan
+
+    @property
+    def drawdown(self) -> float:
+        return self.equity / self.peak_equity - 1 if self.peak_equity else 0.0
+
+    @property
+    def rolling_win_rate(self) -> float:
+        return self._sum_wins / self._sum_trades * 100 if self._sum_trades else np.nan
+
+    def current(self) -> dict:
+        return {
+            'roll_sharpe': self.rolling_sharpe,
+            'roll_beta': self.rolling_beta,
+            'roll_corr': self.rolling_correlation,
+            'roll_win_rate': self.rolling_win_rate,
+            'equity': self.equity,
+            'peak_equity': self.peak_equity,
+            'drawdown': self.drawdown,
+        }
+
+    # ======================= #
+    #       CHECKPOINT        #
+    # ======================= #
+
+    def state_dict(self) -> dict:
+        """json-safe snapshot of everything needed to carry on updating"""
+        return {
+            'window': self.window,
+            'capital': self.capital,
+            'periods_per_year': self.periods_per_year,
+            'equity': self.equity,
+            'peak_equity': self.peak_equity,
+            'n_updates': self.n_updates,
+            'days': [list(d) for d in self._days],
+            'pairs': [list(p) for p in self._pairs],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RollingStats":
+        stats = cls(state['window'], state['capital'], state['periods_per_year'])
+        stats.equity = state['equity']
+        stats.peak_equity = state['peak_equity']
+        stats.n_updates = state['n_updates']
+        # sums are rebuilt from the window contents, so drift from +/- doesn't carry over
+        for r, wins, trades in state['days']:
+            stats._push_day((r, wins, trades))
+        for day, x, y in state['pairs']:
+            stats._push_pair((day, x, y))
+        return stats
+
+    def save(self, path: Union[str, Path]):
+        """atomic write of state_dict() as json"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.state_dict(), f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "RollingStats":
+        return cls.from_state(json.loads(Path(path).read_text()))
+
+
+def rolling_frame(daily: pd.DataFrame, df: pd.DataFrame, capital: float, window: int = 40) -> pd.DataFrame:
+    """
+    Feed a whole history through RollingStats, one row of stats per day.
+
+    daily: per-day frame from compute_metrics (pnl_daily, sp500_return_pct)
+    df: per-trade frame from compute_metrics (date, pnl), for the win / trade counts
+    """
+
+    by_day = df.groupby('date')['pnl'].agg(wins=lambda p: int((p > 0).sum()), trades='size')
+    if len(by_day) != len(daily):
+        raise ValueError("daily and df don't cover the same days")
+
+    pnl = daily['pnl_daily'].to_numpy(dtype=float)
+    bench = (daily['sp500_return_pct'] / 100).to_numpy(dtype=float) if 'sp500_return_pct' in daily else np.full(len(daily), np.nan)
+    wins = by_day['wins'].to_numpy()
+    trades = by_day['trades'].to_numpy()
+
+    stats = RollingStats(window=window, capital=capital)
+    rows = [stats.update(pnl[i], wins[i], trades[i], bench[i]) for i in range(len(daily))]
+    return pd.DataFrame(rows, index=daily.index)
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from public.cycle_watchdog import CycleWatchdog, PhaseStillRunning, PhaseTimeout
+
+
+"""
+An abandoned (timed-out) phase keeps running in its thread, so nothing else may start
+until it's done: it could still be placing orders on the state the next phase reads.
+"""
+
+
+def test_abandoned_phase_blocks_every_phase_until_it_finishes():
+    watchdog = CycleWatchdog(deadline_s=60, phase_timeouts={"reconcile": 0.05})
+    release = threading.Event()
+    calls = []
+
+    watchdog.start()
+    with pytest.raises(PhaseTimeout):
+        watchdog.run_phase("reconcile", release.wait)
+    watchdog.finish()
+    assert watchdog.still_running() == ["reconcile"]
+
+    # next cycle: neither an untimed phase nor the same phase starts while it's alive
+    watchdog.start()
+    with pytest.raises(PhaseStillRunning):
+        watchdog.run_phase("position_states", calls.append, "position_states")
+    with pytest.raises(PhaseStillRunning):
+        watchdog.run_phase("reconcile", calls.append, "reconcile")
+    report = watchdog.finish()
+    assert calls == []
+    assert report["timed_out"] == ["position_states", "reconcile"]
+
+    # once the abandoned thread is done, cycles run normally again
+    release.set()
+    watchdog._abandoned["reconcile"].join(1)
+    watchdog.start()
+    watchdog.run_phase("position_states", calls.append, "position_states")
+    watchdog.run_phase("reconcile", calls.append, "reconcile")
+    watchdog.finish()
+    assert calls == ["position_states", "reconcile"]
+    assert watchdog.still_running() == []
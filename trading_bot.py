@@ -23,13 +23,24 @@ from alpaca.data.requests import (
 from alpaca.data.enums import DataFeed
 from alpaca.data.timeframe import TimeFrame
 from datetime import datetime, timedelta, timezone
+import logging
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 
 from private.core_logic import SignalEngine
 from private.core_logic.paths import LIVE_DATABASE_PATH
 from private.core_logic.config import ALPACA_KEY, ALPACA_SECRET
 
+from public.bar_store import BarStore, bars_to_frame
+from public.bot_logging import new_cycle_id
+from public.cycle_watchdog import CycleWatchdog, PhaseStillRunning, PhaseTimeout
+from public.decision_rules import action_plan, compile_signals, decide
+from public.order_book import OrderBook
+from public.pre_trade import check_buys
+from public.state_snapshot import load_snapshot, order_record, positions_from_broker, save_snapshot, warm_start
+
 
 
 
@@ -81,14 +92,67 @@ _______________________________________
 
 
 """
+
+# per-ticker lines are logged at debug with extra={"sampled": True}, see bot_logging.py
+logger = logging.getLogger(__name__)
+
+ASSET_CACHE_TTL_S = 24 * 60 * 60  # tradable / fractionable rarely change
+PRICE_CACHE_TTL_S = 60            # prices are only used for order sizing
+
+
 class TradingBot:
 
-    def __init__(self, thresholds=None, buy_quantity=100, paper=True):
+    def __init__(self, thresholds=None, buy_quantity=100, paper=True, bar_store_path=None,
+                 dry_run=False, plan_path=None, order_batch_size=50,
+                 cycle_deadline_s=240, phase_timeouts=None, shed_margin_s=0,
+                 state_path=None, max_snapshot_age_s=600,
+                 pre_trade_check=True, max_ticker_notional=None, max_total_exposure=None, cash_buffer=0,
+                 buy_priority_col=None, price_hedge_delay_s=None, price_deadline_s=3.0,
+                 market_feed=None):
 
         self.database_path = LIVE_DATABASE_PATH
         self.buy_quantity = buy_quantity
         self.paper = paper
+        # dry_run: build and report the action plan each cycle, but place / cancel nothing
+        self.dry_run = dry_run
+        self.plan_path = plan_path  # if set, each cycle's plan is written here as json
+        self.order_batch_size = order_batch_size
+        # optional local minute-bar store (bar_store.py): the price fallback reads it before the network
+        self.bar_store = BarStore(bar_store_path) if bar_store_path else None
         self.signalengine = SignalEngine(refresh_rate=10, thresholds=thresholds, database_path=self.database_path)
+        # per-cycle deadline, phase timings / timeouts and buy shedding, see cycle_watchdog.py
+        # phase names: section_one, holdings_signals, position_states, reconcile
+        self.watchdog = CycleWatchdog(deadline_s=cycle_deadline_s, phase_timeouts=phase_timeouts,
+                                      shed_margin_s=shed_margin_s)
+
+        # in-memory state, checkpointed to state_path after every cycle (state_snapshot.py)
+        self.state_path = state_path
+        self.max_snapshot_age_s = max_snapshot_age_s
+        self.asset_cache = {}    # symbol -> {tradable, fractionable, cached_at}
+        self.price_cache = {}    # symbol -> (price, cached_at)
+        self.positions = None    # symbol -> {side, qty}, from one get_all_positions per cycle
+        self.order_book = OrderBook()  # open orders, paged full syncs + cheap delta syncs (order_book.py)
+        self.last_signals = {}   # ticker -> compiled signal of the previous cycle
+
+        # pre-trade check of the cycle's buys against buying power / exposure caps (pre_trade.py)
+        # buy_priority_col: holdings column ranking buys when they don't all fit (higher first)
+        self.pre_trade_check = pre_trade_check
+        self.max_ticker_notional = max_ticker_notional
+        self.max_total_exposure = max_total_exposure
+        self.cash_buffer = cash_buffer
+        self.buy_priority_col = buy_priority_col
+
+        # price fallback chain: sequential by default; with price_hedge_delay_s set, the next
+        # source starts each time price_hedge_delay_s passes without an answer, bounded by price_deadline_s
+        self.price_hedge_delay_s = price_hedge_delay_s
+        self.price_deadline_s = price_deadline_s
+        self.price_source_stats = {}  # source -> calls / valid / errors / wins / latency_s
+        self._price_stats_lock = threading.Lock()
+        # optional market_stream.MarketDataFeed: subscribed to the holdings universe, read before any REST call
+        self.market_feed = market_feed
+        self._price_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="price") if price_hedge_delay_s is not None else None
+        if state_path:
+            self.warm_start()
 
     
     # ======================= #
@@ -102,20 +166,18 @@ class TradingBot:
         """order sizing, it is possible to do fractional trading on some occasions, although we will not do this"""
 
         # check if the asset is tradable and fractionable
-        trading = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
-        asset = trading.get_asset(ticker)
-        syb = asset.symbol
-        tradable = asset.tradable
-        fractionable = asset.fractionable
+        asset = self.get_asset_info(ticker)
+        tradable = asset['tradable']
+        fractionable = asset['fractionable']
 
         if not tradable:
-            print(f"Asset {ticker} is not tradable")
+            logger.warning("Asset not tradable", extra={"ticker": ticker})
             return None
         
         price = self.get_asset_price(ticker)
-        print(f"Price for {ticker} is {price}")
+        logger.debug("Asset price", extra={"ticker": ticker, "price": price, "sampled": True})
         if price is None:
-            print(f"Price for {ticker} is None")
+            logger.warning("No price for asset, ordering 1 share", extra={"ticker": ticker})
             return 1
 
         shares = self.buy_quantity / price # shares to buy = buy quantity / price per share
@@ -131,12 +193,52 @@ class TradingBot:
     #     ALPACA METHODS      #
     # ======================= #
 
-    def get_asset_price(self,ticker: str):
+    def get_asset_info(self, ticker):
+        """tradable / fractionable for the asset, cached for ASSET_CACHE_TTL_S"""
+
+        cached = self.asset_cache.get(ticker)
+        if cached is not None and time.time() - cached['cached_at'] < ASSET_CACHE_TTL_S:
+            return cached
+
+        trading = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
+        asset = trading.get_asset(ticker)
+        self.asset_cache[ticker] = {
+            'tradable': bool(asset.tradable), 'fractionable': bool(asset.fractionable), 'cached_at': time.time(),
+        }
+        return self.asset_cache[ticker]
+
+
+    def get_asset_price(self, ticker: str):
+        """
+        ballpark last price: from the market data stream if it has a fresh one, else REST
+        (see _fetch_asset_price), cached for PRICE_CACHE_TTL_S
+        """
+
+        sym = (ticker or "").upper().strip()
+        if self.market_feed is not None:
+            price = self.market_feed.cache.price(sym)
+            if price is not None:
+                return price
+
+        cached = self.price_cache.get(sym)
+        if cached is not None and time.time() - cached[1] < PRICE_CACHE_TTL_S:
+            return cached[0]
+
+        price = self._fetch_asset_price(sym)
+        if price is not None:
+            self.price_cache[sym] = (price, time.time())
+        return price
+
+
+    def _fetch_asset_price(self, ticker: str):
         """
         Returns a ballpark last price for `ticker` (float) or None if unavailable.
         - Prefers consolidated (15-min delayed) data for coverage on illiquid names.
-        - Falls back to IEX real-time, then to a recent minute bar.
+        - Falls back to IEX real-time, then to a recent minute bar (from the local bar store first, if set).
         Requires ALPACA_KEY and ALPACA_SECRET to be available in scope.
+
+        Sources are tried one after another (the first valid price wins), or, with
+        price_hedge_delay_s set, hedged: see _hedged_price.
         """
 
         sym = (ticker or "").upper().strip()
@@ -148,78 +250,215 @@ class TradingBot:
         except Exception:
             return None
 
+        sources = self._price_sources()
+        if self.price_hedge_delay_s is not None:
+            return self._hedged_price(sources, client, sym)
+
+        for name, source in sources:
+            price = self._timed_price_source(name, source, client, sym)
+            if price is not None:
+                self._record_price_win(name)
+                return price
+        return None
+
+
+    # ======================= #
+    #      PRICE SOURCES      #
+    # ======================= #
+    #  each takes (client, sym) and returns a float or None, in priority order
+
+    def _price_sources(self):
+        return [
+            ("snapshot", self._price_from_snapshot),
+            ("sip_trade", lambda client, sym: self._price_from_latest_trade(client, sym, DataFeed.DELAYED_SIP)),
+            ("sip_quote", lambda client, sym: self._price_from_latest_quote(client, sym, DataFeed.DELAYED_SIP)),
+            ("iex_trade", lambda client, sym: self._price_from_latest_trade(client, sym, DataFeed.IEX)),
+            ("iex_quote", lambda client, sym: self._price_from_latest_quote(client, sym, DataFeed.IEX)),
+            ("minute_bar", self._price_from_minute_bar),
+        ]
+
+
+    def _price_from_snapshot(self, client, sym):
         # Snapshot (fast path)
+        snap = client.get_stock_snapshot(StockSnapshotRequest(symbol_or_symbols=sym))
+        ss = snap.get(sym) or (next(iter(snap.values())) if snap else None)
+        if ss:
+            if getattr(ss, "latest_trade", None) and ss.latest_trade.price is not None:
+                return float(ss.latest_trade.price)
+            if getattr(ss, "latest_quote", None):
+                bid = ss.latest_quote.bid_price
+                ask = ss.latest_quote.ask_price
+                if bid is not None and ask is not None:
+                    return float((bid + ask) / 2)
+            if getattr(ss, "minute_bar", None) and ss.minute_bar.close is not None:
+                return float(ss.minute_bar.close)
+        return None
+
+
+    def _price_from_latest_trade(self, client, sym, feed):
+        lt = client.get_stock_latest_trade(
+            StockLatestTradeRequest(symbol_or_symbols=sym, feed=feed)
+        )
+        t = lt.get(sym)
+        if t and t.price is not None:
+            return float(t.price)
+        return None
+
+
+    def _price_from_latest_quote(self, client, sym, feed):
+        # latest quote → mid
+        lq = client.get_stock_latest_quote(
+            StockLatestQuoteRequest(symbol_or_symbols=sym, feed=feed)
+        )
+        q = lq.get(sym)
+        if q and q.bid_price is not None and q.ask_price is not None:
+            return float((q.bid_price + q.ask_price) / 2)
+        return None
+
+
+    def _price_from_minute_bar(self, client, sym):
+        # Recent minute bar (≥15 min old → consolidated free on Basic)
+        end = datetime.now(timezone.utc) - timedelta(minutes=16)
+        if self.bar_store is not None:
+            return self._get_stored_minute_bar_price(client, sym, end - timedelta(hours=1), end)
+        bars = client.get_stock_bars(
+            StockBarsRequest(
+                symbol_or_symbols=sym,
+                timeframe=TimeFrame.Minute,
+                start=end - timedelta(hours=1),
+                end=end,
+                limit=1,
+            )
+        )
+        b = bars.get(sym)
+        if b:
+            return float(b[0].close)
+        return None
+
+
+    def _timed_price_source(self, name, source, client, sym):
+        """run one source, recording its latency / outcome; failures count as no price"""
+
+        start = time.monotonic()
         try:
-            snap = client.get_stock_snapshot(StockSnapshotRequest(symbol_or_symbols=sym))
-            ss = snap.get(sym) or (next(iter(snap.values())) if snap else None)
-            if ss:
-                if getattr(ss, "latest_trade", None) and ss.latest_trade.price is not None:
-                    return float(ss.latest_trade.price)
-                if getattr(ss, "latest_quote", None):
-                    bid = ss.latest_quote.bid_price
-                    ask = ss.latest_quote.ask_price
-                    if bid is not None and ask is not None:
-                        return float((bid + ask) / 2)
-                if getattr(ss, "minute_bar", None) and ss.minute_bar.close is not None:
-                    return float(ss.minute_bar.close)
+            price = source(client, sym)
+            error = False
         except Exception:
-            pass  # move to explicit feed fallbacks
+            price, error = None, True
+        if price is not None and not (price > 0 and math.isfinite(price)):
+            price = None
 
-        # Latest trade/quote with explicit feeds
-        for feed in (DataFeed.DELAYED_SIP, DataFeed.IEX):
-            # latest trade
-            try:
-                lt = client.get_stock_latest_trade(
-                    StockLatestTradeRequest(symbol_or_symbols=sym, feed=feed)
-                )
-                t = lt.get(sym)
-                if t and t.price is not None:
-                    return float(t.price)
-            except Exception:
-                pass
-            # latest quote → mid
+        with self._price_stats_lock:
+            stats = self.price_source_stats.setdefault(name, {"calls": 0, "valid": 0, "errors": 0, "wins": 0, "latency_s": 0.0})
+            stats["calls"] += 1
+            stats["valid"] += price is not None
+            stats["errors"] += error
+            stats["latency_s"] += time.monotonic() - start
+        return price
+
+
+    def _record_price_win(self, name):
+        with self._price_stats_lock:
+            self.price_source_stats[name]["wins"] += 1
+
+
+    def _hedged_price(self, sources, client, sym):
+        """
+        Start the first source, then one more hedge (the next source down) each time
+        price_hedge_delay_s passes with no answer, or straight away once everything started has
+        come back empty, so a slow broker gets one extra call per delay, not all of them at once.
+        The highest-priority valid price wins: an answer is taken as soon as every source above
+        it has come back empty, otherwise the best one in hand when price_deadline_s runs out.
+        Sources still running at the deadline are left to finish in the background (their
+        stats are still recorded).
+        """
+
+        deadline = time.monotonic() + self.price_deadline_s
+        futures = []
+        next_hedge = time.monotonic()
+
+        while True:
+            now = time.monotonic()
+            if len(futures) < len(sources) and (now >= next_hedge or all(f.done() for f in futures)):
+                name, source = sources[len(futures)]
+                futures.append(self._price_pool.submit(self._timed_price_source, name, source, client, sym))
+                next_hedge = now + self.price_hedge_delay_s
+
+            for i, future in enumerate(futures):
+                if not future.done():
+                    break  # a higher-priority source is still out
+                if future.result() is not None:
+                    self._record_price_win(sources[i][0])
+                    return future.result()
+            else:
+                if len(futures) == len(sources):
+                    return None  # all done, none valid
+                continue  # everything started came back empty, start the next one now
+
+            remaining = deadline - now
+            if remaining <= 0:
+                # deadline: best valid answer among those that finished
+                for i, future in enumerate(futures):
+                    if future.done() and future.result() is not None:
+                        self._record_price_win(sources[i][0])
+                        return future.result()
+                return None
+            if len(futures) < len(sources):
+                remaining = min(remaining, max(0.0, next_hedge - now))
+            wait([f for f in futures if not f.done()], timeout=remaining, return_when=FIRST_COMPLETED)
+
+
+    def close(self):
+        """shut down the hedged price lookups' thread pool (lookups still running are left to finish)"""
+        if self._price_pool is not None:
+            self._price_pool.shutdown(wait=False, cancel_futures=True)
+
+
+    def price_source_report(self):
+        """per source: calls, how often it had a valid price / won, errors, mean latency"""
+
+        with self._price_stats_lock:
+            report = pd.DataFrame.from_dict(self.price_source_stats, orient="index")
+        if report.empty:
+            return report
+        report["mean_latency_s"] = report["latency_s"] / report["calls"]
+        report["win_rate"] = report["wins"] / report["calls"]
+        return report.drop(columns="latency_s")
+
+
+    def _get_stored_minute_bar_price(self, client, sym, start, end):
+        """latest close in [start, end] from the bar store, topping it up from the network only when it has nothing there"""
+
+        bar = self.bar_store.last_bar(sym, start=start, end=end)
+        if bar is None:
             try:
-                lq = client.get_stock_latest_quote(
-                    StockLatestQuoteRequest(symbol_or_symbols=sym, feed=feed)
+                # only request what the store doesn't have yet
+                last = self.bar_store.last_timestamp(sym)
+                fetch_from = max(start, last + timedelta(minutes=1)) if last is not None else start
+                bars = client.get_stock_bars(
+                    StockBarsRequest(
+                        symbol_or_symbols=sym,
+                        timeframe=TimeFrame.Minute,
+                        start=fetch_from,
+                        end=end,
+                    )
                 )
-                q = lq.get(sym)
-                if q and q.bid_price is not None and q.ask_price is not None:
-                    return float((q.bid_price + q.ask_price) / 2)
+                b = bars.get(sym)
+                if b:
+                    self.bar_store.append(sym, bars_to_frame(b))
             except Exception:
                 pass
+            bar = self.bar_store.last_bar(sym, start=start, end=end)
 
-        # Recent minute bar (≥15 min old → consolidated free on Basic)
-        try:
-            end = datetime.now(timezone.utc) - timedelta(minutes=16)
-            bars = client.get_stock_bars(
-                StockBarsRequest(
-                    symbol_or_symbols=sym,
-                    timeframe=TimeFrame.Minute,
-                    start=end - timedelta(hours=1),
-                    end=end,
-                    limit=1,
-                )
-            )
-            b = bars.get(sym)
-            if b:
-                return float(b[0].close)
-        except Exception:
-            pass
-
+        if bar is not None and not math.isnan(bar['close']):
+            return bar['close']
         return None
 
 
-    def get_all_open_orders(self):
+    def get_all_open_orders(self, full=False):
+        """every open order: synced through the order book (all pages; a delta since the last sync unless a full one is due)"""
         trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
-
-        get_orders_data = GetOrdersRequest(
-            status=QueryOrderStatus.OPEN,
-            limit=200,
-            nested=True
-        )
-
-        orders = trading_client.get_orders(filter=get_orders_data)
-        return orders
+        return self.order_book.sync(trading_client, full=full)
 
 
     def get_asset_pending_orders(self, orders, ticker):
@@ -235,14 +474,29 @@ class TradingBot:
         return None, None, None
 
 
+    def refresh_positions(self):
+        """all positions in one call (instead of get_open_position per ticker)"""
+
+        trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
+        self.positions = positions_from_broker(trading_client.get_all_positions())
+        return self.positions
+
+
     def get_asset_positions(self, ticker):
 
+        if self.positions is not None:
+            position = self.positions.get(ticker)
+            if position is None:
+                return None, None
+            return position['side'], position['qty']
+
         trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
 
         try:
             position = trading_client.get_open_position(ticker)
         except Exception as e:
-            print(f"Error getting asset positions: {e}")
+            # alpaca raises when there's no open position, so this is the common case
+            logger.debug("No asset position", extra={"ticker": ticker, "error": str(e), "sampled": True})
             return None, None
 
         side = position.side._value_ # 'long' or 'short
@@ -251,7 +505,7 @@ class TradingBot:
         return side, qty
 
 
-    def place_market_order(self, *, ticker, side, quantity=None):
+    def place_market_order(self, *, ticker, side, quantity=None, trading_client=None):
         """
         We use DAY orders, since GTC is not accepted for fractional quantities
 
@@ -260,7 +514,7 @@ class TradingBot:
         in short: there will be some cases where orders are closed, but they will be re-placed after closed.
         """ 
 
-        trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
+        trading_client = trading_client or TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
 
         if side == 'buy':
             s = OrderSide.BUY
@@ -275,7 +529,7 @@ class TradingBot:
         else:
             quantity = quantity
 
-        print(f"Quantity for {ticker} is {quantity}")
+        logger.info("Placing market order", extra={"ticker": ticker, "side": side, "quantity": quantity})
 
         market_order_data = MarketOrderRequest(
                     symbol=ticker,
@@ -287,6 +541,7 @@ class TradingBot:
         order = trading_client.submit_order(
             order_data=market_order_data
         )
+        self.order_book.add(order)
         return order
 
 
@@ -299,6 +554,7 @@ class TradingBot:
 
         trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
         trading_client.cancel_order_by_id(order_id = orderid)
+        self.order_book.remove(orderid)
 
 
     # ======================= #
@@ -313,14 +569,17 @@ class TradingBot:
             order_qty = float(oq)
         else:
             order_qty = 0
-        print(order_side, order_qty) # order side: 'buy' or 'sell' or None
+        # order side: 'buy' or 'sell' or None
 
         holdings_side, hq = self.get_asset_positions(ticker)
         if hq is not None:
             holdings_qty = float(hq)
         else:
             holdings_qty = 0
-        print(holdings_side, holdings_qty)
+        logger.debug("Orders and holdings", extra={
+            "ticker": ticker, "order_side": order_side, "order_qty": order_qty,
+            "holdings_side": holdings_side, "holdings_qty": holdings_qty, "sampled": True,
+        })
 
 
         if (holdings_side == 'long') and (holdings_qty > 0):
@@ -368,6 +627,9 @@ class TradingBot:
         con.close()
 
         orders = self.get_all_open_orders()
+        self.refresh_positions()
+        if self.market_feed is not None:
+            self.market_feed.set_symbols(df['cik_ticker'].dropna().unique())
 
         unique_tickers = df['cik_ticker'].unique()
 
@@ -378,7 +640,6 @@ class TradingBot:
 
         for index, row in df.iterrows():
             ticker = row['cik_ticker']
-            print(ticker)
             position_state, holdings_qty = self.get_new_asset_position_state(ticker, orders)
             df.loc[index, 'position_state'] = position_state
             df.loc[index, 'quantity_bought'] = holdings_qty
@@ -397,7 +658,7 @@ class TradingBot:
         con.commit()
         con.close()
 
-        print("Position states refreshed")
+        logger.info("Position states refreshed", extra={"n_rows": len(df)})
 
 
 
@@ -409,13 +670,7 @@ class TradingBot:
 
     def compile_asset_signals(self, array):
         """occasionally, assets might have multiple rows in holdings, with differing signals, this function compiles them into a single signal"""
-
-        if "SELL" in array:
-            return "SELL"
-        elif "BUY" in array:
-            return "BUY"
-        else:
-            return "HOLD"
+        return compile_signals(array)
 
 
     def reconcile_asset_orders_and_holdings(self, ticker):
@@ -432,76 +687,246 @@ class TradingBot:
             #print(f"testing signal compiler \n signal array values: {signal_array_values} \n signal compiled: {signal}")
             quantity_bought = row['quantity_bought'].values[0]
         except Exception as e:
-            print(f"Error in extracting data for {ticker}")
+            logger.error("Error in extracting data", extra={"ticker": ticker, "error": str(e)})
             return
 
-        if signal == 'BUY':
-
-            if position_state in ['OPEN', 'OPENING', 'PARTIAL FILL', 'FIXING_SHORT']:
-                return
-            elif position_state == 'CLOSED':
-                self.place_market_order(ticker = ticker, side = 'buy', quantity = None)
-            elif position_state == 'CLOSING':
-                self.cancel_order(ticker)
-                self.place_market_order(ticker = ticker, side = 'buy', quantity = None)
-            elif position_state == 'ERROR':
-                print(f"Error in reconcile_asset_orders_and_holdings for {ticker}")
-                return
-
-        elif signal == 'HOLD':
-
-            if position_state in ['OPEN', 'CLOSED', 'FIXING_SHORT']:
-                return
-            elif position_state in ['OPENING', 'PARTIAL FILL']:
-                self.cancel_order(ticker)
-            elif position_state == 'CLOSING':
-                self.cancel_order(ticker)
-            elif position_state == 'ERROR':
-                print(f"Error in reconcile_asset_orders_and_holdings for {ticker}")
-                return
-            
-        elif signal == 'SELL':
-
-            if position_state in ['CLOSED', 'CLOSING', 'FIXING_SHORT']:
-                return
-            elif position_state == 'OPEN':
-                self.place_market_order(ticker = ticker, side = 'sell', quantity = quantity_bought)
-            elif position_state == 'OPENING':
-                self.cancel_order(ticker)
-            elif position_state == 'PARTIAL FILL':
-                self.cancel_order(ticker)
-                self.place_market_order(ticker = ticker, side = 'sell', quantity = quantity_bought)
-            elif position_state == 'ERROR':
-                print(f"Error in reconcile_asset_orders_and_holdings for {ticker}")
-                return
-        
+        # the signal x position_state table lives in decision_rules.py (the backtest uses it too)
+        action = decide(signal, position_state)
+
+        if action == 'noop':
+            return
+        elif action == 'buy':
+            self.place_market_order(ticker = ticker, side = 'buy', quantity = None)
+        elif action == 'sell':
+            self.place_market_order(ticker = ticker, side = 'sell', quantity = quantity_bought)
+        elif action == 'cancel':
+            self.cancel_order(ticker)
+        elif action == 'cancel_buy':
+            self.cancel_order(ticker)
+            self.place_market_order(ticker = ticker, side = 'buy', quantity = None)
+        elif action == 'cancel_sell':
+            self.cancel_order(ticker)
+            self.place_market_order(ticker = ticker, side = 'sell', quantity = quantity_bought)
         else:
-            print(f"Error in reconcile_asset_orders_and_holdings for {ticker}")
+            logger.error("Can't reconcile asset", extra={"ticker": ticker, "signal": signal, "position_state": position_state})
             return
 
 
     def reconcile_table_orders_and_holdings(self):
         """
-        Iterate through whole table and reconcile position state + signal for each asset"""
+        Reconcile position state + signal for every asset: build the whole cycle's action plan
+        in one step (decision_rules.action_plan), report it, then execute it in batches."""
+
+        plan = self.build_action_plan()
+        self.report_action_plan(plan)
+        self.execute_action_plan(plan)
+
+
+    # ======================= #
+    #       ACTION PLAN       #
+    # ======================= #
+
+    def build_action_plan(self):
+        """one row per ticker: compiled signal, position_state, quantity_bought, action"""
 
         con = sqlite3.connect(self.database_path)
         df = pd.read_sql_query("SELECT * FROM holdings", con)
         con.close()
 
-        unique_tickers = df['cik_ticker'].unique()
+        plan = action_plan(df)
+        if self.buy_priority_col and self.buy_priority_col in df:
+            priority = df.drop_duplicates('cik_ticker').set_index('cik_ticker')[self.buy_priority_col]
+            plan[self.buy_priority_col] = plan['ticker'].map(priority).to_numpy()
+
+        signals = dict(zip(plan['ticker'], plan['signal']))
+        flipped = sum(1 for t, sig in signals.items() if t in self.last_signals and self.last_signals[t] != sig)
+        logger.info("Signals compiled", extra={"n_tickers": len(signals), "n_flipped": flipped})
+        self.last_signals = signals
+
+        return plan
+
+
+    def report_action_plan(self, plan):
+        """log the plan's action counts; write it to plan_path, and in dry run print what would be done"""
+
+        logger.info("Action plan", extra={"counts": plan['action'].value_counts().to_dict(), "dry_run": self.dry_run})
+
+        if self.plan_path:
+            plan.to_json(self.plan_path, orient="records", indent=1)
+        elif self.dry_run:
+            print(plan[plan['action'] != 'noop'].to_string(index=False))
+
+
+    def execute_action_plan(self, plan):
+        """
+        Run the plan in batches of order_batch_size tickers. Open orders are fetched once for
+        the whole plan (not per cancel). All cancels and sells go first (cancels before sells
+        within a batch, so a cancel+sell never has two orders open at once), then the buys.
+        A cancel_sell / cancel_buy whose cancel failed (or found no open order) doesn't place
+        its sell / buy, the old order may still be live.
+
+        Before any buy goes out, all of them are checked at once against the account's buying
+        power and the exposure caps (check_planned_buys). If the cycle is past its deadline
+        (self.watchdog.should_shed()), the remaining buys are skipped for this cycle; cancels
+        and sells always run.
+        """
+
+        for row in plan[plan['action'] == 'alert'].itertuples(index=False):
+            logger.error("Can't reconcile asset", extra={"ticker": row.ticker, "signal": row.signal, "position_state": row.position_state})
+
+        todo = plan[~plan['action'].isin(['noop', 'alert'])]
+        if self.dry_run or todo.empty:
+            return
 
-        for ticker in unique_tickers:
-            # buy_quantity = df.loc[df['cik_ticker'] == ticker, 'quantity_bought'].values[0]
-            # print(ticker, buy_quantity)
-            buy_quantity = next(iter(df.loc[df['cik_ticker'] == ticker, 'quantity_bought']), None)
-            print(ticker, buy_quantity)
-            self.reconcile_asset_orders_and_holdings(ticker)
+        # the book was synced in the position states phase, and our own orders are added as they go
+        open_order_ids = {}
+        for order in self.order_book.open_orders():
+            open_order_ids.setdefault(order.symbol, str(order.id))  # first order per symbol, as get_asset_pending_orders
+
+        trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
+
+        failed_cancels = set()  # tickers whose follow-up order must not go out
+        exits = todo[todo['action'].isin(['cancel', 'cancel_buy', 'cancel_sell', 'sell'])]
+        for start in range(0, len(exits), self.order_batch_size):
+            batch = exits.iloc[start:start + self.order_batch_size]
+
+            for row in batch[batch['action'] != 'sell'].itertuples(index=False):
+                order_id = open_order_ids.get(row.ticker)
+                if order_id is None:
+                    logger.warning("No open order to cancel", extra={"ticker": row.ticker})
+                    failed_cancels.add(row.ticker)
+                    continue
+                if not self._run_order_step(row, lambda: self._cancel_order_id(trading_client, order_id)):
+                    failed_cancels.add(row.ticker)
+
+            sells = batch[(batch['action'] == 'sell')
+                          | ((batch['action'] == 'cancel_sell') & ~batch['ticker'].isin(failed_cancels))]
+            for row in sells.itertuples(index=False):
+                self._run_order_step(row, lambda: self.place_market_order(
+                    ticker=row.ticker, side='sell', quantity=row.quantity_bought, trading_client=trading_client))
+
+            logger.info("Action plan batch done", extra={"stage": "exits", "batch_start": start, "batch_size": len(batch)})
+
+        buys = todo[(todo['action'] == 'buy')
+                    | ((todo['action'] == 'cancel_buy') & ~todo['ticker'].isin(failed_cancels))]
+        if failed_cancels:
+            logger.warning("Skipped orders after failed cancels", extra={"tickers": sorted(failed_cancels)})
+        if self.pre_trade_check and not buys.empty:
+            buys = self.check_planned_buys(buys, trading_client)
+
+        for start in range(0, len(buys), self.order_batch_size):
+            batch = buys.iloc[start:start + self.order_batch_size]
+
+            for i, row in enumerate(batch.itertuples(index=False)):
+                if self.watchdog.should_shed():
+                    deferred = buys['ticker'].iloc[start + i:].tolist()
+                    self.watchdog.record_shed("buy", len(deferred), tickers=deferred)
+                    return
+                self._run_order_step(row, lambda: self.place_market_order(
+                    ticker=row.ticker, side='buy', quantity=getattr(row, 'quantity', None), trading_client=trading_client))
+
+            logger.info("Action plan batch done", extra={"stage": "buys", "batch_start": start, "batch_size": len(batch)})
+
+
+    def check_planned_buys(self, buys, trading_client):
+        """
+        Size every planned buy (asset / price caches, so placing it later costs no extra
+        lookups), fetch the account once, and keep only the buys that fit (pre_trade.check_buys).
+        """
+
+        account = trading_client.get_account()
+
+        quantities, notionals = [], []
+        for ticker in buys['ticker']:
+            try:
+                # price first: an unpriced buy is dropped (no_price), so it isn't sized at all
+                price = self.get_asset_price(ticker)
+                quantity = self.get_order_size_quantity(ticker) if price is not None else None
+            except Exception as e:
+                logger.error("Couldn't size buy", extra={"ticker": ticker, "error": str(e)})
+                quantity, price = None, None
+            quantities.append(quantity)
+            notionals.append(quantity * price if quantity and price else np.nan)
+
+        exposure = {
+            symbol: abs(float(p['market_value'])) for symbol, p in (self.positions or {}).items()
+            if p.get('market_value') is not None
+        }
+        checked = check_buys(
+            buys.assign(quantity=pd.Series(quantities, index=buys.index, dtype=object), notional=notionals), float(account.buying_power), exposure,
+            max_ticker_notional=self.max_ticker_notional, max_total_exposure=self.max_total_exposure,
+            cash_buffer=self.cash_buffer,
+            priority=self.buy_priority_col if self.buy_priority_col in buys else None,
+        )
+
+        approved = checked[checked['approved']]
+        logger.info("Pre-trade check", extra={
+            "buying_power": float(account.buying_power), "n_buys": len(checked), "n_approved": len(approved),
+            "notional_approved": round(float(approved['notional'].sum()), 2),
+            "dropped": checked.loc[~checked['approved'], 'reason'].value_counts().to_dict(),
+        })
+        for row in checked[~checked['approved']].itertuples(index=False):
+            logger.debug("Buy dropped", extra={"ticker": row.ticker, "reason": row.reason, "notional": row.notional, "sampled": True})
+
+        return approved
+
+
+    def _cancel_order_id(self, trading_client, order_id):
+        trading_client.cancel_order_by_id(order_id=order_id)
+        self.order_book.remove(order_id)
+
+
+    def _run_order_step(self, row, step):
+        """one cancel / order of the plan; a failure is logged and the rest of the plan carries on, returns whether it went through"""
+        try:
+            step()
+        except Exception as e:
+            logger.error("Action failed", extra={"ticker": row.ticker, "action": row.action, "error": str(e)})
+            return False
+        return True
 
-        # for index, row in df.iterrows():
-        #     ticker = row['cik_ticker']
-        #     buy_quantity = row['quantity_bought']
-        #     print(ticker, buy_quantity)
-        #     self.reconcile_asset_orders_and_holdings(ticker)
+
+    # ======================= #
+    #      STATE SNAPSHOT     #
+    # ======================= #
+
+    def state_dict(self):
+        return {
+            'open_orders': [order_record(o) for o in self.order_book.open_orders()],
+            'orders_synced_at': self.order_book.last_sync.isoformat() if self.order_book.last_sync else None,
+            'positions': self.positions or {},
+            'assets': self.asset_cache,
+            'prices': self.price_cache,
+            'last_signals': self.last_signals,
+        }
+
+
+    def save_state(self):
+        save_snapshot(self.state_path, self.state_dict())
+
+
+    def warm_start(self):
+        """load the snapshot at state_path, checked against one get_all_positions call"""
+
+        snapshot = load_snapshot(self.state_path)
+        if snapshot is None:
+            logger.info("Cold start", extra={"state_path": str(self.state_path)})
+            return
+
+        trading_client = TradingClient(ALPACA_KEY, ALPACA_SECRET, paper=self.paper)
+        state = warm_start(snapshot, positions_from_broker(trading_client.get_all_positions()), self.max_snapshot_age_s)
+
+        self.positions = state['positions']
+        self.asset_cache = state['assets']
+        self.price_cache = state['prices']
+        self.last_signals = state['last_signals']
+        if state['open_orders'] is not None:
+            self.order_book.seed(state['open_orders'], synced_at=state['orders_synced_at'])
+
+        logger.info("Warm start", extra={
+            "validated": state['validated'], "age_s": round(state['age_s'], 1),
+            "orders_reused": state['open_orders'] is not None, "n_assets": len(self.asset_cache),
+        })
 
 
     # ======================= #
@@ -518,10 +943,30 @@ class TradingBot:
         5. Repeat
         """
 
+        new_cycle_id()  # stamped on every log line from this cycle
+        logger.info("Cycle started")
+        self.watchdog.start()
 
-        self.signalengine.run_section_one()
-        self.signalengine.run_holdings_engine_refresh()
-        self.refresh_holdings_table_position_states()
-        self.reconcile_table_orders_and_holdings()
+        try:
+            self.watchdog.run_phase("section_one", self.signalengine.run_section_one)
+            self.watchdog.run_phase("holdings_signals", self.signalengine.run_holdings_engine_refresh)
+            self.watchdog.run_phase("position_states", self.refresh_holdings_table_position_states)
+            self.watchdog.run_phase("reconcile", self.reconcile_table_orders_and_holdings)
+        except (PhaseTimeout, PhaseStillRunning) as e:
+            # later phases would act on stale state (or race the abandoned thread), so the rest of the cycle is skipped
+            logger.error("Cycle cut short", extra={"error": str(e)})
+        finally:
+            report = self.watchdog.finish()
+
+        if self.price_source_stats:
+            logger.info("Price sources", extra={"stats": self.price_source_report().round(4).to_dict(orient="index")})
+
+        # an abandoned phase may still be changing the order book / caches, don't checkpoint them half-way
+        if self.state_path and not self.watchdog.still_running():
+            try:
+                self.save_state()
+            except Exception as e:
+                logger.error("State checkpoint failed", extra={"error": str(e)})
 
+        logger.info("Cycle finished", extra={"duration_s": report["duration_s"]})
         time.sleep(300)